@@ -1,14 +1,38 @@
-from flask import Flask, request, render_template, redirect, url_for, flash, session, jsonify
+from flask import Flask, request, render_template, redirect, url_for, flash, session, jsonify, send_file, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
-import requests
+from itsdangerous import URLSafeSerializer, BadSignature
+import hashlib
+import hmac
+import functools
+import base64
 import urllib.parse
 import json
 import os
+import re
+import time
 import uuid
 
+import http_client
+import yts_client
+from catalog import CatalogMirror
+from poster_cache import PosterCache, PosterNotFound, POSTER_SIZES
+from torrent_selector import TorrentSelector, GB
+from tracker_health import TrackerRegistry, TRACKER_CANDIDATES
+from transmission_client import TransmissionClient, TransmissionError
+from plex_client import PlexClient, PlexError
+from plex_refresh import RefreshDispatcher
+from plex_library import PlexLibrary
+from health import HealthMonitor
+from download_queue import FairShareScheduler, QueueItem
+from status_sync import StatusSync, ProgressWriter, download_status_for, ACTIVE_STATUSES
+from auto_monitor import read_monitor_state
+from events import EventBroker, INTERNAL_TOKEN_HEADER, internal_token
+from job_queue import JobQueue, STATUSES as JOB_STATUSES
+from download_matcher import DownloadMatcher
+
 # Inicializar extensiones
 db = SQLAlchemy()
 login_manager = LoginManager()
@@ -16,7 +40,7 @@ login_manager = LoginManager()
 # Inicializar la aplicación
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'  # Cambiar en producción
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///yts.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///yts.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Inicializar extensiones con la app
@@ -24,35 +48,100 @@ db.init_app(app)
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
-# Trackers recomendados
-TRACKERS = [
-    "udp://open.demonii.com:1337/announce",
-    "udp://tracker.opentrackr.org:1337/announce",
-    "udp://tracker.openbittorrent.com:80",
-    "udp://tracker.coppersurfer.tk:6969",
-    "udp://tracker.leechers-paradise.org:6969"
-]
+# Trackers recomendados; build_magnet usa solo los más sanos (ver tracker_health.py)
+TRACKERS = TRACKER_CANDIDATES
+MAGNET_TRACKER_COUNT = int(os.getenv('MAGNET_TRACKER_COUNT', '5'))
+tracker_registry = TrackerRegistry(TRACKERS)
+
+# Política de selección de torrents (ver torrent_selector.py)
+torrent_selector = TorrentSelector(
+    preferred_quality=os.getenv('TORRENT_PREFERRED_QUALITY'),
+    min_seeds=int(os.getenv('TORRENT_MIN_SEEDS', '5')),
+    max_size_bytes=int(float(os.getenv('TORRENT_MAX_SIZE_GB', '8')) * GB),
+)
 
 def build_magnet(movie):
-    """Construye el magnet link usando el primer torrent en 1080p"""
-    torrent = movie["torrents"][0]
-    hash_ = torrent["hash"]
+    """Construye el magnet link usando el torrent elegido por la política de selección"""
+    selected = movie.get("selected_torrent")
+    if selected is None:
+        selection = torrent_selector.select(movie)
+        selected = selection.to_dict() if selection else {"hash": movie["torrents"][0]["hash"]}
+    hash_ = selected["hash"]
     name = urllib.parse.quote(movie["title_long"])
     magnet = f"magnet:?xt=urn:btih:{hash_}&dn={name}"
-    for tr in TRACKERS:
+    for tr in tracker_registry.top(MAGNET_TRACKER_COUNT):
         magnet += f"&tr={urllib.parse.quote(tr)}"
     return magnet
 
 # Inicializar modelos
 from models.user_model import User
-UserModel, Download, MovieList, MovieListItem, Friendship = User.init_model(db)
+UserModel, Download, MovieList, MovieListItem, Friendship, Torrent = User.init_model(db)
 
 # Registrar build_magnet en el contexto de Jinja2
 app.jinja_env.globals['build_magnet'] = build_magnet
 
+def extract_info_hash(magnet):
+    """Extrae el info hash (btih) de un magnet link como hex en minúsculas"""
+    if not magnet or 'btih:' not in magnet:
+        return None
+    value = magnet.split('btih:')[1].split('&')[0].strip()
+    if len(value) == 32:
+        # Algunos magnets usan base32 en lugar de hex
+        try:
+            return base64.b32decode(value.upper()).hex()
+        except ValueError:
+            return None
+    return value.lower() or None
+
+# Columnas añadidas a 'download' después de la versión inicial del esquema
+DOWNLOAD_COLUMN_MIGRATIONS = {
+    'info_hash': 'VARCHAR(40)',
+    'percent_done': 'FLOAT',
+    'rate_download': 'INTEGER',
+    'eta': 'INTEGER',
+    'size_bytes': 'BIGINT',
+    'last_seen_at': 'DATETIME',
+    'queue_position': 'INTEGER',
+    'torrent_id': 'INTEGER REFERENCES torrent (id)',
+}
+
+def migrate_download_table():
+    """Añade las columnas nuevas de 'download' a bases existentes y rellena info_hash y torrent_id"""
+    existing_columns = {column['name'] for column in db.inspect(db.engine).get_columns('download')}
+    with db.engine.begin() as conn:
+        for column, column_type in DOWNLOAD_COLUMN_MIGRATIONS.items():
+            if column not in existing_columns:
+                conn.execute(db.text(f"ALTER TABLE download ADD COLUMN {column} {column_type}"))
+        conn.execute(db.text("CREATE INDEX IF NOT EXISTS ix_download_info_hash ON download (info_hash)"))
+
+        # Backfill: calcular el hash una sola vez para las filas antiguas
+        rows = conn.execute(db.text("SELECT id, magnet FROM download WHERE info_hash IS NULL")).fetchall()
+        updates = [{'id': row.id, 'info_hash': extract_info_hash(row.magnet)} for row in rows]
+        updates = [u for u in updates if u['info_hash']]
+        if updates:
+            conn.execute(db.text("UPDATE download SET info_hash = :info_hash WHERE id = :id"), updates)
+
+        # Un registro de torrent por hash para las filas anteriores a la tabla 'torrent';
+        # las que fallaron o siguen pendientes no tienen torrent en Transmission
+        conn.execute(db.text("CREATE INDEX IF NOT EXISTS ix_download_torrent_id ON download (torrent_id)"))
+        conn.execute(db.text("""
+            INSERT INTO torrent (info_hash, magnet, added_at)
+            SELECT info_hash, MIN(magnet), MIN(download_date) FROM download
+            WHERE torrent_id IS NULL AND info_hash IS NOT NULL
+              AND status IN ('descargando', 'completado')
+              AND info_hash NOT IN (SELECT info_hash FROM torrent)
+            GROUP BY info_hash
+        """))
+        conn.execute(db.text("""
+            UPDATE download SET torrent_id = (SELECT id FROM torrent WHERE torrent.info_hash = download.info_hash)
+            WHERE torrent_id IS NULL AND info_hash IS NOT NULL
+              AND status IN ('descargando', 'completado')
+        """))
+
 # Crear las tablas de la base de datos
 with app.app_context():
     db.create_all()
+    migrate_download_table()
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -62,10 +151,104 @@ def load_user(user_id):
 TRANSMISSION_URL = "http://transmission:9091/transmission/rpc"
 TRANSMISSION_USER = "admin"
 TRANSMISSION_PASS = "1234"
-PLEX_URL = "http://plex:32400"
-PLEX_TOKEN = ""  # Se puede configurar después
+PLEX_URL = os.getenv('PLEX_URL', "http://plex:32400")
+PLEX_TOKEN = os.getenv('PLEX_TOKEN', '')
+
+# Todas las llamadas salientes pasan por http_client (pool, timeouts, circuit breaker)
+http_client.configure('transmission', auth=(TRANSMISSION_USER, TRANSMISSION_PASS))
+transmission = TransmissionClient(TRANSMISSION_URL)
+# Sondeo incremental de estados con reconciliación completa periódica
+status_sync = StatusSync(transmission, full_sync_interval=int(os.getenv('STATUS_FULL_SYNC_INTERVAL', '600')))
+progress_writer = ProgressWriter()
+
+# Cola con reparto justo entre usuarios (QUEUE_GLOBAL_CAP=0 la desactiva)
+QUEUE_GLOBAL_CAP = int(os.getenv('QUEUE_GLOBAL_CAP', '4'))
+QUEUE_PER_USER_CAP = int(os.getenv('QUEUE_PER_USER_CAP', '2'))
+download_scheduler = FairShareScheduler(QUEUE_GLOBAL_CAP, QUEUE_PER_USER_CAP) if QUEUE_GLOBAL_CAP > 0 else None
+plex_http = http_client.get_client('plex')
+# Sección de películas cacheada; escaneos parciales de lo que se organiza
+plex = PlexClient(PLEX_URL, PLEX_TOKEN, http=plex_http)
+# Los escaneos pedidos en ráfaga se agrupan y se lanzan de uno en uno
+plex_refresher = RefreshDispatcher(plex.refresh)
+
+# Eventos de progreso para /api/downloads/events (un sondeo, muchas pestañas)
+download_events = EventBroker()
+SSE_HEARTBEAT = int(os.getenv('SSE_HEARTBEAT', '15'))
+SSE_MAX_STREAM = int(os.getenv('SSE_MAX_STREAM', '300'))  # El navegador reconecta solo
+
+# Trabajos de post-procesado que encola el webhook de Transmission
+job_queue = JobQueue()
+
+# Índice de títulos de descargas activas para el webhook (se carga al primer uso)
+download_matcher = DownloadMatcher()
+
+# Catálogo local de YTS (ver catalog.py)
+catalog = CatalogMirror()
+
+# Estado de Transmission y Plex para las páginas: sondas en segundo plano, nunca por petición.
+# Solo el proceso web lo mantiene caliente (HEALTH_KEEP_WARM=0 en el monitor y los tests)
+health_monitor = HealthMonitor({
+    'transmission': lambda: {'version': transmission.session_get(['version']).get('version')},
+    'plex': lambda: plex.identity(),
+})
+if os.getenv('HEALTH_KEEP_WARM', '1') != '0':
+    health_monitor.start()
+
+# Lo que ya está en Plex (lo sincroniza plex_library.py; aquí solo se consulta)
+plex_library = PlexLibrary()
+app.jinja_env.globals['in_plex'] = plex_library.get
+
+# Solo se descargan pósters de los servidores de imágenes de YTS
+POSTER_HOSTS = {host.strip().lower() for host in os.getenv('POSTER_HOSTS', 'yts.mx,img.yts.mx').split(',') if host.strip()}
+IMDB_CODE_RE = re.compile(r'^tt\d+$')
+
+def is_poster_url(url):
+    """True si la URL apunta por http(s) a uno de POSTER_HOSTS (o a un subdominio)"""
+    parsed = urllib.parse.urlsplit(url or '')
+    host = (parsed.hostname or '').lower()
+    return parsed.scheme in ('http', 'https') and any(host == h or host.endswith(f'.{h}') for h in POSTER_HOSTS)
+
+def fetch_poster(url):
+    if not is_poster_url(url):
+        raise PosterNotFound(url)
+    resp = http_client.get_client('posters').get(url)
+    resp.raise_for_status()
+    return resp.content
+
+# Caché de pósters servidos desde /img/poster (ver poster_cache.py)
+poster_cache = PosterCache(fetch=fetch_poster)
 
 # --- Funciones auxiliares ---
+def search_movies(query, page=1, limit=24, sort_by='year', order_by='desc', quality=None):
+    """Busca películas en el catálogo local y recurre a YTS si no hay resultados"""
+    try:
+        if catalog.is_ready():
+            data = catalog.search(query, page=page, limit=limit, sort_by=sort_by,
+                                  order_by=order_by, quality=quality)
+            if data['movies']:
+                return data
+    except Exception as e:
+        app.logger.error(f"Error consultando catálogo local: {str(e)}")
+
+    params = {
+        "query_term": query,
+        "limit": limit,
+        "page": page,
+        "sort_by": sort_by,
+        "order_by": order_by,
+    }
+    if quality:
+        params["quality"] = quality
+    data = yts_client.list_movies(params)
+
+    # Guardar en el catálogo lo que no conocíamos
+    if data.get("movies"):
+        try:
+            catalog.upsert_movies(data["movies"])
+        except Exception as e:
+            app.logger.error(f"Error guardando en catálogo local: {str(e)}")
+    return data
+
 def update_movie_status(download_id, new_status):
     """Actualiza el estado de una película en la base de datos"""
     try:
@@ -73,158 +256,161 @@ def update_movie_status(download_id, new_status):
         if download:
             download.status = new_status
             db.session.commit()
+            index_download(download)
             return True
         return False
     except Exception as e:
         app.logger.error(f"Error al actualizar estado: {str(e)}")
         return False
 
-def get_transmission_session():
-    """Obtiene una sesión autenticada de Transmission"""
+def index_download(download):
+    """Mantiene el índice del webhook: solo las descargas activas son candidatas"""
+    if download.status in ACTIVE_STATUSES:
+        download_matcher.add(download.id, download.movie_title, download.year)
+    else:
+        download_matcher.discard(download.id)
+
+def find_completed_downloads(torrent_name, torrent_hash=None):
+    """Descargas activas a las que corresponde un torrent completado
+
+    Primero por info_hash (todas las que comparten el torrent); si no, la
+    mejor coincidencia del índice de títulos que siga activa en la base.
+    """
+    if torrent_hash:
+        downloads = Download.query.filter(
+            Download.info_hash == torrent_hash.lower(),
+            Download.status.in_(ACTIVE_STATUSES)
+        ).all()
+        if downloads:
+            return downloads
+
+    if not download_matcher.built:
+        download_matcher.build(db.session.query(Download.id, Download.movie_title, Download.year).filter(
+            Download.status.in_(ACTIVE_STATUSES)))
+    for _, download_id in download_matcher.candidates(torrent_name):
+        download = db.session.get(Download, download_id)
+        if download and download.status in ACTIVE_STATUSES:
+            return [download]
+        # Terminó o se borró por otro camino (sync masivo, otro proceso)
+        download_matcher.discard(download_id)
+    return []
+
+def refresh_plex_library(paths=None, wait=False):
+    """Pide actualizar Plex: solo las carpetas de paths o la sección entera
+
+    El escaneo se agrupa con los demás pedidos en la ventana de calma; con
+    wait=True se lanza ya lo pendiente y se devuelve si Plex respondió. Solo
+    el proceso web agrupa: el resto de procesos le envía las rutas por
+    /api/webhook/complete en lugar de llamar aquí.
+    """
     try:
-        session = requests.Session()
-        session.auth = (TRANSMISSION_USER, TRANSMISSION_PASS)
-        
-        # Primera llamada para obtener el token
-        resp = session.post(TRANSMISSION_URL)
-        
-        if resp.status_code == 409:
-            token = resp.headers.get('X-Transmission-Session-Id')
-            session.headers.update({
-                'X-Transmission-Session-Id': token
-            })
-            return session
-        else:
-            app.logger.error(f"Error al obtener token de Transmission: {resp.status_code}")
-            return None
+        plex_refresher.request(paths)
+        if wait:
+            return plex_refresher.flush()
+        return True
     except Exception as e:
-        app.logger.error(f"Error al conectar con Transmission: {str(e)}")
-        return None
+        app.logger.error(f"Error al actualizar Plex: {str(e)}")
+        return False
+
+def apply_download_updates(updates):
+    """Escribe estados y progreso de todas las descargas en un único UPDATE y commit
+
+    updates: filas de ProgressWriter.plan (mismas columnas en todas)
+    """
+    if not updates:
+        return
+    db.session.execute(db.update(Download), updates)
+    db.session.commit()
+
+def sync_download_statuses():
+    """Sincroniza con Transmission el estado de las descargas activas
+
+    Solo se evalúan las descargas cuyo torrent cambió desde el último sondeo,
+    salvo en las reconciliaciones completas, que revisan todas. Devuelve un
+    resumen con las transiciones, las películas completadas, cuántas
+    descargas siguen activas en la base de datos y cuántos torrents están
+    bajando datos de verdad (lo que decide el ritmo del monitor).
+    """
+    sync = status_sync.poll()
+
+    transitions = []
+    newly_completed = []  # Lista de películas recién completadas
+    events = []
+    updates = []
+    now = datetime.utcnow()
+    active = Download.query.filter(Download.status.in_(ACTIVE_STATUSES))
+    if not sync.full and sync.changed:
+        active = active.filter(Download.info_hash.in_(sync.changed))
+    if sync.full or sync.changed:
+        for download in active.all():
+            torrent = status_sync.get(download.info_hash) if download.info_hash else None
+            if not torrent:
+                continue
+            new_status = download_status_for(torrent) or download.status
+            if new_status != download.status:
+                app.logger.info(f"Actualizando estado de '{download.movie_title}': {download.status} -> {new_status}")
+                transitions.append(download)
+                if new_status == 'completado':
+                    newly_completed.append(download.movie_title)
+                    download_matcher.discard(download.id)
+            if new_status != download.status or download.info_hash in sync.changed:
+                events.append({'user_id': download.user_id,
+                               'data': download_event(download, torrent, new_status)})
+            update = progress_writer.plan(download, torrent, new_status, now)
+            if update:
+                updates.append(update)
 
-def refresh_plex_library():
-    """Actualiza la biblioteca de Plex"""
     try:
-        # Si no hay token configurado, intentar sin autenticación (para redes locales)
-        headers = {}
-        if PLEX_TOKEN:
-            headers['X-Plex-Token'] = PLEX_TOKEN
-        
-        # Obtener las secciones de biblioteca
-        sections_url = f"{PLEX_URL}/library/sections"
-        resp = requests.get(sections_url, headers=headers, timeout=10)
-        
-        if resp.status_code != 200:
-            app.logger.warning(f"No se pudo obtener secciones de Plex: {resp.status_code}")
-            return False
-        
-        # Buscar la sección de películas
-        import xml.etree.ElementTree as ET
-        root = ET.fromstring(resp.content)
-        movie_section_id = None
-        
-        for directory in root.findall('.//Directory'):
-            if directory.get('type') == 'movie':
-                movie_section_id = directory.get('key')
-                break
-        
-        if not movie_section_id:
-            app.logger.warning("No se encontró sección de películas en Plex")
-            return False
-        
-        # Actualizar la sección de películas
-        refresh_url = f"{PLEX_URL}/library/sections/{movie_section_id}/refresh"
-        resp = requests.get(refresh_url, headers=headers, timeout=10)
-        
-        if resp.status_code == 200:
-            app.logger.info("Biblioteca de Plex actualizada exitosamente")
-            return True
-        else:
-            app.logger.error(f"Error al actualizar Plex: {resp.status_code}")
-            return False
-            
-    except Exception as e:
-        app.logger.error(f"Error al conectar con Plex: {str(e)}")
+        apply_download_updates(updates)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        'full': sync.full,
+        'transitions': len(transitions),
+        'completed': newly_completed,
+        'events': events,
+        'active': Download.query.filter(Download.status.in_(ACTIVE_STATUSES)).count(),
+        'downloading': status_sync.downloading(),
+    }
+
+def download_event(download, torrent, status):
+    """Delta compacto de una descarga para el stream SSE"""
+    return {
+        'id': download.id,
+        'status': status,
+        'percentDone': round(torrent.get('percentDone') or 0, 3),
+        'rate': torrent.get('rateDownload') or 0,
+        'eta': torrent.get('eta'),
+    }
+
+def publish_download_events(events):
+    """Publica los deltas en el broker de este proceso"""
+    for event in events:
+        download_events.publish(event['user_id'], 'download', event['data'])
+    return len(events)
+
+def handle_completed_downloads(titles):
+    """Tareas tras completar descargas detectadas por la sincronización
+
+    No se pide escaneo a Plex: el webhook de Transmission organiza el archivo
+    y pide el escaneo parcial de su carpeta. El escaneo completo queda para
+    la actualización manual (/api/plex-refresh).
+    """
+    if not titles:
         return False
+    app.logger.info(f"Películas completadas: {', '.join(titles)}")
+    return True
 
 def check_downloads_status():
-    """Consulta el estado de todas las descargas en Transmission y actualiza la BD"""
+    """Sincroniza los estados y avisa de lo que terminó"""
     try:
-        session = get_transmission_session()
-        if not session:
-            return False
-        
-        # Obtener lista de torrents
-        payload = {
-            "method": "torrent-get",
-            "arguments": {
-                "fields": ["id", "name", "status", "percentDone", "error", "errorString"]
-            }
-        }
-        
-        resp = session.post(TRANSMISSION_URL, json=payload)
-        if resp.status_code != 200:
-            app.logger.error(f"Error al obtener torrents: {resp.status_code}")
-            return False
-        
-        result = resp.json()
-        torrents = result.get('arguments', {}).get('torrents', [])
-        
-        # Obtener todas las descargas activas de la BD
-        active_downloads = Download.query.filter(
-            Download.status.in_(['pendiente', 'descargando'])
-        ).all()
-        
-        newly_completed = []  # Lista de películas recién completadas
-        
-        for download in active_downloads:
-            # Buscar el torrent correspondiente por nombre
-            movie_title = download.movie_title.lower()
-            matching_torrent = None
-            
-            for torrent in torrents:
-                torrent_name = torrent.get('name', '').lower()
-                if movie_title in torrent_name or torrent_name in movie_title:
-                    matching_torrent = torrent
-                    break
-            
-            if matching_torrent:
-                torrent_status = matching_torrent.get('status')
-                percent_done = matching_torrent.get('percentDone', 0)
-                error = matching_torrent.get('error')
-                
-                # Estados de Transmission:
-                # 0: Torrent is stopped
-                # 1: Queued to check files
-                # 2: Checking files
-                # 3: Queued to download
-                # 4: Downloading
-                # 5: Queued to seed
-                # 6: Seeding
-                
-                new_status = None
-                if error and error != 0:
-                    new_status = 'error'
-                elif torrent_status in [4] and percent_done < 1.0:  # Descargando
-                    new_status = 'descargando'
-                elif torrent_status in [5, 6] or percent_done >= 1.0:  # Completado
-                    new_status = 'completado'
-                    # Si cambió a completado, agregar a la lista
-                    if download.status != 'completado':
-                        newly_completed.append(download.movie_title)
-                elif torrent_status in [0, 1, 2, 3]:  # Parado o en cola
-                    new_status = 'pendiente'
-                
-                if new_status and new_status != download.status:
-                    app.logger.info(f"Actualizando estado de '{download.movie_title}': {download.status} -> {new_status}")
-                    update_movie_status(download.id, new_status)
-        
-        # Si hay películas recién completadas, actualizar Plex
-        if newly_completed:
-            app.logger.info(f"Películas completadas: {', '.join(newly_completed)}")
-            refresh_plex_library()
-        
+        summary = sync_download_statuses()
+        publish_download_events(summary['events'])
+        handle_completed_downloads(summary['completed'])
+        schedule_downloads()
         return True
-        
     except Exception as e:
         app.logger.error(f"Error al verificar estados de descarga: {str(e)}")
         return False
@@ -277,56 +463,17 @@ def logout():
     return redirect(url_for('login'))
 
 # --- Funciones ---
-def get_transmission_token():
-    """Obtiene el token de sesión de Transmission"""
-    try:
-        response = requests.get(TRANSMISSION_URL, auth=(TRANSMISSION_USER, TRANSMISSION_PASS))
-        return response.headers.get('X-Transmission-Session-Id')
-    except Exception as e:
-        app.logger.error(f"Error obteniendo token de Transmission: {str(e)}")
-        return None
-
 def delete_from_transmission(hash_value):
-    """Elimina un torrent de Transmission usando su hash"""
+    """Elimina uno o varios torrents de Transmission usando sus hashes"""
     try:
-        # Obtener token de sesión
-        token = get_transmission_token()
-        if not token:
-            return False
-
-        # Preparar headers y datos
-        headers = {
-            'X-Transmission-Session-Id': token,
-            'Content-Type': 'application/json'
-        }
-        
-        data = {
-            "method": "torrent-remove",
-            "arguments": {
-                "ids": [hash_value],
-                "delete-local-data": True  # Esto eliminará también los archivos descargados
-            }
-        }
-
-        # Enviar solicitud a Transmission
-        response = requests.post(
-            TRANSMISSION_URL,
-            json=data,
-            headers=headers,
-            auth=(TRANSMISSION_USER, TRANSMISSION_PASS)
-        )
-
-        app.logger.info(f"Respuesta de Transmission al eliminar: Status {response.status_code}")
-        if response.status_code == 200:
-            return True
-        return False
-
+        ids = hash_value if isinstance(hash_value, list) else [hash_value]
+        # delete-local-data elimina también los archivos descargados
+        transmission.torrent_remove(ids, delete_local_data=True)
+        return True
     except Exception as e:
         app.logger.error(f"Error eliminando torrent de Transmission: {str(e)}")
         return False
 
-
-
 @app.route('/delete/<int:movie_id>', methods=['POST'])
 @login_required
 def delete_movie(movie_id):
@@ -336,11 +483,20 @@ def delete_movie(movie_id):
         if not download:
             return {"error": "Película no encontrada"}, 404
             
+        orphaned = []
+        if download.torrent_id:
+            # Torrent compartido: solo se borra con la última descarga que lo usa
+            orphaned = release_torrents([download])
+            if orphaned:
+                app.logger.info(f"Intentando eliminar torrent con hash: {download.info_hash}")
+                if not delete_from_transmission(download.info_hash):
+                    app.logger.warning("No se pudo eliminar el torrent de Transmission")
+            else:
+                app.logger.info("El torrent sigue en uso por otras descargas; se conserva en Transmission")
         # Si la película está en descarga o completada, la eliminamos de Transmission
-        if download.status in ['descargando', 'completado']:
-            # Extraer el hash del magnet link
-            magnet = download.magnet
-            hash_match = magnet.split('btih:')[1].split('&')[0] if 'btih:' in magnet else None
+        elif download.status in ['descargando', 'completado']:
+            # Hash guardado al insertar (o extraído del magnet en filas sin él)
+            hash_match = download.info_hash or extract_info_hash(download.magnet)
             
             if hash_match:
                 app.logger.info(f"Intentando eliminar torrent con hash: {hash_match}")
@@ -351,7 +507,12 @@ def delete_movie(movie_id):
         
         # Eliminar de la base de datos
         db.session.delete(download)
+        for torrent in orphaned:
+            db.session.delete(torrent)
         db.session.commit()
+        download_matcher.discard(movie_id)
+        # El hueco que deja pasa al siguiente de la cola
+        reschedule_downloads()
         
         return {"message": "Película eliminada"}, 200
     except Exception as e:
@@ -360,11 +521,10 @@ def delete_movie(movie_id):
 
 def get_movie(query):
     """Busca película en YTS API filtrando 1080p"""
-    url = f"https://yts.mx/api/v2/list_movies.json?query_term={query}&quality=1080p&limit=1"
-    resp = requests.get(url).json()
-    if resp["status"] != "ok" or not resp["data"]["movies"]:
+    data = search_movies(query, page=1, limit=1, sort_by='date_added', quality='1080p')
+    if not data.get("movies"):
         return None
-    return resp["data"]["movies"][0]
+    return data["movies"][0]
 
 @app.route('/')
 @login_required
@@ -400,21 +560,11 @@ def search():
     
     if query:
         try:
-            url = f"https://yts.mx/api/v2/list_movies.json"
-            params = {
-                "query_term": query,
-                "limit": 24,  # Mostrar más resultados por página
-                "page": page,
-                "sort_by": "year",  # Ordenar por año
-                "order_by": "desc"  # Más recientes primero
-            }
-            
-            resp = requests.get(url, params=params).json()
-            if resp["status"] == "ok":
-                movie_data = resp["data"]
-                if movie_data.get("movies"):
-                    results = movie_data["movies"]
-                    total_results = movie_data.get("movie_count", 0)
+            # Mostrar más resultados por página, más recientes primero
+            movie_data = search_movies(query, page=page, limit=24, sort_by="year", order_by="desc")
+            if movie_data.get("movies"):
+                results = torrent_selector.annotate(movie_data["movies"])
+                total_results = movie_data.get("movie_count", 0)
         except Exception as e:
             app.logger.error(f"Error en búsqueda: {str(e)}")
             flash('Error al realizar la búsqueda. Por favor, intenta de nuevo.', 'error')
@@ -428,6 +578,90 @@ def search():
         total_pages=(total_results + 23) // 24  # Redondear hacia arriba
     )
 
+# Campos que /api/search puede devolver; torrent_hash es el hash del mejor torrent
+SEARCH_API_FIELDS = {
+    'id', 'imdb_code', 'title', 'title_long', 'year', 'rating', 'runtime', 'genres',
+    'language', 'summary', 'small_cover_image', 'medium_cover_image', 'large_cover_image',
+    'torrent_hash', 'torrents'
+}
+SEARCH_API_DEFAULT_FIELDS = ['title', 'year', 'rating', 'imdb_code', 'medium_cover_image', 'torrent_hash']
+SEARCH_API_MAX_LIMIT = 50
+
+def get_cursor_serializer():
+    return URLSafeSerializer(app.config['SECRET_KEY'], salt='search-cursor')
+
+def best_torrent_hash(movie):
+    """Hash del torrent elegido por la política de selección"""
+    selection = torrent_selector.select(movie)
+    return selection.torrent.get('hash') if selection else None
+
+def project_movie(movie, fields):
+    """Reduce una película de YTS a los campos pedidos"""
+    projected = {}
+    for field in fields:
+        if field == 'torrent_hash':
+            projected[field] = best_torrent_hash(movie)
+        else:
+            projected[field] = movie.get(field)
+    return projected
+
+@app.route('/api/search')
+@login_required
+def api_search():
+    """API: búsqueda en JSON con proyección de campos, cursor y ETag"""
+    serializer = get_cursor_serializer()
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            state = serializer.loads(cursor)
+        except BadSignature:
+            return {"error": "Cursor inválido"}, 400
+    else:
+        try:
+            limit = min(max(int(request.args.get('limit', 24)), 1), SEARCH_API_MAX_LIMIT)
+        except ValueError:
+            return {"error": "limit debe ser un número"}, 400
+        fields = [f for f in request.args.get('fields', '').split(',') if f] or SEARCH_API_DEFAULT_FIELDS
+        unknown = [f for f in fields if f not in SEARCH_API_FIELDS]
+        if unknown:
+            return {"error": f"Campos desconocidos: {', '.join(unknown)}"}, 400
+        state = {
+            'q': request.args.get('query', '').strip(),
+            'p': 1,
+            'l': limit,
+            's': request.args.get('sort_by', 'year'),
+            'o': request.args.get('order_by', 'desc'),
+            'f': fields,
+        }
+
+    if not state['q']:
+        return {"error": "query requerido"}, 400
+
+    try:
+        data = search_movies(state['q'], page=state['p'], limit=state['l'],
+                             sort_by=state['s'], order_by=state['o'])
+    except Exception as e:
+        app.logger.error(f"Error en búsqueda API: {str(e)}")
+        return {"error": "Error al realizar la búsqueda"}, 502
+
+    movies = data.get('movies') or []
+    total = data.get('movie_count', 0)
+    next_cursor = None
+    if movies and state['p'] * state['l'] < total:
+        next_cursor = serializer.dumps(dict(state, p=state['p'] + 1))
+
+    response = jsonify({
+        "query": state['q'],
+        "page": state['p'],
+        "total": total,
+        "results": [project_movie(movie, state['f']) for movie in movies],
+        "next_cursor": next_cursor,
+    })
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    response.cache_control.private = True
+    response.cache_control.max_age = 60
+    return response.make_conditional(request)
+
 @app.route('/add', methods=['POST'])
 @login_required
 def add_movie():
@@ -437,11 +671,27 @@ def add_movie():
         if not movie_data:
             return {"error": "Datos de película requeridos"}, 400
 
+        # Sin magnet, elegir el torrent en el servidor a partir del imdb_code
+        selection_reason = None  # Solo el motivo del selector; el del cliente se ignora
+        if 'magnet' not in movie_data and movie_data.get('imdb_code'):
+            movie = catalog.get_by_imdb(movie_data['imdb_code'])
+            selection = torrent_selector.select(movie) if movie else None
+            if selection:
+                movie['selected_torrent'] = selection.to_dict()
+                movie_data['magnet'] = build_magnet(movie)
+                selection_reason = selection.reason
+
         required_fields = ['title', 'magnet']
         missing_fields = [field for field in required_fields if field not in movie_data]
         if missing_fields:
             return {"error": f"Campos requeridos faltantes: {', '.join(missing_fields)}"}, 400
 
+        if plex_library.get(movie_data.get('imdb_code')):
+            return {"error": "Esta película ya está en Plex", "in_plex": True}, 409
+
+        if selection_reason:
+            app.logger.info(f"Torrent elegido para '{movie_data['title']}': {selection_reason}")
+
         # Verificar si la película ya existe para este usuario
         existing_movie = Download.query.filter_by(
             user_id=current_user.id,
@@ -456,6 +706,7 @@ def add_movie():
             movie_title=movie_data['title'],
             movie_id=movie_data.get('imdb_code', ''),
             magnet=movie_data['magnet'],
+            info_hash=extract_info_hash(movie_data['magnet']),
             year=movie_data.get('year', ''),
             rating=movie_data.get('rating', ''),
             imdb_code=movie_data.get('imdb_code', ''),
@@ -463,12 +714,33 @@ def add_movie():
             user_id=current_user.id
         )
         db.session.add(new_download)
+
+        # Si otro usuario ya tiene este torrent, se comparte: ni RPC ni ancho de banda
+        torrent = shared_torrents([new_download.info_hash]).get(new_download.info_hash)
+        if torrent:
+            attach_to_torrent(new_download, torrent)
+            db.session.commit()
+            index_download(new_download)
+            flash('Película agregada: ya estaba en el servidor', 'success')
+            return {"message": "Película agregada (ya estaba en el servidor)", "shared": True}, 200
         db.session.commit()
+        index_download(new_download)
 
         # Iniciar la descarga en Transmission
         result = add_to_transmission(movie_data['magnet'])
+        if result is not None and link_torrent(new_download):
+            db.session.commit()
         
-        if result:
+        if result is not None and download_scheduler is not None:
+            reschedule_downloads()
+            position = db.session.get(Download, new_download.id).queue_position
+            if position:
+                flash(f'Película agregada a la cola (posición {position})', 'success')
+                return {"message": f"Película agregada a la cola (posición {position})",
+                        "queue_position": position}, 200
+            flash('Película agregada y descarga iniciada', 'success')
+            return {"message": "Película agregada y descarga iniciada"}, 200
+        elif result is not None:
             # Actualizar el estado si se agregó correctamente
             update_movie_status(new_download.id, 'descargando')
             flash('Película agregada y descarga iniciada', 'success')
@@ -489,47 +761,296 @@ def not_found_error(error):
 def internal_error(error):
     return render_template('error.html', error="Error interno del servidor"), 500
 
+# Estado que comparten todas las descargas de un mismo torrent
+SHARED_TORRENT_FIELDS = ('status', 'percent_done', 'rate_download', 'eta', 'size_bytes',
+                         'last_seen_at', 'queue_position')
+
+def shared_torrents(hashes):
+    """Torrents ya presentes en el servidor, por info hash (una sola consulta)"""
+    hashes = {h for h in hashes if h}
+    return {t.info_hash: t for t in Torrent.query.filter(Torrent.info_hash.in_(hashes))} if hashes else {}
+
+def attach_to_torrent(download, torrent):
+    """Enlaza una descarga nueva a un torrent existente, sin tocar Transmission
+
+    Copia el estado de otra descarga del mismo torrent para que aparezca
+    directamente con su progreso real.
+    """
+    download.torrent = torrent
+    sibling = Download.query.filter(
+        Download.torrent_id == torrent.id,
+        Download.id != download.id
+    ).order_by(Download.last_seen_at.desc()).first()
+    if sibling:
+        for field in SHARED_TORRENT_FIELDS:
+            setattr(download, field, getattr(sibling, field))
+
+def link_torrent(download):
+    """Enlaza la descarga al registro de su torrent tras agregarlo a Transmission"""
+    if not download.info_hash:
+        return None
+    torrent = shared_torrents([download.info_hash]).get(download.info_hash)
+    if torrent is None:
+        torrent = Torrent(info_hash=download.info_hash, magnet=download.magnet)
+        db.session.add(torrent)
+    download.torrent = torrent
+    return torrent
+
+def release_torrents(downloads):
+    """Torrents que dejan de tener descargas si se borran estas
+
+    Solo esos se quitan de Transmission (y del disco); el resto sigue en uso
+    por otras descargas.
+    """
+    torrent_ids = {d.torrent_id for d in downloads if d.torrent_id}
+    if not torrent_ids:
+        return []
+    deleting = [d.id for d in downloads]
+    still_used = {
+        torrent_id for (torrent_id,) in db.session.query(Download.torrent_id).filter(
+            Download.torrent_id.in_(torrent_ids),
+            Download.id.notin_(deleting)
+        ).distinct()
+    }
+    return Torrent.query.filter(Torrent.id.in_(torrent_ids - still_used)).all()
+
 def add_to_transmission(magnet):
-    """Agrega torrent a Transmission vía API"""
+    """Agrega torrent a Transmission vía API
+
+    Con la cola activa se agrega en pausa y schedule_downloads decide cuándo arranca.
+    """
     try:
         app.logger.info(f"Intentando agregar torrent: {magnet[:60]}...")
-        session = get_transmission_session()
-        if not session:
-            return None
-        
-        # Llamada para agregar el torrent
-        payload = {
-            "method": "torrent-add",
-            "arguments": {
-                "filename": magnet,
-                "download-dir": "/downloads/complete",
-                "paused": False
-            }
-        }
-        
-        app.logger.info("Enviando solicitud para agregar torrent")
-        resp = session.post(TRANSMISSION_URL, json=payload)
-        app.logger.info(f"Respuesta de agregar torrent: Status {resp.status_code}")
-        
-        if resp.status_code != 200:
-            app.logger.error(f"Error al agregar torrent: Status code {resp.status_code}")
-            app.logger.error(f"Respuesta: {resp.text}")
-            return None
-            
-        result = resp.json()
-        app.logger.info(f"Respuesta JSON: {result}")
-        
-        if "result" in result and result["result"] == "success":
-            app.logger.info("Torrent agregado exitosamente")
-            return result
-            
-        app.logger.error(f"Error en respuesta de Transmission: {result}")
-        return None
+        result = transmission.torrent_add(magnet, download_dir="/downloads/complete",
+                                          paused=download_scheduler is not None)
+        app.logger.info(f"Torrent agregado exitosamente: {result}")
+        return result
     except Exception as e:
         app.logger.error(f"Error al agregar torrent: {str(e)}")
-        app.logger.error(f"Detalles del error: {repr(e)}")
         return None
 
+def schedule_downloads():
+    """Aplica el reparto justo: arranca y para torrents y guarda la posición en cola
+
+    Una sola consulta a Transmission para los torrents candidatos, solo las
+    llamadas torrent-start/stop necesarias y un único UPDATE de posiciones.
+    """
+    if download_scheduler is None:
+        return None
+    downloads = Download.query.filter(
+        Download.status.in_(ACTIVE_STATUSES),
+        Download.info_hash.isnot(None)
+    ).order_by(Download.download_date, Download.id).all()
+    if not downloads:
+        return None
+
+    hashes = sorted({download.info_hash for download in downloads})
+    result = transmission.torrent_get(["hashString", "status", "percentDone"], ids=hashes)
+    torrents = {t['hashString'].lower(): t for t in result.get('torrents', []) if t.get('hashString')}
+
+    # Solo compiten las descargas con torrent en Transmission y sin terminar
+    items = [
+        QueueItem(download.id, download.user_id, download.info_hash, download.download_date,
+                  torrents[download.info_hash].get('status') != 0)
+        for download in downloads
+        if download.info_hash in torrents and (torrents[download.info_hash].get('percentDone') or 0) < 1.0
+    ]
+    plan = download_scheduler.plan(items)
+
+    if plan.stop:
+        transmission.torrent_stop(plan.stop)
+    if plan.start:
+        transmission.torrent_start(plan.start)
+        # Que la cola propia de Transmission tampoco los retenga
+        transmission.queue_move_top(plan.start)
+
+    started = set(plan.start)
+    updates = []
+    for download in downloads:
+        position = plan.positions.get(download.id)
+        status = 'descargando' if download.info_hash in started else download.status
+        if position != download.queue_position or status != download.status:
+            updates.append({'id': download.id, 'queue_position': position, 'status': status})
+    if updates:
+        db.session.execute(db.update(Download), updates)
+        db.session.commit()
+    app.logger.info(f"Cola: {len(plan.active)} activas, {len(plan.start)} arrancadas, {len(plan.stop)} paradas")
+    return plan
+
+def reschedule_downloads():
+    """schedule_downloads para las rutas: un fallo de la cola no rompe la petición"""
+    try:
+        return schedule_downloads()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error al planificar la cola de descargas: {str(e)}")
+        return None
+
+BULK_MAX_ITEMS = 100
+
+def bulk_add_downloads(items):
+    """Agrega varias películas con una sola consulta, una sesión y un commit"""
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('title'):
+            results[index] = {"index": index, "status": "invalid", "error": "title requerido"}
+            continue
+        if not item.get('magnet') and item.get('imdb_code'):
+            movie = catalog.get_by_imdb(item['imdb_code'])
+            if movie and movie.get('torrents'):
+                item = dict(item, magnet=build_magnet(movie))
+        if not item.get('magnet'):
+            results[index] = {"index": index, "status": "invalid", "error": "magnet requerido"}
+            continue
+        if plex_library.get(item.get('imdb_code')):
+            results[index] = {"index": index, "status": "in_plex", "error": "Esta película ya está en Plex"}
+            continue
+        valid.append((index, item))
+
+    # Duplicados: una sola consulta para todo el lote
+    titles = {item['title'] for _, item in valid}
+    existing = {
+        title for (title,) in db.session.query(Download.movie_title).filter(
+            Download.user_id == current_user.id,
+            Download.movie_title.in_(titles)
+        )
+    } if titles else set()
+
+    new_downloads = []
+    for index, item in valid:
+        if item['title'] in existing:
+            results[index] = {"index": index, "status": "duplicate", "error": "Ya has agregado esta película"}
+            continue
+        existing.add(item['title'])
+        download = Download(
+            movie_title=item['title'],
+            movie_id=item.get('imdb_code', ''),
+            magnet=item['magnet'],
+            info_hash=extract_info_hash(item['magnet']),
+            year=item.get('year', ''),
+            rating=item.get('rating', ''),
+            imdb_code=item.get('imdb_code', ''),
+            status='pendiente',
+            user_id=current_user.id
+        )
+        db.session.add(download)
+        new_downloads.append((index, download))
+
+    try:
+        db.session.flush()
+        torrents = shared_torrents(download.info_hash for _, download in new_downloads)
+        # El cliente de Transmission mantiene una única sesión para todo el lote
+        for index, download in new_downloads:
+            if download.info_hash in torrents:
+                # Ya está en el servidor: se comparte sin RPC
+                attach_to_torrent(download, torrents[download.info_hash])
+                results[index] = {"index": index, "id": download.id, "status": "added", "started": True,
+                                  "shared": True}
+                continue
+            started = add_to_transmission(download.magnet) is not None
+            if started:
+                torrent = link_torrent(download)
+                if torrent:
+                    torrents[download.info_hash] = torrent
+                if download_scheduler is None:
+                    download.status = 'descargando'
+            results[index] = {"index": index, "id": download.id, "status": "added", "started": started}
+        db.session.commit()
+        for _, download in new_downloads:
+            index_download(download)
+        if new_downloads and download_scheduler is not None:
+            reschedule_downloads()
+            positions = dict(db.session.query(Download.id, Download.queue_position).filter(
+                Download.id.in_([download.id for _, download in new_downloads])))
+            for index, download in new_downloads:
+                results[index]["queue_position"] = positions.get(download.id)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error en alta masiva: {str(e)}")
+        for index, _ in new_downloads:
+            results[index] = {"index": index, "status": "error", "error": "Error interno del servidor"}
+    return results
+
+def bulk_delete_downloads(ids):
+    """Elimina varias descargas con un solo torrent-remove y un commit"""
+    found = {
+        download.id: download for download in Download.query.filter(
+            Download.id.in_(ids),
+            Download.user_id == current_user.id
+        )
+    } if ids else {}
+
+    # Torrents compartidos: solo los que se quedan sin ninguna descarga
+    orphaned = release_torrents(list(found.values()))
+    hashes = [torrent.info_hash for torrent in orphaned]
+    results = []
+    for index, download_id in enumerate(ids):
+        download = found.get(download_id)
+        if not download:
+            results.append({"index": index, "id": download_id, "status": "not_found",
+                            "error": "Película no encontrada"})
+            continue
+        if not download.torrent_id and download.status in ['descargando', 'completado']:
+            hash_value = download.info_hash or extract_info_hash(download.magnet)
+            if hash_value:
+                hashes.append(hash_value)
+        results.append({"index": index, "id": download_id, "status": "deleted"})
+
+    removed = True
+    if hashes:
+        removed = delete_from_transmission(hashes)
+        if not removed:
+            app.logger.warning("No se pudieron eliminar los torrents de Transmission")
+
+    try:
+        for download in found.values():
+            db.session.delete(download)
+        for torrent in orphaned:
+            db.session.delete(torrent)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error en borrado masivo: {str(e)}")
+        for result in results:
+            if result["status"] == "deleted":
+                result.update(status="error", error="Error interno del servidor")
+        return results
+
+    for result in results:
+        if result["status"] == "deleted":
+            result["transmission_removed"] = removed
+            download_matcher.discard(result["id"])
+    if found:
+        reschedule_downloads()
+    return results
+
+@app.route('/api/downloads/bulk', methods=['POST'])
+@login_required
+def bulk_downloads():
+    """API: alta o baja masiva de descargas con resultado por elemento"""
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+
+    if action == 'add':
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return {"error": "items debe ser una lista no vacía"}, 400
+        if len(items) > BULK_MAX_ITEMS:
+            return {"error": f"Máximo {BULK_MAX_ITEMS} elementos por petición"}, 400
+        results = bulk_add_downloads(items)
+    elif action == 'delete':
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+            return {"error": "ids debe ser una lista de enteros"}, 400
+        if len(ids) > BULK_MAX_ITEMS:
+            return {"error": f"Máximo {BULK_MAX_ITEMS} elementos por petición"}, 400
+        results = bulk_delete_downloads(ids)
+    else:
+        return {"error": "action debe ser 'add' o 'delete'"}, 400
+
+    return {"action": action, "results": results}, 200
+
 @app.route('/download/<int:movie_id>', methods=['POST'])
 @login_required
 def download_movie(movie_id):
@@ -540,8 +1061,16 @@ def download_movie(movie_id):
             return {"error": "Película no encontrada"}, 404
             
         result = add_to_transmission(download.magnet)
+        if result is not None and not download.torrent_id and link_torrent(download):
+            db.session.commit()
         
-        if result and 'result' in result and result['result'] == 'success':
+        if result is not None and download_scheduler is not None:
+            reschedule_downloads()
+            position = db.session.get(Download, movie_id).queue_position
+            if position:
+                return {"message": f"En cola (posición {position})", "queue_position": position}, 200
+            return {"message": "Descarga iniciada"}, 200
+        elif result is not None:
             update_movie_status(movie_id, 'descargando')
             return {"message": "Descarga iniciada"}, 200
         else:
@@ -564,38 +1093,80 @@ def check_status():
         app.logger.error(f"Error al verificar estados: {str(e)}")
         return {"error": "Error interno del servidor"}, 500
 
+@app.route('/api/downloads/events')
+@login_required
+def download_events_stream():
+    """Stream SSE con los cambios de estado y progreso de las descargas
+
+    Por defecto solo las del usuario; scope=all las de todos (como /all).
+    Admite Last-Event-ID para recuperar lo perdido al reconectar.
+    """
+    user_id = None if request.args.get('scope') == 'all' else current_user.id
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    subscription, missed, resync = download_events.subscribe(user_id, last_event_id)
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            if resync:
+                yield "event: resync\ndata: {}\n\n"
+            for event in missed:
+                yield event.encode()
+            deadline = time.monotonic() + SSE_MAX_STREAM
+            while time.monotonic() < deadline and not subscription.overflowed:
+                event = subscription.get(timeout=SSE_HEARTBEAT)
+                # Comentario como latido para que proxies y navegador no corten
+                yield event.encode() if event else ": ping\n\n"
+        finally:
+            subscription.close()
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def internal_only(view):
+    """Rutas que solo llaman los procesos propios (monitor, webhook): exigen el secreto compartido"""
+    @functools.wraps(view)
+    def wrapped(*args, **kwargs):
+        if not hmac.compare_digest(request.headers.get(INTERNAL_TOKEN_HEADER, ''), internal_token()):
+            return {"error": "Token interno inválido"}, 403
+        return view(*args, **kwargs)
+    return wrapped
+
+@app.route('/api/internal/download-events', methods=['POST'])
+@internal_only
+def internal_download_events():
+    """Recibe los deltas que publica el monitor"""
+    data = request.get_json(silent=True) or {}
+    events = data.get('events')
+    if not isinstance(events, list):
+        return {"error": "events debe ser una lista"}, 400
+    return {"published": publish_download_events(events)}, 200
+
 @app.route('/api/transmission-status')
 @login_required
 def transmission_status():
     """Obtiene el estado de conexión con Transmission"""
     try:
-        session = get_transmission_session()
-        if not session:
-            return {"connected": False, "message": "No se pudo conectar con Transmission"}, 500
-        
         # Hacer una consulta simple para verificar la conexión
-        payload = {
-            "method": "session-get",
-            "arguments": {}
-        }
-        
-        resp = session.post(TRANSMISSION_URL, json=payload)
-        if resp.status_code == 200:
-            result = resp.json()
-            session_info = result.get('arguments', {})
-            return {
-                "connected": True, 
-                "message": "Conectado correctamente",
-                "version": session_info.get('version', 'Desconocida')
-            }, 200
-        else:
-            return {"connected": False, "message": f"Error de conexión: {resp.status_code}"}, 500
-            
+        session_info = transmission.session_get(["version"])
+        return {
+            "connected": True, 
+            "message": "Conectado correctamente",
+            "version": session_info.get('version', 'Desconocida')
+        }, 200
+    except TransmissionError as e:
+        return {"connected": False, "message": f"Error de conexión: {str(e)}"}, 500
     except Exception as e:
         app.logger.error(f"Error al verificar Transmission: {str(e)}")
         return {"connected": False, "message": f"Error: {str(e)}"}, 500
 
 @app.route('/api/webhook/complete', methods=['POST'])
+@internal_only
 def webhook_complete():
     """Endpoint para el webhook de Transmission cuando se completa una descarga"""
     try:
@@ -605,36 +1176,30 @@ def webhook_complete():
         
         torrent_name = data['torrent_name'].lower()
         app.logger.info(f"Webhook recibido para: {torrent_name}")
-        
-        # Buscar la película en la base de datos por nombre similar
-        all_downloads = Download.query.filter(
-            Download.status.in_(['pendiente', 'descargando'])
-        ).all()
-        
-        movie_found = False
-        for download in all_downloads:
-            movie_title = download.movie_title.lower()
-            
-            # Comparar nombres (buscar coincidencias parciales)
-            if (movie_title in torrent_name or 
-                torrent_name in movie_title or
-                any(word in torrent_name for word in movie_title.split() if len(word) > 3)):
-                
-                # Actualizar estado a completado
-                download.status = 'completado'
-                db.session.commit()
-                
+
+        # Por hash si el hook lo envía; si no, por título y año normalizados
+        completed = find_completed_downloads(torrent_name, data.get('torrent_hash'))
+        for download in completed:
+            download.status = 'completado'
+        if completed:
+            db.session.commit()
+            for download in completed:
+                download_matcher.discard(download.id)
                 app.logger.info(f"Película completada: {download.movie_title}")
-                movie_found = True
-                break
-        
+        movie_found = bool(completed)
+
+        # El webhook envía la ruta organizada: escaneo parcial agrupado con los demás
+        organized_path = data.get('organized_path')
+        plex_refresh_queued = bool(organized_path) and refresh_plex_library([organized_path])
+
         if movie_found:
             return {
                 "message": "Película marcada como completada", 
                 "movie_found": True,
+                "plex_refresh_queued": plex_refresh_queued,
                 "organization_info": {
                     "original_name": torrent_name,
-                    "organized_path": "/downloads/movies/",
+                    "organized_path": organized_path or "/downloads/movies/",
                     "note": "Los archivos serán organizados y renombrados automáticamente"
                 }
             }, 200
@@ -643,9 +1208,10 @@ def webhook_complete():
             return {
                 "message": "Torrent no encontrado en base de datos", 
                 "movie_found": False,
+                "plex_refresh_queued": plex_refresh_queued,
                 "organization_info": {
                     "original_name": torrent_name,
-                    "organized_path": "/downloads/movies/",
+                    "organized_path": organized_path or "/downloads/movies/",
                     "note": "Archivos organizados automáticamente aunque no esté en la base de datos"
                 }
             }, 200
@@ -659,7 +1225,7 @@ def webhook_complete():
 def plex_refresh():
     """Actualiza manualmente la biblioteca de Plex"""
     try:
-        success = refresh_plex_library()
+        success = refresh_plex_library(wait=True)
         if success:
             return {"message": "Biblioteca de Plex actualizada correctamente"}, 200
         else:
@@ -673,31 +1239,152 @@ def plex_refresh():
 def plex_status():
     """Verifica el estado de conexión con Plex"""
     try:
-        headers = {}
-        if PLEX_TOKEN:
-            headers['X-Plex-Token'] = PLEX_TOKEN
-        
         # Hacer una consulta simple para verificar la conexión
-        resp = requests.get(f"{PLEX_URL}/library/sections", headers=headers, timeout=10)
-        
-        if resp.status_code == 200:
-            # Contar secciones de películas
-            import xml.etree.ElementTree as ET
-            root = ET.fromstring(resp.content)
-            movie_sections = [d for d in root.findall('.//Directory') if d.get('type') == 'movie']
-            
-            return {
-                "connected": True,
-                "message": "Conectado correctamente",
-                "movie_sections": len(movie_sections)
-            }, 200
-        else:
-            return {"connected": False, "message": f"Error de conexión: {resp.status_code}"}, 500
-            
+        sections = plex.sections()
+        return {
+            "connected": True,
+            "message": "Conectado correctamente",
+            "movie_sections": len([s for s in sections if s['type'] == 'movie']),
+            "library": plex_library.status()
+        }, 200
+    except PlexError as e:
+        return {"connected": False, "message": f"Error de conexión: {str(e)}"}, 500
     except Exception as e:
         app.logger.error(f"Error al verificar Plex: {str(e)}")
         return {"connected": False, "message": f"Error: {str(e)}"}, 500
 
+@app.route('/api/http-stats')
+@login_required
+def http_stats():
+    """Latencia, errores y estado del circuito de cada servicio externo"""
+    return {"upstreams": http_client.all_stats(), "transmission_rpc": transmission.stats(),
+            "status_sync": status_sync.stats(), "progress_writes": progress_writer.stats(),
+            "download_events": download_events.stats(), "plex": plex.stats(),
+            "plex_refresh": plex_refresher.stats(), "health": health_monitor.stats()}, 200
+
+@app.route('/api/health')
+@login_required
+def health():
+    """Estado de Transmission y Plex desde la instantánea (con ETag para peticiones condicionales)"""
+    snapshot = health_monitor.snapshot()
+    response = jsonify(snapshot)
+    response.set_etag(HealthMonitor.etag(snapshot), weak=True)
+    # El navegador revalida siempre; si nada cambió recibe un 304 sin cuerpo
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/api/monitor-status')
+@login_required
+def monitor_status():
+    """Latido y estadísticas de la última ejecución del monitor automático"""
+    return read_monitor_state(), 200
+
+@app.route('/api/jobs')
+@login_required
+def list_jobs():
+    """Trabajos de post-procesado: recuento por estado y los más recientes"""
+    status = request.args.get('status')
+    if status and status not in JOB_STATUSES:
+        return {"error": f"Estado no válido: {status}"}, 400
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    return {"counts": job_queue.counts(),
+            "jobs": [job.to_dict() for job in job_queue.list(status=status, limit=limit)]}, 200
+
+@app.route('/api/jobs/<int:job_id>')
+@login_required
+def job_detail(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return {"error": "Trabajo no encontrado"}, 404
+    return job.to_dict(), 200
+
+@app.route('/api/jobs/<int:job_id>/retry', methods=['POST'])
+@login_required
+def retry_job(job_id):
+    """Vuelve a encolar un trabajo de la cola de muertos"""
+    if not job_queue.retry(job_id):
+        return {"error": "Solo se pueden reintentar trabajos muertos"}, 409
+    return {"message": "Trabajo encolado de nuevo", "job": job_queue.get(job_id).to_dict()}, 200
+
+@app.route('/api/trackers')
+@login_required
+def trackers_health():
+    """Puntuación y estado de cada tracker candidato"""
+    return {"trackers": tracker_registry.snapshot(),
+            "in_use": tracker_registry.top(MAGNET_TRACKER_COUNT)}, 200
+
+@app.route('/api/cache-stats')
+@login_required
+def cache_stats():
+    """Contadores de la caché de respuestas de YTS"""
+    return {"yts": yts_client.cache.stats()}, 200
+
+def find_poster_source(imdb_code):
+    """Busca la URL original del póster en el catálogo, las listas o YTS
+
+    Solo valen URLs de POSTER_HOSTS: el resto se ignora.
+    """
+    movie = catalog.get_by_imdb(imdb_code) or {}
+    source_url = movie.get('large_cover_image') or movie.get('medium_cover_image')
+    if is_poster_url(source_url):
+        return source_url
+
+    item = MovieListItem.query.filter(
+        MovieListItem.imdb_code == imdb_code,
+        MovieListItem.poster_url.isnot(None),
+        MovieListItem.poster_url != ''
+    ).first()
+    if item and is_poster_url(item.poster_url):
+        return item.poster_url
+
+    data = search_movies(imdb_code, limit=1)
+    for movie in data.get('movies') or []:
+        source_url = movie.get('large_cover_image') or movie.get('medium_cover_image')
+        if movie.get('imdb_code') == imdb_code and is_poster_url(source_url):
+            return source_url
+    return None
+
+def poster_src(imdb_code, fallback_url='', size='medium'):
+    """URL local del póster; si no hay imdb_code se usa la URL original"""
+    if imdb_code:
+        return url_for('poster', imdb_code=imdb_code, size=size)
+    return fallback_url or ''
+
+app.jinja_env.globals['poster_src'] = poster_src
+
+@app.route('/img/poster/<imdb_code>')
+def poster(imdb_code):
+    """Sirve el póster desde la caché local con ETag y caché de larga duración
+
+    Sin login: las listas públicas y compartidas también muestran pósters. Solo
+    se aceptan códigos de IMDb y se descarga únicamente de POSTER_HOSTS.
+    """
+    if not IMDB_CODE_RE.match(imdb_code):
+        return {"error": "Código de IMDb inválido"}, 404
+    size = request.args.get('size', 'medium')
+    if size not in POSTER_SIZES:
+        return {"error": f"Tamaño inválido. Usa: {', '.join(POSTER_SIZES)}"}, 400
+
+    try:
+        try:
+            path, etag, content_type = poster_cache.get(imdb_code, size)
+        except PosterNotFound:
+            source_url = find_poster_source(imdb_code)
+            if not source_url:
+                return {"error": "Póster no encontrado"}, 404
+            path, etag, content_type = poster_cache.get(imdb_code, size, source_url=source_url)
+    except PosterNotFound:
+        return {"error": "Póster no encontrado"}, 404
+    except Exception as e:
+        app.logger.error(f"Error obteniendo póster {imdb_code}: {str(e)}")
+        return {"error": "No se pudo obtener el póster"}, 502
+
+    response = send_file(path, mimetype=content_type, etag=etag, max_age=31536000, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 # === RUTAS PARA LISTAS DE PELÍCULAS ===
 
 @app.route('/listas')
@@ -1,34 +1,244 @@
 #!/usr/bin/env python3
 """
-Script de monitoreo automático simplificado
-Solo verifica el estado sin hacer login
+Monitor automático de descargas
+
+Sincroniza los estados con Transmission, avisa de las descargas completadas,
+reparte los huecos de la cola y sondea los trackers. El intervalo se adapta:
+rápido mientras hay algo descargando y cada vez más lento cuando no hay
+actividad.
+
+Un lock de archivo garantiza que solo un monitor sondea aunque haya varios
+procesos o contenedores; el resto queda en espera para tomar el relevo. El
+líder escribe un latido con estadísticas que la web lee en /api/monitor-status
+y reenvía los cambios de progreso a la web para el stream SSE.
 """
+import os
+import sys
+import json
 import time
+import fcntl
+import socket
 import logging
-import sys
+
+import http_client
+from events import INTERNAL_TOKEN_HEADER, internal_token
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+MONITOR_LOCK_PATH = os.getenv('MONITOR_LOCK_PATH', os.path.join(INSTANCE_DIR, 'monitor.lock'))
+MONITOR_STATE_PATH = os.getenv('MONITOR_STATE_PATH', os.path.join(INSTANCE_DIR, 'monitor.json'))
+FLASK_URL = os.getenv('FLASK_URL', 'http://localhost:5000')
 
 # Configuración
-CHECK_INTERVAL = 300  # 5 minutos en segundos
+FAST_INTERVAL = int(os.getenv('MONITOR_FAST_INTERVAL', '15'))  # Con descargas activas
+IDLE_INTERVAL = int(os.getenv('MONITOR_IDLE_INTERVAL', '300'))  # Máximo sin actividad
+BACKOFF_FACTOR = 2
+STANDBY_INTERVAL = 30  # Cada cuánto intenta tomar el lock un monitor en espera
+TRACKER_PROBE_INTERVAL = 1800  # Sondeo de trackers cada 30 minutos
+# Un latido más viejo que esto indica que el monitor no está corriendo
+STALE_AFTER = 3 * IDLE_INTERVAL
+
+
+class LeaderLock:
+    """Lock exclusivo no bloqueante sobre un archivo (flock)"""
+
+    def __init__(self, path=MONITOR_LOCK_PATH):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+
+class AdaptiveInterval:
+    """Intervalo que vuelve al mínimo con actividad y crece sin ella"""
+
+    def __init__(self, fast=FAST_INTERVAL, idle=IDLE_INTERVAL, factor=BACKOFF_FACTOR):
+        self.fast = fast
+        self.idle = idle
+        self.factor = factor
+        self.current = fast
+
+    def next(self, busy):
+        if busy:
+            self.current = self.fast
+        else:
+            self.current = min(self.current * self.factor, self.idle)
+        return self.current
+
+
+def read_monitor_state(path=MONITOR_STATE_PATH, clock=time.time):
+    """Lee el latido del monitor; 'alive' indica si es reciente"""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {'alive': False, 'heartbeat_at': None, 'tasks': {}}
+    state['alive'] = clock() - (state.get('heartbeat_at') or 0) < STALE_AFTER
+    return state
+
+
+class Monitor:
+    """Ejecuta las tareas periódicas mientras tiene el lock de líder"""
+
+    def __init__(self, sync_statuses, handle_completed, probe_trackers=None, publish_events=None, schedule=None,
+                 lock=None, state_path=MONITOR_STATE_PATH, interval=None, clock=time.time, sleep=time.sleep):
+        self.sync_statuses = sync_statuses
+        self.handle_completed = handle_completed
+        self.schedule = schedule
+        self.publish_events = publish_events
+        self.probe_trackers = probe_trackers
+        self.lock = lock or LeaderLock()
+        self.state_path = state_path
+        self.interval = interval or AdaptiveInterval()
+        self.clock = clock
+        self.sleep = sleep
+        self.last_probe = None
+        self.started_at = clock()
+        self.tasks = {}
+
+    def _run_task(self, name, func, *args):
+        """Ejecuta una tarea registrando duración, resultado y errores"""
+        entry = self.tasks.setdefault(name, {'runs': 0, 'failures': 0, 'last_run': None,
+                                             'last_duration_ms': None, 'last_ok': None, 'last_error': None})
+        start = self.clock()
+        entry['runs'] += 1
+        entry['last_run'] = start
+        try:
+            result = func(*args)
+            entry['last_ok'] = start
+            entry['last_error'] = None
+            return result
+        except Exception as e:
+            entry['failures'] += 1
+            entry['last_error'] = str(e)
+            logger.error(f"Error en la tarea {name}: {e}")
+            return None
+        finally:
+            entry['last_duration_ms'] = round((self.clock() - start) * 1000, 1)
+
+    def run_once(self):
+        """Un ciclo del líder; devuelve los segundos hasta el siguiente"""
+        summary = self._run_task('status_sync', self.sync_statuses)
+        if summary:
+            if summary.get('events') and self.publish_events:
+                self._run_task('events', self.publish_events, summary['events'])
+            if summary['completed']:
+                self._run_task('completions', self.handle_completed, summary['completed'])
+            if self.schedule:
+                # Con lo que acaba de terminar quedan huecos para la cola
+                self._run_task('queue', self.schedule)
+            # Una fila 'pendiente' o un torrent atascado no justifican sondear rápido
+            busy = summary['downloading'] > 0 or summary['transitions'] > 0
+        else:
+            busy = False  # Con errores también se espacian los reintentos
+
+        if self.probe_trackers and (self.last_probe is None
+                                    or self.clock() - self.last_probe >= TRACKER_PROBE_INTERVAL):
+            self._run_task('tracker_probe', self.probe_trackers)
+            self.last_probe = self.clock()
+
+        delay = self.interval.next(busy)
+        self.write_state(delay, busy)
+        return delay
+
+    def write_state(self, delay, busy):
+        state = {
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+            'started_at': self.started_at,
+            'heartbeat_at': self.clock(),
+            'next_run_in': delay,
+            'busy': busy,
+            'tasks': self.tasks,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def step(self):
+        """Ejecuta un ciclo si es líder; si no, intenta tomar el lock más tarde"""
+        if not self.lock.acquire():
+            return STANDBY_INTERVAL
+        return self.run_once()
+
+    def run_forever(self):
+        was_leader = False
+        try:
+            while True:
+                delay = self.step()
+                if self.lock.held != was_leader:
+                    was_leader = self.lock.held
+                    logger.info("Monitor líder: sondeando" if was_leader else "Otro monitor es el líder; en espera")
+                self.sleep(delay)
+        finally:
+            self.lock.release()
+
+
+def forward_events(events):
+    """Envía los deltas al proceso web, que es quien tiene los clientes SSE"""
+    resp = http_client.get_client('flask').post(f"{FLASK_URL}/api/internal/download-events",
+                                                json={'events': events},
+                                                headers={INTERNAL_TOKEN_HEADER: internal_token()})
+    resp.raise_for_status()
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
 
 def main():
-    """Monitor simplificado"""
-    logger = logging.getLogger(__name__)
-    logger.info("Monitor automático iniciado (modo simplificado)")
-    logger.info("Por ahora solo mantiene el proceso vivo")
-    
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler()]
+    )
+    # Importar la app aquí: la web solo necesita read_monitor_state
+    os.environ.setdefault('HEALTH_KEEP_WARM', '0')  # El estado de los servicios lo sondea la web
+    from app import app, sync_download_statuses, handle_completed_downloads, schedule_downloads
+    from tracker_health import TrackerRegistry, TRACKER_CANDIDATES
+
+    trackers = TrackerRegistry(TRACKER_CANDIDATES)
+
+    def in_app_context(func):
+        def wrapper(*args):
+            with app.app_context():
+                return func(*args)
+        return wrapper
+
+    monitor = Monitor(
+        sync_statuses=in_app_context(sync_download_statuses),
+        handle_completed=in_app_context(handle_completed_downloads),
+        probe_trackers=trackers.probe,
+        publish_events=forward_events,
+        schedule=in_app_context(schedule_downloads),
+    )
+    logger.info("Monitor automático iniciado")
     try:
-        while True:
-            logger.info("Monitor activo - esperando...")
-            time.sleep(CHECK_INTERVAL)
+        monitor.run_forever()
     except KeyboardInterrupt:
         logger.info("Monitor detenido")
         sys.exit(0)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Espejo local del catálogo de YTS con índice de texto completo (SQLite FTS5)
+
+Uso:
+    python catalog.py sync                  # sincronización incremental
+    python catalog.py sync --interval 3600  # sincronizar cada hora
+    python catalog.py sync --max-pages 20   # como mucho 20 páginas; la siguiente sigue donde quedó
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+from contextlib import contextmanager
+
+import yts_client
+
+logger = logging.getLogger(__name__)
+
+CATALOG_DB_PATH = os.getenv(
+    'CATALOG_DB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'catalog.db')
+)
+SYNC_PAGE_SIZE = 50  # Máximo permitido por list_movies.json
+# Páginas ya sincronizadas que se vuelven a pedir en cada pasada para actualizar seeds y peers
+REFRESH_PAGES = int(os.getenv('CATALOG_REFRESH_PAGES', '10'))
+
+SORT_COLUMNS = {
+    'year': 'm.year',
+    'rating': 'm.rating',
+    'title': 'm.title',
+    'date_added': 'm.date_uploaded_unix',
+    'seeds': 'm.max_seeds',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    id INTEGER PRIMARY KEY,
+    imdb_code TEXT,
+    title TEXT NOT NULL,
+    year INTEGER,
+    rating REAL,
+    date_uploaded_unix INTEGER DEFAULT 0,
+    max_seeds INTEGER DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_movies_imdb ON movies(imdb_code);
+CREATE INDEX IF NOT EXISTS idx_movies_year ON movies(year);
+CREATE TABLE IF NOT EXISTS torrents (
+    hash TEXT PRIMARY KEY,
+    movie_id INTEGER NOT NULL REFERENCES movies(id) ON DELETE CASCADE,
+    quality TEXT,
+    type TEXT,
+    seeds INTEGER DEFAULT 0,
+    peers INTEGER DEFAULT 0,
+    size_bytes INTEGER DEFAULT 0,
+    date_uploaded_unix INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_torrents_movie ON torrents(movie_id);
+CREATE INDEX IF NOT EXISTS idx_torrents_quality ON torrents(quality, movie_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+    title, genres, cast_names, tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def build_fts_query(text):
+    """Convierte texto libre en una consulta FTS5 segura (prefijos unidos con AND)"""
+    tokens = re.findall(r'\w+', text.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+class CatalogMirror:
+    """Catálogo local de películas y torrents de YTS"""
+
+    def __init__(self, db_path=CATALOG_DB_PATH):
+        self.db_path = db_path
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._memory_conn = sqlite3.connect(':memory:', check_same_thread=False) if db_path == ':memory:' else None
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _open(self):
+        if self._memory_conn is not None:
+            return self._memory_conn
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    @contextmanager
+    def _connect(self):
+        """Transacción: commit al salir, rollback si falla; la conexión se cierra (salvo :memory:)"""
+        conn = self._open()
+        try:
+            with conn:
+                yield conn
+        finally:
+            if conn is not self._memory_conn:
+                conn.close()
+
+    # --- Estado de sincronización ---
+    def get_state(self, key, default=None):
+        with self._connect() as conn:
+            row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value, conn=None):
+        sql = 'INSERT INTO sync_state(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value'
+        if conn is not None:
+            conn.execute(sql, (key, str(value)))
+            return
+        with self._connect() as own_conn:
+            own_conn.execute(sql, (key, str(value)))
+
+    def clear_state(self, keys, conn):
+        conn.execute(f"DELETE FROM sync_state WHERE key IN ({', '.join('?' * len(keys))})", list(keys))
+
+    @property
+    def watermark(self):
+        """Mayor date_uploaded_unix sincronizado (0 si nunca se sincronizó)"""
+        return int(self.get_state('watermark', 0))
+
+    def is_ready(self):
+        """El catálogo solo responde búsquedas tras una sincronización completa"""
+        return self.get_state('last_sync') is not None
+
+    # --- Escritura ---
+    def upsert_movies(self, movies, conn=None):
+        """Inserta o actualiza películas y sus torrents. Devuelve el número de películas"""
+        if conn is None:
+            with self._connect() as own_conn:
+                return self.upsert_movies(movies, conn=own_conn)
+
+        count = 0
+        for movie in movies:
+            if not movie.get('id') or not movie.get('title'):
+                continue
+            torrents = movie.get('torrents') or []
+            max_seeds = max((t.get('seeds') or 0 for t in torrents), default=0)
+            conn.execute(
+                """INSERT INTO movies(id, imdb_code, title, year, rating, date_uploaded_unix, max_seeds, data)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET
+                       imdb_code = excluded.imdb_code, title = excluded.title, year = excluded.year,
+                       rating = excluded.rating, date_uploaded_unix = excluded.date_uploaded_unix,
+                       max_seeds = excluded.max_seeds, data = excluded.data""",
+                (movie['id'], movie.get('imdb_code'), movie['title'], movie.get('year'),
+                 movie.get('rating'), movie.get('date_uploaded_unix') or 0, max_seeds,
+                 json.dumps(movie))
+            )
+            conn.execute('DELETE FROM torrents WHERE movie_id = ?', (movie['id'],))
+            conn.executemany(
+                """INSERT OR REPLACE INTO torrents(hash, movie_id, quality, type, seeds, peers, size_bytes, date_uploaded_unix)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(t['hash'].upper(), movie['id'], t.get('quality'), t.get('type'), t.get('seeds') or 0,
+                  t.get('peers') or 0, t.get('size_bytes') or 0, t.get('date_uploaded_unix') or 0)
+                 for t in torrents if t.get('hash')]
+            )
+            cast_names = ' '.join(c.get('name', '') for c in movie.get('cast') or [])
+            conn.execute('DELETE FROM movies_fts WHERE rowid = ?', (movie['id'],))
+            conn.execute(
+                'INSERT INTO movies_fts(rowid, title, genres, cast_names) VALUES (?, ?, ?, ?)',
+                (movie['id'], f"{movie['title']} {movie.get('title_english') or ''}",
+                 ' '.join(movie.get('genres') or []), cast_names)
+            )
+            count += 1
+        return count
+
+    # --- Sincronización ---
+    @staticmethod
+    def _page_params(page, page_size):
+        return {'limit': page_size, 'page': page, 'sort_by': 'date_added', 'order_by': 'desc'}
+
+    def sync(self, fetch_page=yts_client.fetch_list_movies, max_pages=None, page_size=SYNC_PAGE_SIZE,
+             refresh_pages=REFRESH_PAGES):
+        """Sincroniza incrementalmente desde list_movies.json ordenado por date_added
+
+        Recorre páginas de la más reciente a la más antigua y se detiene al
+        alcanzar la marca de agua guardada o la última página. Solo entonces
+        avanza la marca y el catálogo se da por listo: si la pasada se corta
+        (max_pages o un error), se guarda la página por la que iba y la
+        siguiente sincronización continúa desde ahí. Tras una pasada completa
+        se refrescan refresh_pages páginas ya conocidas (ver refresh).
+        """
+        watermark = self.watermark
+        resume_page = int(self.get_state('resume_page', 0))
+        page = resume_page or 1
+        new_watermark = int(self.get_state('pending_watermark', watermark)) if resume_page else watermark
+        fetched = 0
+        total = 0
+        complete = False
+
+        try:
+            while max_pages is None or fetched < max_pages:
+                data = fetch_page(self._page_params(page, page_size))
+                fetched += 1
+                movies = data.get('movies') or []
+                if not movies:
+                    complete = True
+                    break
+
+                fresh = [m for m in movies if (m.get('date_uploaded_unix') or 0) > watermark]
+                with self._connect() as conn:
+                    total += self.upsert_movies(fresh, conn=conn)
+                for movie in fresh:
+                    new_watermark = max(new_watermark, movie.get('date_uploaded_unix') or 0)
+
+                if len(fresh) < len(movies) or len(movies) < page_size:
+                    complete = True
+                    break
+                page += 1
+        finally:
+            with self._connect() as conn:
+                if complete:
+                    self.set_state('watermark', new_watermark, conn=conn)
+                    self.set_state('last_sync', int(time.time()), conn=conn)
+                    self.clear_state(('resume_page', 'pending_watermark'), conn)
+                else:
+                    # Las páginas que faltan quedan por debajo de lo ya visto: no mover la marca
+                    self.set_state('resume_page', page, conn=conn)
+                    self.set_state('pending_watermark', new_watermark, conn=conn)
+
+        if complete:
+            logger.info(f"Catálogo sincronizado: {total} películas nuevas o actualizadas ({fetched} páginas)")
+            if watermark and refresh_pages:
+                self.refresh(fetch_page, refresh_pages, page_size)
+        else:
+            logger.info(f"Catálogo a medias: {total} películas nuevas, se sigue en la página {page}")
+        return total
+
+    def refresh(self, fetch_page=yts_client.fetch_list_movies, pages=REFRESH_PAGES, page_size=SYNC_PAGE_SIZE):
+        """Vuelve a pedir páginas ya sincronizadas, por turnos, para actualizar seeds y peers
+
+        La pasada incremental no vuelve a ver lo que ya está en el espejo; sin
+        esto el selector de torrents decidiría con los seeds de la primera
+        sincronización. Cada llamada sigue donde quedó la anterior y al llegar
+        a la última página vuelve a empezar. Devuelve cuántas películas actualizó.
+        """
+        page = int(self.get_state('refresh_page', 1))
+        refreshed = 0
+        for _ in range(pages):
+            movies = fetch_page(self._page_params(page, page_size)).get('movies') or []
+            with self._connect() as conn:
+                refreshed += self.upsert_movies(movies, conn=conn)
+            if len(movies) < page_size:
+                page = 1  # Vuelta completa
+                break
+            page += 1
+        self.set_state('refresh_page', page)
+        logger.info(f"Catálogo: {refreshed} películas refrescadas (siguiente página {page})")
+        return refreshed
+
+    # --- Lectura ---
+    def search(self, query='', page=1, limit=24, sort_by='year', order_by='desc', quality=None):
+        """Busca en el catálogo local devolviendo el mismo formato que 'data' de YTS"""
+        page = max(int(page), 1)
+        sort_column = SORT_COLUMNS.get(sort_by, SORT_COLUMNS['date_added'])
+        direction = 'ASC' if str(order_by).lower() == 'asc' else 'DESC'
+
+        where = []
+        args = []
+        fts_query = build_fts_query(query) if query else ''
+        if fts_query:
+            where.append('m.id IN (SELECT rowid FROM movies_fts WHERE movies_fts MATCH ?)')
+            args.append(fts_query)
+        if quality and quality != 'all':
+            where.append('EXISTS (SELECT 1 FROM torrents t WHERE t.movie_id = m.id AND t.quality = ?)')
+            args.append(quality)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ''
+
+        with self._connect() as conn:
+            movie_count = conn.execute(f'SELECT COUNT(*) FROM movies m {where_sql}', args).fetchone()[0]
+            rows = conn.execute(
+                f"""SELECT m.data FROM movies m {where_sql}
+                    ORDER BY {sort_column} {direction}, m.date_uploaded_unix DESC
+                    LIMIT ? OFFSET ?""",
+                args + [limit, (page - 1) * limit]
+            ).fetchall()
+
+        return {
+            'movie_count': movie_count,
+            'limit': limit,
+            'page_number': page,
+            'movies': [json.loads(row[0]) for row in rows],
+        }
+
+    def get_by_imdb(self, imdb_code):
+        """Obtiene una película del catálogo por su código de IMDb"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM movies WHERE imdb_code = ?', (imdb_code,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sincroniza el catálogo local de YTS')
+    parser.add_argument('command', choices=['sync'])
+    parser.add_argument('--max-pages', type=int, default=None,
+                        help='Páginas nuevas por pasada; la siguiente continúa donde quedó')
+    parser.add_argument('--refresh-pages', type=int, default=REFRESH_PAGES,
+                        help='Páginas ya conocidas que se refrescan en cada pasada (seeds y peers)')
+    parser.add_argument('--interval', type=int, default=0,
+                        help='Segundos entre sincronizaciones (0 = una sola vez)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    catalog = CatalogMirror()
+
+    while True:
+        try:
+            catalog.sync(max_pages=args.max_pages, refresh_pages=args.refresh_pages)
+        except Exception as e:
+            logger.error(f"Error sincronizando catálogo: {e}")
+            if not args.interval:
+                sys.exit(1)
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
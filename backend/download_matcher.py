@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Emparejado de torrents completados con descargas pendientes
+
+El hook conoce el hash del torrent, así que primero se busca por info_hash.
+Si no hay hash (o no coincide), el nombre del release se normaliza a tokens
+de título más año y se buscan candidatas en un índice invertido
+(token, año) -> descargas. Solo se puntúan esas candidatas (similitud de Dice
+sobre los tokens del título) y se acepta la mejor si supera un umbral; un
+año distinto descarta la candidata. Como cualquier candidata válida comparte
+varios tokens con el release, basta con recorrer las listas de los tokens
+más raros. El índice se mantiene al añadir, terminar o borrar descargas, así
+que el coste no crece con la tabla.
+"""
+import re
+import math
+import threading
+import unicodedata
+
+MATCH_THRESHOLD = 0.75
+
+# Palabras que no distinguen títulos (y que dispararían listas enormes en el índice)
+STOPWORDS = frozenset([
+    'the', 'a', 'an', 'of', 'and', 'in', 'on', 'at', 'to', 'for',
+    'el', 'la', 'los', 'las', 'de', 'del', 'y', 'en', 'un', 'una',
+])
+# Marcadores de release: a partir del primero ya no es título
+RELEASE_MARKERS = re.compile(
+    r'^(480p|720p|1080p|2160p|4k|uhd|hdr|bluray|bdrip|brrip|web|webrip|web-dl|webdl|hdtv|dvdrip|'
+    r'x264|x265|h264|h265|hevc|10bit|aac|dts|yts|yify|rarbg|proper|repack|extended|remastered)$'
+)
+YEAR = re.compile(r'^(19|20)\d{2}$')
+
+
+def normalize_tokens(text):
+    """Minúsculas, sin acentos, partido por lo que no sea letra o número"""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    return [token for token in re.split(r'[^a-z0-9]+', text) if token]
+
+
+def parse_release(name):
+    """'Heat.1995.1080p.BluRay.x264-[YTS.MX]' -> ({'heat'}, 1995)
+
+    El título termina en el año o en el primer marcador de release. Un año
+    como primer token es parte del título ("1917", "2012").
+    """
+    title, year = [], None
+    for position, token in enumerate(normalize_tokens(name)):
+        if YEAR.match(token) and position > 0:
+            year = int(token)
+            break
+        if RELEASE_MARKERS.match(token):
+            break
+        title.append(token)
+    return title_tokens(title), year
+
+
+def title_tokens(tokens):
+    significant = {t for t in tokens if t not in STOPWORDS}
+    # Un título hecho solo de palabras vacías ("The One") las conserva
+    return significant or set(tokens)
+
+
+def parse_year(value):
+    try:
+        return int(str(value)[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def similarity(title, release):
+    """Coeficiente de Dice entre los tokens del título y los del release"""
+    if not title or not release:
+        return 0.0
+    return 2 * len(title & release) / (len(title) + len(release))
+
+
+class DownloadMatcher:
+    """Índice invertido de títulos de descargas activas"""
+
+    def __init__(self, threshold=MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._entries = {}   # download_id -> (tokens, año)
+        self._postings = {}  # (token, año o None) -> {download_id}
+        self._years = {}     # token -> {año o None} con lista en _postings
+        self._lock = threading.Lock()
+        self.built = False
+        self._stats = {'matches': 0, 'candidates_scored': 0, 'rejected': 0}
+
+    def build(self, downloads):
+        """downloads: iterable de (id, título, año)"""
+        with self._lock:
+            self._entries, self._postings, self._years = {}, {}, {}
+            for download_id, title, year in downloads:
+                self._add(download_id, title, year)
+            self.built = True
+
+    def _add(self, download_id, title, year):
+        self._discard(download_id)
+        tokens = title_tokens(normalize_tokens(title))
+        year = parse_year(year)
+        self._entries[download_id] = (tokens, year)
+        for token in tokens:
+            self._postings.setdefault((token, year), set()).add(download_id)
+            self._years.setdefault(token, set()).add(year)
+
+    def _discard(self, download_id):
+        entry = self._entries.pop(download_id, None)
+        if entry is None:
+            return
+        tokens, year = entry
+        for token in tokens:
+            ids = self._postings.get((token, year))
+            if ids is not None:
+                ids.discard(download_id)
+                if not ids:
+                    del self._postings[(token, year)]
+                    self._years[token].discard(year)
+                    if not self._years[token]:
+                        del self._years[token]
+
+    def add(self, download_id, title, year=None):
+        with self._lock:
+            if self.built:
+                self._add(download_id, title, year)
+
+    def discard(self, download_id):
+        with self._lock:
+            self._discard(download_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lists(self, token, year):
+        """Listas del token compatibles con el año del release"""
+        years = (year, None) if year else self._years.get(token, ())
+        return [ids for ids in (self._postings.get((token, y)) for y in years) if ids]
+
+    def candidates(self, torrent_name):
+        """[(puntuación, download_id)] de mayor a menor, ya filtradas por umbral"""
+        release, year = parse_release(torrent_name)
+        with self._lock:
+            lists = sorted((self._lists(token, year) for token in release),
+                           key=lambda sets: sum(len(ids) for ids in sets))
+            # Dice >= umbral exige compartir al menos min_shared tokens (el
+            # título tiene como mínimo uno): alguno está entre los más raros
+            min_shared = max(1, math.ceil(self.threshold * (len(release) + 1) / 2))
+            ids = set()
+            for sets in lists[:len(release) - min_shared + 1]:
+                for posting in sets:
+                    ids.update(posting)
+            scored = []
+            for download_id in ids:
+                tokens, download_year = self._entries[download_id]
+                if year and download_year and year != download_year:
+                    continue
+                score = similarity(tokens, release)
+                if score >= self.threshold:
+                    scored.append((round(score, 4), download_id))
+            self._stats['candidates_scored'] += len(ids)
+            self._stats['matches' if scored else 'rejected'] += 1
+        # A igual puntuación, la descarga más antigua
+        return sorted(scored, key=lambda item: (-item[0], item[1]))
+
+    def match(self, torrent_name):
+        """Id de la mejor descarga para el release o None"""
+        scored = self.candidates(torrent_name)
+        return scored[0][1] if scored else None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, indexed=len(self._entries), tokens=len(self._years))
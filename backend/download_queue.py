@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Reparto justo de las descargas activas entre usuarios
+
+Con un límite global y otro por usuario, los huecos se reparten por turnos
+(round-robin, opcionalmente ponderado) para que quien añade 40 películas no
+deje esperando al que añadió una. El planificador es puro: recibe el estado
+y devuelve qué arrancar, qué parar y la posición en cola de cada descarga.
+"""
+from collections import OrderedDict
+
+GLOBAL_CAP = 4
+PER_USER_CAP = 2
+
+
+class QueueItem:
+    """Descarga candidata: running indica si su torrent está en marcha ahora"""
+
+    def __init__(self, download_id, user_id, info_hash, added_at, running):
+        self.download_id = download_id
+        self.user_id = user_id
+        self.info_hash = info_hash
+        self.added_at = added_at
+        self.running = running
+
+
+class QueuePlan:
+    """Resultado de planificar: hashes a arrancar/parar y posiciones en cola"""
+
+    def __init__(self, start, stop, positions, active):
+        self.start = start
+        self.stop = stop
+        self.positions = positions  # download_id -> posición (None si está activa)
+        self.active = active
+
+    def to_dict(self):
+        return {'start': self.start, 'stop': self.stop, 'active': self.active,
+                'queued': sorted((p, d) for d, p in self.positions.items() if p is not None)}
+
+
+class FairShareScheduler:
+    """Round-robin ponderado entre usuarios con límite global y por usuario"""
+
+    def __init__(self, global_cap=GLOBAL_CAP, per_user_cap=PER_USER_CAP, weights=None):
+        self.global_cap = global_cap
+        self.per_user_cap = per_user_cap
+        self.weights = weights or {}
+
+    def service_order(self, items):
+        """Orden en que se atenderían las descargas
+
+        Dentro de cada usuario, primero las que ya corren (evita arrancar y
+        parar sin motivo) y luego por antigüedad. Entre usuarios, por turnos,
+        empezando por quien lleva más tiempo esperando.
+        """
+        by_user = OrderedDict()
+        for item in sorted(items, key=lambda i: (not i.running, i.added_at, i.download_id)):
+            by_user.setdefault(item.user_id, []).append(item)
+        users = sorted(by_user, key=lambda u: (min(i.added_at for i in by_user[u]), u))
+
+        order = []
+        while any(by_user[u] for u in users):
+            for user_id in users:
+                turn = max(int(self.weights.get(user_id, 1)), 1)
+                order.extend(by_user[user_id][:turn])
+                del by_user[user_id][:turn]
+        return order
+
+    def plan(self, items):
+        """Huecos por torrent: una descarga que comparte un torrent ya activo va con él
+
+        Esas descargas no ocupan hueco ni reciben posición en cola; la posición
+        es la de su torrent, así que las que esperan el mismo torrent comparten
+        posición.
+        """
+        active, waiting = [], []
+        active_hashes = OrderedDict()
+        per_user = {}
+        for item in self.service_order(items):
+            if item.info_hash in active_hashes:
+                active.append(item)
+            elif len(active_hashes) < self.global_cap and per_user.get(item.user_id, 0) < self.per_user_cap:
+                active.append(item)
+                active_hashes[item.info_hash] = None
+                per_user[item.user_id] = per_user.get(item.user_id, 0) + 1
+            else:
+                waiting.append(item)
+        # El torrent pudo activarse por otra descarga después de que esta quedara esperando
+        active.extend(item for item in waiting if item.info_hash in active_hashes)
+        waiting = [item for item in waiting if item.info_hash not in active_hashes]
+
+        queued = {h: position for position, h in enumerate(OrderedDict.fromkeys(i.info_hash for i in waiting), 1)}
+        positions = {item.download_id: None for item in active}
+        positions.update({item.download_id: queued[item.info_hash] for item in waiting})
+
+        running_hashes = {item.info_hash for item in items if item.running}
+        start = [h for h in active_hashes if h not in running_hashes]
+        stop = sorted(running_hashes - set(active_hashes))
+        return QueuePlan(start, stop, positions, [item.download_id for item in active])
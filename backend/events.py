@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Difusión en proceso de eventos de descargas para el stream SSE
+
+Un solo sondeo de Transmission publica los cambios una vez y el broker los
+reparte a todas las pestañas abiertas. Guarda un historial corto para que un
+navegador que se reconecta con Last-Event-ID recupere lo que se perdió.
+
+Los procesos propios (el monitor con sus eventos, el webhook de Transmission
+con lo completado) llaman a la web con un secreto compartido en la cabecera
+INTERNAL_TOKEN_HEADER.
+"""
+import os
+import json
+import time
+import queue
+import secrets
+import threading
+from collections import deque
+
+EVENT_HISTORY = 1000
+SUBSCRIBER_QUEUE_SIZE = 256
+
+INTERNAL_TOKEN_HEADER = 'X-Internal-Token'
+INTERNAL_TOKEN_PATH = os.getenv(
+    'INTERNAL_TOKEN_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'internal_token')
+)
+
+
+def internal_token(path=INTERNAL_TOKEN_PATH):
+    """Secreto compartido entre procesos para las rutas internas
+
+    Se toma de INTERNAL_TOKEN; si no está definido, el primer proceso que lo
+    necesita genera uno en instance/ (solo legible por el usuario) y el resto
+    lo lee de ahí.
+    """
+    token = os.getenv('INTERNAL_TOKEN')
+    if token:
+        return token
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp_path, path)  # Atómico: si otro proceso se adelantó, vale el suyo
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(path) as f:
+        return f.read().strip()
+
+
+class Event:
+    def __init__(self, event_id, user_id, event_type, data):
+        self.id = event_id
+        self.user_id = user_id
+        self.type = event_type
+        self.data = data
+
+    def encode(self):
+        """Formato text/event-stream"""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """Cola de eventos de un cliente; user_id None recibe los de todos"""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, event):
+        return self.user_id is None or event.user_id == self.user_id
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Cliente demasiado lento: se corta y al reconectar recupera desde el historial
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Siguiente evento o None si no llegó ninguno en timeout segundos"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """Publicación/suscripción en memoria con ids crecientes e historial"""
+
+    def __init__(self, history=EVENT_HISTORY, clock=time.time):
+        # Ids basados en el reloj: siguen creciendo aunque se reinicie el proceso
+        self._next_id = int(clock() * 1000)
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._published = 0
+
+    def publish(self, user_id, event_type, data):
+        with self._lock:
+            event = Event(self._next_id, user_id, event_type, data)
+            self._next_id += 1
+            self._history.append(event)
+            self._published += 1
+            subscribers = [s for s in self._subscribers if s.wants(event)]
+        for subscription in subscribers:
+            subscription.offer(event)
+        return event.id
+
+    def subscribe(self, user_id=None, last_event_id=None):
+        """Suscribe un cliente y devuelve (suscripción, eventos perdidos, resync)
+
+        resync es True si Last-Event-ID es más antiguo que el historial y el
+        cliente debe recargar el estado completo.
+        """
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if last_event_id is None:
+                return subscription, [], False
+            oldest = self._history[0].id if self._history else self._next_id
+            missed = [e for e in self._history if e.id > last_event_id and subscription.wants(e)]
+        return subscription, missed, last_event_id < oldest - 1
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'published': self._published,
+                    'history': len(self._history), 'last_event_id': self._next_id - 1}
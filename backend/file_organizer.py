@@ -5,6 +5,8 @@ Se ejecuta cuando termina una descarga
 """
 import os
 import re
+import sys
+import stat
 import shutil
 import logging
 from pathlib import Path
@@ -16,11 +18,109 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v')
+SUBTITLE_EXTENSIONS = ('.srt', '.sub', '.ass', '.ssa', '.vtt')
+# Vídeos que no son la película (por nombre o por la carpeta en la que están)
+EXTRA_MARKERS = re.compile(r'\b(sample|trailer|extras?|featurettes?|behind[ ._-]the[ ._-]scenes|deleted[ ._-]scenes)\b',
+                           re.IGNORECASE)
+
+class ContentManifest:
+    """Contenido de un torrent leído en una sola pasada
+
+    syscalls cuenta las llamadas al sistema de archivos: una stat de la ruta,
+    un scandir por carpeta y una stat por archivo (DirEntry.stat() la cachea).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.is_dir = False
+        self.main_video = None
+        self.main_size = 0
+        self.extension = '.mp4'
+        self.subtitles = []   # Rutas de subtítulos
+        self.extras = []      # Muestras, tráilers y extras
+        self.other_files = []
+        self.total_size = 0
+        self.file_count = 0
+        self.syscalls = {'stat': 0, 'scandir': 0}
+
+    def to_dict(self):
+        return {
+            'path': self.path,
+            'is_dir': self.is_dir,
+            'main_video': self.main_video,
+            'main_size': self.main_size,
+            'extension': self.extension,
+            'subtitles': self.subtitles,
+            'extras': self.extras,
+            'other_files': self.other_files,
+            'total_size': self.total_size,
+            'file_count': self.file_count,
+            'syscalls': dict(self.syscalls),
+        }
+
+
+def inspect_content(path):
+    """Recorre path una sola vez con os.scandir y devuelve su ContentManifest
+
+    El vídeo principal es el más grande que no sea un extra (si todos lo
+    parecen, el más grande). Lanza FileNotFoundError si path no existe.
+    """
+    manifest = ContentManifest(path)
+    manifest.syscalls['stat'] += 1
+    info = os.stat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        _, ext = os.path.splitext(path)
+        manifest.main_video, manifest.main_size = path, info.st_size
+        manifest.extension = ext if ext.lower() in VIDEO_EXTENSIONS else '.mp4'
+        manifest.total_size, manifest.file_count = info.st_size, 1
+        return manifest
+
+    manifest.is_dir = True
+    videos = []
+    pending = [(path, False)]
+    while pending:
+        directory, in_extras = pending.pop()
+        manifest.syscalls['scandir'] += 1
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append((entry.path, in_extras or bool(EXTRA_MARKERS.search(entry.name))))
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    manifest.syscalls['stat'] += 1
+                    try:
+                        size = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+                    manifest.total_size += size
+                    manifest.file_count += 1
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if ext in VIDEO_EXTENSIONS:
+                        extra = in_extras or bool(EXTRA_MARKERS.search(entry.name))
+                        videos.append((not extra, size, entry.path))
+                    elif ext in SUBTITLE_EXTENSIONS:
+                        manifest.subtitles.append(entry.path)
+                    else:
+                        manifest.other_files.append(entry.path)
+        except OSError as e:
+            logger.warning(f"⚠️  No se pudo leer {directory}: {e}")
+
+    if videos:
+        _, manifest.main_size, manifest.main_video = max(videos)
+        manifest.extension = os.path.splitext(manifest.main_video)[1]
+        manifest.extras = sorted(p for _, _, p in videos if p != manifest.main_video)
+    manifest.subtitles.sort()
+    return manifest
+
 class FileOrganizer:
-    def __init__(self):
-        self.download_dir = "/downloads/complete"
+    def __init__(self, download_dir="/downloads/complete", organized_dir="/downloads/movies"):
+        self.download_dir = download_dir
         self.incomplete_dir = "/downloads/incomplete"
-        self.organized_dir = "/downloads/movies"  # Nueva carpeta organizada
+        self.organized_dir = organized_dir  # Nueva carpeta organizada
+        self.last_manifest = None  # Contenido de la última descarga organizada
         
         # Crear directorio organizado si no existe
         os.makedirs(self.organized_dir, exist_ok=True)
@@ -136,71 +236,58 @@ class FileOrganizer:
     
     def get_file_extension(self, filepath):
         """Obtiene la extensión del archivo de video principal"""
-        video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v']
-        
-        if os.path.isfile(filepath):
-            _, ext = os.path.splitext(filepath)
-            return ext if ext.lower() in video_extensions else '.mp4'
-        
-        # Si es un directorio, buscar el archivo de video más grande
-        if os.path.isdir(filepath):
-            largest_file = None
-            largest_size = 0
-            
-            for root, dirs, files in os.walk(filepath):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    _, ext = os.path.splitext(file)
-                    
-                    if ext.lower() in video_extensions:
-                        file_size = os.path.getsize(file_path)
-                        if file_size > largest_size:
-                            largest_size = file_size
-                            largest_file = file_path
-            
-            if largest_file:
-                _, ext = os.path.splitext(largest_file)
-                return ext
-        
-        return '.mp4'  # Default
+        try:
+            return inspect_content(filepath).extension
+        except OSError:
+            return '.mp4'  # Default
     
     def organize_completed_download(self, torrent_name, torrent_dir):
-        """Organiza el archivo/directorio completado"""
+        """Organiza el archivo/directorio completado
+
+        Cada película va a su propia carpeta "Nombre (Año) [Calidad]/", así
+        Plex puede escanear solo esa carpeta. Devuelve la ruta final del
+        archivo (para el escaneo parcial) o False si no se pudo organizar.
+        """
         try:
             source_path = os.path.join(torrent_dir, torrent_name)
             
-            if not os.path.exists(source_path):
+            # Una sola pasada por el contenido; todas las decisiones salen de aquí
+            try:
+                manifest = inspect_content(source_path)
+            except FileNotFoundError:
                 logger.error(f"❌ Archivo fuente no encontrado: {source_path}")
                 return False
+            self.last_manifest = manifest
+            logger.info(f"🔎 {manifest.file_count} archivos, {manifest.total_size} bytes "
+                        f"({manifest.syscalls['scandir']} scandir, {manifest.syscalls['stat']} stat)")
             
             # Limpiar nombre
             clean_name = self.clean_movie_name(torrent_name)
-            extension = self.get_file_extension(source_path)
+            extension = manifest.extension
             
-            # Nombre final del archivo
+            # Nombre final del archivo, en su propia carpeta
             final_filename = f"{clean_name}{extension}"
-            destination_path = os.path.join(self.organized_dir, final_filename)
+            movie_dir = os.path.join(self.organized_dir, clean_name)
+            os.makedirs(movie_dir, exist_ok=True)
+            destination_path = os.path.join(movie_dir, final_filename)
             
             logger.info(f"📁 Organizando: {torrent_name}")
             logger.info(f"➡️  Nuevo nombre: {final_filename}")
             
             # Si es un archivo único, simplemente moverlo y renombrarlo
-            if os.path.isfile(source_path):
+            if not manifest.is_dir:
                 shutil.move(source_path, destination_path)
                 logger.info(f"✅ Archivo movido a: {destination_path}")
                 
             # Si es un directorio con múltiples archivos
-            elif os.path.isdir(source_path):
-                # Buscar el archivo de video principal
-                main_video_file = self.find_main_video_file(source_path)
-                
-                if main_video_file:
-                    # Mover solo el archivo principal
-                    shutil.move(main_video_file, destination_path)
+            else:
+                if manifest.main_video:
+                    # Mover solo el archivo principal (muestras y extras se descartan)
+                    shutil.move(manifest.main_video, destination_path)
                     logger.info(f"✅ Archivo principal movido a: {destination_path}")
                     
                     # Opcional: mover subtítulos si existen
-                    self.move_subtitles(source_path, clean_name)
+                    self.move_subtitles(manifest, clean_name, movie_dir)
                     
                     # Eliminar directorio vacío o con archivos no necesarios
                     try:
@@ -212,7 +299,7 @@ class FileOrganizer:
                     logger.error(f"❌ No se encontró archivo de video en: {source_path}")
                     return False
             
-            return True
+            return destination_path
             
         except Exception as e:
             logger.error(f"❌ Error organizando descarga: {e}")
@@ -220,42 +307,19 @@ class FileOrganizer:
     
     def find_main_video_file(self, directory):
         """Encuentra el archivo de video principal en un directorio"""
-        video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v']
-        largest_file = None
-        largest_size = 0
-        
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                _, ext = os.path.splitext(file)
-                
-                if ext.lower() in video_extensions:
-                    try:
-                        file_size = os.path.getsize(file_path)
-                        if file_size > largest_size:
-                            largest_size = file_size
-                            largest_file = file_path
-                    except:
-                        continue
-        
-        return largest_file
+        return inspect_content(directory).main_video
     
-    def move_subtitles(self, source_dir, clean_name):
+    def move_subtitles(self, manifest, clean_name, movie_dir):
         """Mueve archivos de subtítulos si existen"""
-        subtitle_extensions = ['.srt', '.sub', '.ass', '.ssa', '.vtt']
-        
-        for root, dirs, files in os.walk(source_dir):
-            for file in files:
-                _, ext = os.path.splitext(file)
-                if ext.lower() in subtitle_extensions:
-                    source_sub = os.path.join(root, file)
-                    dest_sub = os.path.join(self.organized_dir, f"{clean_name}{ext}")
-                    
-                    try:
-                        shutil.copy2(source_sub, dest_sub)
-                        logger.info(f"📝 Subtítulos copiados: {dest_sub}")
-                    except Exception as e:
-                        logger.warning(f"⚠️  Error copiando subtítulos: {e}")
+        for source_sub in manifest.subtitles:
+            _, ext = os.path.splitext(source_sub)
+            dest_sub = os.path.join(movie_dir, f"{clean_name}{ext}")
+            
+            try:
+                shutil.copy2(source_sub, dest_sub)
+                logger.info(f"📝 Subtítulos copiados: {dest_sub}")
+            except Exception as e:
+                logger.warning(f"⚠️  Error copiando subtítulos: {e}")
 
 def main():
     """Función principal"""
@@ -273,11 +337,11 @@ def main():
     success = organizer.organize_completed_download(torrent_name, torrent_dir)
     
     if success:
-        logger.info("🎉 ¡Organización completada exitosamente!")
+        logger.info(f"🎉 ¡Organización completada exitosamente! {success}")
     else:
         logger.error("❌ Error en la organización")
     
     return success
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Estado de los servicios externos servido desde una instantánea
+
+Cada servicio (Transmission, Plex) tiene una sonda que se ejecuta en segundo
+plano como mucho una vez cada TTL, sin importar cuántas pestañas pregunten.
+Con start() un hilo la mantiene al día aunque nadie pregunte, así la primera
+visita tras arrancar o tras un rato sin tráfico ya encuentra datos. Las
+peticiones devuelven siempre la última instantánea sin esperar a la red: si
+está caducada se pide una sonda nueva y se responde con lo que hay. Si las
+sondas dejan de responder, pasado MAX_AGE el servicio se marca como
+desactualizado en lugar de seguir dando por bueno un estado viejo.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+HEALTH_TTL = float(os.getenv('HEALTH_TTL', '30'))  # Segundos que vale una sonda
+HEALTH_MAX_AGE = float(os.getenv('HEALTH_MAX_AGE', '300'))  # A partir de aquí, 'stale'
+
+
+class HealthMonitor:
+    """Instantánea del estado de cada servicio, refrescada en segundo plano
+
+    probes: {nombre: función sin argumentos que devuelve un dict con detalles
+    (p. ej. version) o lanza una excepción si el servicio no responde}.
+    Con background=False la sonda corre dentro de snapshot() (tests).
+    """
+
+    def __init__(self, probes, ttl=HEALTH_TTL, max_age=HEALTH_MAX_AGE, clock=time.time, background=True):
+        self.probes = probes
+        self.ttl = ttl
+        self.max_age = max_age
+        self.clock = clock
+        self.background = background
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._state = {name: {'status': 'unknown', 'version': None, 'latency_ms': None, 'last_error': None,
+                              'last_error_at': None, 'checked_at': None} for name in probes}
+        self._stats = {'probes': 0, 'failures': 0}
+        self._keeper = None
+
+    def _probe(self, name):
+        start = time.perf_counter()
+        try:
+            details = self.probes[name]() or {}
+            error = None
+        except Exception as e:
+            details, error = {}, str(e)
+        latency_ms = round((time.perf_counter() - start) * 1000, 1)
+        now = self.clock()
+        with self._lock:
+            state = self._state[name]
+            state.update(details, status='down' if error else 'up', latency_ms=latency_ms, checked_at=now)
+            if error:
+                state.update(last_error=error, last_error_at=now)
+                self._stats['failures'] += 1
+            self._stats['probes'] += 1
+            self._in_flight.discard(name)
+        if error:
+            logger.warning(f"{name} no responde: {error}")
+
+    def refresh(self, names=None, wait=False):
+        """Lanza las sondas caducadas (o las de names) sin repetir las que ya están en curso"""
+        now = self.clock()
+        with self._lock:
+            due = [name for name in (names or self.probes)
+                   if name not in self._in_flight and (names or self._is_due(name, now))]
+            self._in_flight.update(due)
+        for name in due:
+            if self.background and not wait:
+                threading.Thread(target=self._probe, args=(name,), name=f'health-{name}', daemon=True).start()
+            else:
+                self._probe(name)
+        return due
+
+    def start(self):
+        """Arranca el hilo que refresca las sondas caducadas sin esperar a las peticiones"""
+        if self._keeper is None and self.background:
+            self._keeper = threading.Thread(target=self._keep_warm, name='health-keeper', daemon=True)
+            self._keeper.start()
+        return self
+
+    def _keep_warm(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refrescando el estado de los servicios: {e}")
+            # Medio TTL: una sonda que acaba justo después del tic no espera dos TTL
+            time.sleep(self.ttl / 2)
+
+    def _is_due(self, name, now):
+        checked_at = self._state[name]['checked_at']
+        return checked_at is None or now - checked_at >= self.ttl
+
+    def snapshot(self):
+        """Estado actual de todos los servicios; nunca espera a una sonda en segundo plano"""
+        self.refresh()
+        now = self.clock()
+        with self._lock:
+            services = {}
+            for name, state in self._state.items():
+                service = dict(state)
+                service['stale'] = state['checked_at'] is None or now - state['checked_at'] >= self.max_age
+                service['age'] = round(now - state['checked_at'], 1) if state['checked_at'] is not None else None
+                services[name] = service
+        return {'ok': all(s['status'] == 'up' and not s['stale'] for s in services.values()), 'services': services}
+
+    @staticmethod
+    def etag(snapshot):
+        """Para un ETag débil: solo cambia si cambia el estado, la versión o el último error"""
+        fingerprint = {name: [s['status'], s['version'], s['last_error'], s['stale']]
+                       for name, s in snapshot['services'].items()}
+        return hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:16]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=sorted(self._in_flight))
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Cliente HTTP compartido para los servicios externos (YTS, Transmission, Plex)
+
+Cada servicio tiene su propio pool de conexiones keep-alive, timeouts por
+defecto, reintentos acotados con jitter y un circuit breaker que falla
+rápido mientras el servicio está caído.
+"""
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (3.05, 15)  # (conexión, lectura) en segundos
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+# Configuración por servicio; se puede ajustar con configure()
+UPSTREAMS = {
+    'yts': {'timeout': (3.05, 15), 'retries': 2},
+    'posters': {'timeout': (3.05, 10), 'retries': 1},
+    'transmission': {'timeout': (3.05, 10), 'retries': 1},
+    'plex': {'timeout': (3.05, 10), 'retries': 1},
+    'flask': {'timeout': (3.05, 10), 'retries': 0},
+}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """El circuito del servicio está abierto: no se intenta la petición"""
+
+
+class CircuitBreaker:
+    """Circuit breaker clásico: cerrado -> abierto -> semiabierto"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._state = self.CLOSED
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def allow(self):
+        """Indica si se puede intentar una petición"""
+        with self._lock:
+            return self._current_state() != self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._current_state() == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self.opened_at = self.clock()
+
+
+class UpstreamClient:
+    """Cliente con pool, timeouts, reintentos y circuit breaker para un servicio"""
+
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT, retries=1, backoff=0.3, pool_size=10,
+                 failure_threshold=5, reset_timeout=30, auth=None):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        self.session.auth = auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=200)
+        self._counters = {
+            'requests': 0,
+            'errors': 0,
+            'retries': 0,
+            'short_circuited': 0,
+            'bytes_received': 0,
+        }
+        self.last_error = None
+
+    def _sleep_before_retry(self, attempt):
+        # Backoff exponencial con jitter para no sincronizar reintentos
+        time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def _record(self, latency, error=None, nbytes=0):
+        with self._lock:
+            self._counters['requests'] += 1
+            self._counters['bytes_received'] += nbytes
+            self._latencies.append(latency)
+            if error is not None:
+                self._counters['errors'] += 1
+                self.last_error = error
+
+    def request(self, method, url, retry=None, **kwargs):
+        """Petición HTTP con timeout por defecto, reintentos y circuit breaker
+
+        Solo se reintentan métodos idempotentes salvo que se indique retry=True.
+        Los errores de red y las respuestas 5xx cuentan como fallos del servicio.
+        """
+        method = method.upper()
+        kwargs.setdefault('timeout', self.timeout)
+        can_retry = retry if retry is not None else method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.retries if can_retry else 0)
+
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                with self._lock:
+                    self._counters['short_circuited'] += 1
+                raise CircuitOpenError(f"Circuito abierto para {self.name}")
+
+            if attempt:
+                with self._lock:
+                    self._counters['retries'] += 1
+
+            start = time.monotonic()
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._record(time.monotonic() - start, error=str(e))
+                self.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise
+                logger.warning(f"Error en {self.name} ({e}), reintentando...")
+                self._sleep_before_retry(attempt)
+                continue
+
+            latency = time.monotonic() - start
+            if resp.status_code >= 500:
+                self._record(latency, error=f"HTTP {resp.status_code}", nbytes=len(resp.content))
+                self.breaker.record_failure()
+                if attempt + 1 < attempts:
+                    self._sleep_before_retry(attempt)
+                    continue
+                return resp
+
+            self._record(latency, nbytes=len(resp.content))
+            self.breaker.record_success()
+            return resp
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            latencies = sorted(self._latencies)
+            last_error = self.last_error
+        stats['state'] = self.breaker.state
+        stats['last_error'] = last_error
+        if latencies:
+            stats['latency_avg_ms'] = round(1000 * sum(latencies) / len(latencies), 1)
+            stats['latency_p95_ms'] = round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 1)
+        else:
+            stats['latency_avg_ms'] = None
+            stats['latency_p95_ms'] = None
+        return stats
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def configure(name, **options):
+    """Ajusta la configuración de un servicio (antes de su primer uso)"""
+    with _clients_lock:
+        UPSTREAMS.setdefault(name, {}).update(options)
+        _clients.pop(name, None)
+
+
+def get_client(name):
+    """Devuelve el cliente compartido de un servicio, creándolo si hace falta"""
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = UpstreamClient(name, **UPSTREAMS.get(name, {}))
+            _clients[name] = client
+        return client
+
+
+def all_stats():
+    """Estadísticas de latencia y errores de todos los servicios usados"""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {client.name: client.stats() for client in clients}
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Cola de trabajos persistente en SQLite con un pool de workers
+
+El webhook de Transmission solo encola (un INSERT) y termina; los workers
+toman cada trabajo con un lease que renuevan mientras trabajan. Si un
+worker muere, el lease caduca y otro lo retoma. Los fallos se reintentan
+con backoff exponencial y, agotados los intentos, el trabajo queda en la
+cola de muertos (dead) para revisarlo y reintentarlo desde /api/jobs.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_PATH = os.getenv(
+    'JOB_QUEUE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'jobs.db')
+)
+LEASE_SECONDS = 300
+HEARTBEAT_INTERVAL = 30
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 30
+MAX_BACKOFF = 3600
+DONE_RETENTION = 7 * 24 * 3600  # Los trabajos terminados se borran a la semana
+
+STATUSES = ('queued', 'running', 'done', 'dead')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    dedupe_key TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, run_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key, status);
+"""
+
+
+class PermanentJobError(Exception):
+    """Fallo que no se arregla reintentando: el trabajo pasa directo a dead"""
+
+
+class LeaseLost(Exception):
+    """Otro worker tomó el trabajo (el lease caducó)"""
+
+
+class Job:
+    def __init__(self, queue, row, owner=None):
+        self.queue = queue
+        self.owner = owner
+        self.id = row['id']
+        self.kind = row['kind']
+        self.payload = json.loads(row['payload'])
+        self.status = row['status']
+        self.dedupe_key = row['dedupe_key']
+        self.attempts = row['attempts']
+        self.max_attempts = row['max_attempts']
+        self.run_at = row['run_at']
+        self.lease_owner = row['lease_owner']
+        self.lease_expires = row['lease_expires']
+        self.last_error = row['last_error']
+        self.created_at = row['created_at']
+        self.updated_at = row['updated_at']
+
+    def checkpoint(self, **fields):
+        """Guarda el avance en el payload: un reintento no repite lo ya hecho"""
+        self.payload.update(fields)
+        self.queue.save_payload(self.id, self.owner, self.payload)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'payload': self.payload,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at,
+            'lease_owner': self.lease_owner,
+            'lease_expires': self.lease_expires,
+            'last_error': self.last_error,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+        }
+
+
+class JobQueue:
+    """Trabajos en SQLite con lease, latido, reintentos y cola de muertos"""
+
+    def __init__(self, db_path=JOB_QUEUE_PATH, lease_seconds=LEASE_SECONDS, backoff=RETRY_BACKOFF,
+                 max_backoff=MAX_BACKOFF, clock=time.time):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _open(self):
+        # isolation_level=None: las transacciones se abren a mano con BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    @contextmanager
+    def _connect(self):
+        """Conexión para una sola sentencia; se cierra siempre al salir"""
+        conn = self._open()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, kind, payload, max_attempts=MAX_ATTEMPTS, dedupe_key=None, delay=0):
+        """Encola un trabajo y devuelve su id
+
+        Con dedupe_key, si ya hay uno igual pendiente o en curso se devuelve
+        ese (p. ej. Transmission lanzando dos veces el hook del mismo torrent).
+        """
+        now = self.clock()
+        conn = self._open()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if dedupe_key is not None:
+                row = conn.execute("SELECT id FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')",
+                                   (dedupe_key,)).fetchone()
+                if row:
+                    conn.execute('COMMIT')
+                    return row['id']
+            cursor = conn.execute(
+                'INSERT INTO jobs (kind, payload, dedupe_key, max_attempts, run_at, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (kind, json.dumps(payload), dedupe_key, max_attempts, now + delay, now, now))
+            conn.execute('COMMIT')
+            return cursor.lastrowid
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def lease(self, owner, kinds=None):
+        """Toma el siguiente trabajo listo (o con el lease caducado) o None"""
+        now = self.clock()
+        conn = self._open()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Leases caducados sin intentos restantes: el worker murió en el último
+            conn.execute(
+                "UPDATE jobs SET status = 'dead', lease_owner = NULL, updated_at = ?, "
+                "last_error = COALESCE(last_error, 'Lease caducado') "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts", (now, now))
+            sql = ("SELECT * FROM jobs WHERE ((status = 'queued' AND run_at <= ?) "
+                   "OR (status = 'running' AND lease_expires < ?))")
+            params = [now, now]
+            if kinds:
+                sql += f" AND kind IN ({', '.join('?' * len(kinds))})"
+                params.extend(kinds)
+            row = conn.execute(sql + ' ORDER BY run_at, id LIMIT 1', params).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ?, updated_at = ? WHERE id = ?",
+                (owner, now + self.lease_seconds, now, row['id']))
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+            conn.execute('COMMIT')
+            return Job(self, row, owner)
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _update_leased(self, job_id, owner, sql, params):
+        """UPDATE sobre un trabajo que este worker tiene en lease; False si lo perdió"""
+        with self._connect() as conn:
+            cursor = conn.execute(f"{sql} WHERE id = ? AND status = 'running' AND lease_owner = ?",
+                                  (*params, job_id, owner))
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id, owner):
+        now = self.clock()
+        return self._update_leased(job_id, owner, 'UPDATE jobs SET lease_expires = ?, updated_at = ?',
+                                   (now + self.lease_seconds, now))
+
+    def save_payload(self, job_id, owner, payload):
+        if not self._update_leased(job_id, owner, 'UPDATE jobs SET payload = ?, updated_at = ?',
+                                   (json.dumps(payload), self.clock())):
+            raise LeaseLost(f"Trabajo {job_id}: lease perdido")
+
+    def complete(self, job_id, owner):
+        return self._update_leased(
+            job_id, owner,
+            "UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires = NULL, last_error = NULL, "
+            "updated_at = ?", (self.clock(),))
+
+    def fail(self, job_id, owner, error, permanent=False):
+        """Registra un fallo: reintento con backoff o, sin intentos, a dead"""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        now = self.clock()
+        if permanent or job.attempts >= job.max_attempts:
+            return self._update_leased(
+                job_id, owner,
+                "UPDATE jobs SET status = 'dead', lease_owner = NULL, lease_expires = NULL, last_error = ?, "
+                "updated_at = ?", (str(error), now))
+        delay = min(self.backoff * 2 ** (job.attempts - 1), self.max_backoff)
+        return self._update_leased(
+            job_id, owner,
+            "UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires = NULL, last_error = ?, "
+            "run_at = ?, updated_at = ?", (str(error), now + delay, now))
+
+    def retry(self, job_id):
+        """Vuelve a encolar un trabajo muerto con los intentos a cero"""
+        now = self.clock()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, run_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'dead'", (now, now, job_id))
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return Job(self, row) if row else None
+
+    def list(self, status=None, limit=50):
+        sql, params = 'SELECT * FROM jobs', []
+        if status:
+            sql += ' WHERE status = ?'
+            params.append(status)
+        with self._connect() as conn:
+            rows = conn.execute(sql + ' ORDER BY id DESC LIMIT ?', (*params, limit)).fetchall()
+        return [Job(self, row) for row in rows]
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def purge(self, older_than=DONE_RETENTION):
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE status = 'done' AND updated_at < ?",
+                                  (self.clock() - older_than,))
+        return cursor.rowcount
+
+
+class WorkerPool:
+    """Hilos que consumen la cola; handlers: tipo de trabajo -> función(job)"""
+
+    def __init__(self, queue, handlers, size=2, poll_interval=1.0, heartbeat_interval=HEARTBEAT_INTERVAL):
+        self.queue = queue
+        self.handlers = handlers
+        self.size = size
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.owner_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats = {'processed': 0, 'succeeded': 0, 'failed': 0}
+
+    def _heartbeat(self, job, done):
+        while not done.wait(self.heartbeat_interval):
+            if not self.queue.heartbeat(job.id, job.owner):
+                logger.warning(f"Trabajo {job.id}: lease perdido")
+                return
+
+    def run_once(self, owner=None):
+        """Procesa un trabajo si hay alguno listo; devuelve si procesó algo"""
+        owner = owner or f"{self.owner_prefix}:{uuid.uuid4().hex[:6]}"
+        job = self.queue.lease(owner, kinds=list(self.handlers))
+        if job is None:
+            return False
+
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job, done), daemon=True)
+        beat.start()
+        try:
+            self.handlers[job.kind](job)
+        except Exception as e:
+            logger.error(f"Trabajo {job.id} ({job.kind}) falló en el intento {job.attempts}: {e}")
+            self.queue.fail(job.id, owner, e, permanent=isinstance(e, PermanentJobError))
+            ok = False
+        else:
+            self.queue.complete(job.id, owner)
+            ok = True
+        finally:
+            done.set()
+            beat.join()
+
+        with self._lock:
+            self._stats['processed'] += 1
+            self._stats['succeeded' if ok else 'failed'] += 1
+        return True
+
+    def _worker(self, index):
+        owner = f"{self.owner_prefix}:{index}"
+        while not self._stop.is_set():
+            try:
+                if self.run_once(owner):
+                    continue
+            except Exception as e:
+                logger.error(f"Error en el worker {owner}: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        for index in range(self.size):
+            thread = threading.Thread(target=self._worker, args=(index,), name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, workers=self.size)
@@ -43,11 +43,30 @@ class User(UserMixin):
             year = db.Column(db.String(4))
             rating = db.Column(db.String(10))
             magnet = db.Column(db.Text, nullable=False)
+            info_hash = db.Column(db.String(40), index=True)  # btih en hex minúsculas
             imdb_code = db.Column(db.String(20))
             download_date = db.Column(db.DateTime, default=datetime.utcnow)
             status = db.Column(db.String(20), default='pendiente')
+            # Último progreso conocido en Transmission (ver status_sync.ProgressWriter)
+            percent_done = db.Column(db.Float)
+            rate_download = db.Column(db.Integer)  # bytes/s
+            eta = db.Column(db.Integer)  # segundos
+            size_bytes = db.Column(db.BigInteger)
+            last_seen_at = db.Column(db.DateTime)
+            queue_position = db.Column(db.Integer)  # None si está activa (ver download_queue.py)
+            torrent_id = db.Column(db.Integer, db.ForeignKey('torrent.id'), index=True)
             user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
         
+        class Torrent(db.Model):
+            """Torrent compartido: varias descargas (de distintos usuarios) pueden apuntar a él"""
+            __tablename__ = 'torrent'
+            id = db.Column(db.Integer, primary_key=True)
+            info_hash = db.Column(db.String(40), unique=True, nullable=False, index=True)
+            magnet = db.Column(db.Text, nullable=False)
+            added_at = db.Column(db.DateTime, default=datetime.utcnow)
+            
+            downloads = db.relationship('Download', backref='torrent', lazy=True)
+        
         class MovieList(db.Model):
             __tablename__ = 'movie_list'
             id = db.Column(db.Integer, primary_key=True)
@@ -85,4 +104,4 @@ class User(UserMixin):
             # Índice único para evitar duplicados
             __table_args__ = (db.UniqueConstraint('requester_id', 'addressee_id', name='unique_friendship'),)
         
-        return UserModel, Download, MovieList, MovieListItem, Friendship
+        return UserModel, Download, MovieList, MovieListItem, Friendship, Torrent
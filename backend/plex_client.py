@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Cliente de Plex con la sección de películas cacheada y escaneos parciales
+
+La sección de películas y sus carpetas raíz se piden una vez y se reutilizan
+hasta que Plex responde con error. Cada actualización escanea solo la carpeta
+de lo que se organizó (?path=), así su coste depende del contenido nuevo y no
+del tamaño de la biblioteca.
+"""
+import os
+import re
+import logging
+import posixpath
+import threading
+import xml.etree.ElementTree as ET
+
+import http_client
+
+logger = logging.getLogger(__name__)
+
+# Rutas locales -> rutas que ve Plex, "local=plex" separadas por comas.
+# En docker-compose, /downloads/movies de Transmission es /movies en Plex
+PLEX_PATH_MAP = os.getenv('PLEX_PATH_MAP', '/downloads/movies=/movies')
+# Archivos que deja el organizador: se escanea la carpeta que los contiene
+MEDIA_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v',
+                    '.srt', '.sub', '.ass', '.ssa', '.vtt')
+
+
+IMDB_ID = re.compile(r'tt\d{7,}')
+
+
+class PlexError(Exception):
+    """Plex respondió con error o no tiene sección de películas"""
+
+
+def parse_path_map(spec):
+    """'a=b,c=d' -> [(a, b), (c, d)], las rutas más largas primero"""
+    pairs = []
+    for entry in (spec or '').split(','):
+        if '=' in entry:
+            local, plex = entry.split('=', 1)
+            pairs.append((posixpath.normpath(local.strip()), posixpath.normpath(plex.strip())))
+    return sorted(pairs, key=lambda pair: len(pair[0]), reverse=True)
+
+
+def is_within(path, root):
+    return path == root or path.startswith(root.rstrip('/') + '/')
+
+
+def parse_movie(video):
+    """<Video> de /library/sections/<id>/all -> dict con el código de IMDb
+
+    El agente nuevo pone el IMDb en los <Guid> hijos (includeGuids=1); el
+    antiguo lo lleva en el guid ("com.plexapp.agents.imdb://tt0113277?lang=en").
+    """
+    guids = [video.get('guid') or ''] + [guid.get('id') or '' for guid in video.findall('Guid')]
+    imdb = next((m.group(0) for m in (IMDB_ID.search(g) for g in guids if 'imdb' in g) if m), None)
+    part = video.find('Media/Part')
+    return {
+        'rating_key': video.get('ratingKey'),
+        'title': video.get('title'),
+        'year': int(video.get('year')) if (video.get('year') or '').isdigit() else None,
+        'guid': video.get('guid'),
+        'imdb_code': imdb,
+        'file': part.get('file') if part is not None else None,
+        'view_count': int(video.get('viewCount') or 0),
+        'updated_at': int(video.get('updatedAt') or 0),
+    }
+
+
+class PlexClient:
+    """Cliente de la biblioteca de películas de Plex"""
+
+    def __init__(self, url, token='', http=None, path_map=PLEX_PATH_MAP):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.http = http or http_client.get_client('plex')
+        self.path_map = parse_path_map(path_map) if isinstance(path_map, str) else list(path_map or [])
+        self._section = None
+        self._lock = threading.Lock()
+        self._stats = {'section_lookups': 0, 'full_scans': 0, 'partial_scans': 0, 'library_pages': 0, 'errors': 0}
+
+    def _get(self, path, params=None):
+        headers = {'X-Plex-Token': self.token} if self.token else {}
+        try:
+            resp = self.http.get(f"{self.url}{path}", headers=headers, params=params)
+            if resp.status_code != 200:
+                raise PlexError(f"{path}: HTTP {resp.status_code}")
+        except Exception:
+            # La sección pudo cambiar (Plex reinstalado, biblioteca recreada): se vuelve a pedir
+            self.invalidate()
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        return resp
+
+    def sections(self):
+        """Secciones de la biblioteca con sus carpetas raíz"""
+        root = ET.fromstring(self._get('/library/sections').content)
+        return [{
+            'key': directory.get('key'),
+            'type': directory.get('type'),
+            'title': directory.get('title'),
+            'locations': [posixpath.normpath(location.get('path')) for location in directory.findall('Location')],
+        } for directory in root.findall('.//Directory')]
+
+    def movie_section(self, refresh=False):
+        """Sección de películas (cacheada hasta el siguiente error)"""
+        with self._lock:
+            section = self._section
+        if section is not None and not refresh:
+            return section
+        with self._lock:
+            self._stats['section_lookups'] += 1
+        section = next((s for s in self.sections() if s['type'] == 'movie'), None)
+        if section is None:
+            raise PlexError("No se encontró sección de películas en Plex")
+        with self._lock:
+            self._section = section
+        return section
+
+    def identity(self):
+        """Versión e identificador del servidor (la petición más barata de Plex)"""
+        root = ET.fromstring(self._get('/identity').content)
+        return {'version': root.get('version'), 'machine_identifier': root.get('machineIdentifier')}
+
+    def movies(self, section_key=None, updated_since=None):
+        """Películas de la sección; con updated_since solo las modificadas después"""
+        section_key = section_key or self.movie_section()['key']
+        params = {'includeGuids': 1}
+        if updated_since:
+            params['updatedAt>>'] = int(updated_since)
+        root = ET.fromstring(self._get(f"/library/sections/{section_key}/all", params=params).content)
+        with self._lock:
+            self._stats['library_pages'] += 1
+        return [parse_movie(video) for video in root.findall('Video')]
+
+    def invalidate(self):
+        with self._lock:
+            self._section = None
+
+    def to_plex_path(self, path):
+        """Traduce una ruta local a como la ve Plex según PLEX_PATH_MAP"""
+        path = posixpath.normpath(path)
+        for local, plex in self.path_map:
+            if is_within(path, local):
+                return plex + path[len(local):]
+        return path
+
+    def scan_folder(self, path, section):
+        """Carpeta a escanear para path, o None si no está en la sección"""
+        folder = self.to_plex_path(path)
+        if folder.lower().endswith(MEDIA_EXTENSIONS):
+            folder = posixpath.dirname(folder)
+        if any(is_within(folder, location) for location in section['locations']):
+            return folder
+        return None
+
+    def refresh(self, paths=None):
+        """Escanea las carpetas de paths o, sin ellas, la sección entera
+
+        Devuelve el número de escaneos pedidos a Plex. Una ruta fuera de las
+        carpetas de la sección obliga a volver a leer las secciones y, si aun
+        así no encaja, a escanear la sección completa.
+        """
+        section = self.movie_section()
+        folders = set()
+        for path in paths or []:
+            folder = self.scan_folder(path, section)
+            if folder is None:
+                section = self.movie_section(refresh=True)
+                folder = self.scan_folder(path, section)
+            if folder is None:
+                logger.warning(f"{path} no está en la sección de películas de Plex; se escanea completa")
+            if folder is None or folder in section['locations']:
+                # No hay nada más pequeño que escanear que la sección entera
+                folders = set()
+                break
+            folders.add(folder)
+
+        if not folders:
+            self._get(f"/library/sections/{section['key']}/refresh")
+            with self._lock:
+                self._stats['full_scans'] += 1
+            return 1
+
+        for folder in sorted(folders):
+            self._get(f"/library/sections/{section['key']}/refresh", params={'path': folder})
+            with self._lock:
+                self._stats['partial_scans'] += 1
+        return len(folders)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, section_cached=self._section is not None)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Espejo local de la biblioteca de películas de Plex
+
+Guarda en SQLite lo que ya está en Plex (ratingKey, título, año, guid,
+código de IMDb, archivo y reproducciones) para saber, sin llamar a Plex en
+cada petición, si una película ya está disponible. La sincronización es
+incremental: solo pide las películas con updatedAt posterior a la marca de
+agua; cada cierto tiempo hace una pasada completa para enterarse de lo que
+se borró. La web consulta un diccionario en memoria por imdb_code que se
+recarga cuando el proceso de sincronización cambia algo.
+
+Uso:
+    python plex_library.py sync                 # sincronización incremental
+    python plex_library.py sync --full          # pasada completa
+    python plex_library.py sync --interval 300  # sincronizar cada 5 minutos
+"""
+import os
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+
+from plex_client import PlexClient
+
+logger = logging.getLogger(__name__)
+
+PLEX_LIBRARY_PATH = os.getenv(
+    'PLEX_LIBRARY_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'plex_library.db')
+)
+FULL_SYNC_INTERVAL = int(os.getenv('PLEX_LIBRARY_FULL_SYNC', '21600'))  # Pasada completa cada 6 horas
+RELOAD_INTERVAL = float(os.getenv('PLEX_LIBRARY_RELOAD', '30'))  # Cada cuánto mira la web si hay cambios
+PLEX_URL = os.getenv('PLEX_URL', "http://plex:32400")
+PLEX_TOKEN = os.getenv('PLEX_TOKEN', '')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    rating_key TEXT PRIMARY KEY,
+    imdb_code TEXT,
+    title TEXT,
+    year INTEGER,
+    guid TEXT,
+    file TEXT,
+    view_count INTEGER DEFAULT 0,
+    updated_at INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_plex_movies_imdb ON movies(imdb_code);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+COLUMNS = ('rating_key', 'imdb_code', 'title', 'year', 'guid', 'file', 'view_count', 'updated_at')
+
+
+class PlexLibrary:
+    """Películas que ya están en Plex, indexadas por código de IMDb"""
+
+    def __init__(self, db_path=PLEX_LIBRARY_PATH, plex=None, reload_interval=RELOAD_INTERVAL,
+                 full_sync_interval=FULL_SYNC_INTERVAL, clock=time.time):
+        self.db_path = db_path
+        self.plex = plex
+        self.reload_interval = reload_interval
+        self.full_sync_interval = full_sync_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._by_imdb = {}
+        self._version = None
+        self._checked_at = None
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Transacción: commit al salir, rollback si falla; la conexión se cierra siempre"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- Estado de sincronización ---
+    def get_state(self, key, default=None, conn=None):
+        if conn is None:
+            with self._connect() as own_conn:
+                return self.get_state(key, default, conn=own_conn)
+        row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value, conn):
+        conn.execute('INSERT INTO sync_state(key, value) VALUES (?, ?) '
+                     'ON CONFLICT(key) DO UPDATE SET value = excluded.value', (key, str(value)))
+
+    # --- Sincronización ---
+    def sync(self, full=False):
+        """Trae de Plex lo modificado desde la última pasada; devuelve cuántas películas cambió
+
+        Plex no avisa de lo borrado: una pasada completa (la primera, la de
+        cada full_sync_interval o si cambió la sección) reemplaza la tabla.
+        """
+        section = self.plex.movie_section()
+        with self._connect() as conn:
+            watermark = int(self.get_state('watermark', 0, conn))
+            last_full = int(self.get_state('last_full', 0, conn))
+            same_section = self.get_state('section', conn=conn) == section['key']
+        now = int(self.clock())
+        full = full or not watermark or not same_section or now - last_full >= self.full_sync_interval
+
+        # Lo modificado en el mismo segundo que la marca, tras leerla, lo recoge la pasada completa
+        movies = self.plex.movies(section['key'], updated_since=None if full else watermark)
+        with self._connect() as conn:
+            if full:
+                conn.execute('DELETE FROM movies')
+            conn.executemany(
+                f"INSERT OR REPLACE INTO movies({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [tuple(movie[column] for column in COLUMNS) for movie in movies]
+            )
+            self.set_state('watermark', max([watermark if not full else 0] + [m['updated_at'] for m in movies]), conn)
+            self.set_state('section', section['key'], conn)
+            self.set_state('last_sync', now, conn)
+            if full:
+                self.set_state('last_full', now, conn)
+            if full or movies:
+                # La web recarga su índice cuando cambia la versión
+                self.set_state('version', int(self.get_state('version', 0, conn)) + 1, conn)
+
+        logger.info(f"Biblioteca de Plex sincronizada ({'completa' if full else 'incremental'}): "
+                    f"{len(movies)} películas")
+        return len(movies)
+
+    # --- Consultas ---
+    def _reload(self):
+        now = self.clock()
+        if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        with self._connect() as conn:
+            version = self.get_state('version', conn=conn)
+            if version == self._version:
+                return
+            rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM movies WHERE imdb_code IS NOT NULL").fetchall()
+        self._by_imdb = {row[1]: dict(zip(COLUMNS, row)) for row in rows}
+        self._version = version
+
+    def get(self, imdb_code):
+        """Película de Plex con ese código de IMDb o None"""
+        if not imdb_code:
+            return None
+        with self._lock:
+            self._reload()
+            return self._by_imdb.get(imdb_code)
+
+    def __len__(self):
+        with self._lock:
+            self._reload()
+            return len(self._by_imdb)
+
+    def status(self):
+        with self._connect() as conn:
+            count = conn.execute('SELECT COUNT(*) FROM movies').fetchone()[0]
+            last_sync = self.get_state('last_sync', conn=conn)
+        return {'movies': count, 'last_sync': int(last_sync) if last_sync else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sincroniza el espejo local de la biblioteca de Plex')
+    parser.add_argument('command', choices=['sync'])
+    parser.add_argument('--full', action='store_true', help='Pasada completa (detecta lo borrado)')
+    parser.add_argument('--interval', type=int, default=0,
+                        help='Segundos entre sincronizaciones (0 = una sola vez)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    library = PlexLibrary(plex=PlexClient(PLEX_URL, PLEX_TOKEN))
+
+    full = args.full
+    while True:
+        try:
+            library.sync(full=full)
+            full = False
+        except Exception as e:
+            logger.error(f"Error sincronizando la biblioteca de Plex: {e}")
+            if not args.interval:
+                sys.exit(1)
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
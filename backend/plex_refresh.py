@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Actualizaciones de Plex agrupadas y sin solaparse
+
+Cuando termina un lote de películas, cada una pide su escaneo. El
+despachador los junta durante una ventana de calma (se reinicia con cada
+petición, con un máximo de espera), los reduce al mínimo conjunto de rutas,
+lanza un solo escaneo a la vez y, si Plex falla, reintenta con backoff
+exponencial sin perder lo pedido entretanto.
+
+Los escaneos parciales y el completo van por separado: un escaneo completo
+pendiente (solo lo pide la actualización manual) no absorbe ni descarta las
+carpetas pedidas. La agrupación ocurre en el proceso web: el webhook de
+Transmission envía la ruta organizada a /api/webhook/complete y solo escanea
+por su cuenta si la web no pudo encolarla. Ni el monitor ni el demonio de
+post-procesado tienen despachador propio que agrupe.
+"""
+import os
+import time
+import logging
+import posixpath
+import threading
+
+logger = logging.getLogger(__name__)
+
+QUIET_WINDOW = float(os.getenv('PLEX_REFRESH_QUIET', '30'))  # Segundos sin peticiones nuevas
+MAX_DELAY = float(os.getenv('PLEX_REFRESH_MAX_DELAY', '300'))  # Espera máxima desde la primera
+RETRY_BACKOFF = 30
+MAX_BACKOFF = 1800
+
+
+def merge_paths(paths):
+    """Quita duplicados y las rutas contenidas en otra ruta pedida"""
+    merged = []
+    for path in sorted({posixpath.normpath(p) for p in paths}):
+        if not any(path.startswith(parent.rstrip('/') + '/') for parent in merged):
+            merged.append(path)
+    return merged
+
+
+class RefreshDispatcher:
+    """Agrupa las peticiones de escaneo y las ejecuta de una en una
+
+    refresh(paths) hace el escaneo (paths None = sección completa) y devuelve
+    cuántos escaneos pidió a Plex. Con background=False no hay hilo y lo
+    pendiente solo se ejecuta con flush().
+    """
+
+    def __init__(self, refresh, quiet_window=QUIET_WINDOW, max_delay=MAX_DELAY, backoff=RETRY_BACKOFF,
+                 max_backoff=MAX_BACKOFF, clock=time.monotonic, background=True):
+        self.refresh = refresh
+        self.quiet_window = quiet_window
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.background = background
+        self._cond = threading.Condition()
+        self._in_flight = threading.Lock()
+        self._thread = None
+        self._full = False
+        self._paths = set()
+        self._first_at = None
+        self._last_at = None
+        self._retry_at = None
+        self._failures_in_row = 0
+        self._stats = {'requested': 0, 'issued': 0, 'batches': 0, 'failures': 0, 'retries': 0}
+
+    def request(self, paths=None):
+        """Pide un escaneo de paths (o de toda la sección si es None)"""
+        with self._cond:
+            self._stats['requested'] += len(paths) if paths else 1
+            if paths:
+                self._paths.update(paths)
+            else:
+                self._full = True
+            now = self.clock()
+            self._first_at = self._first_at if self._first_at is not None else now
+            self._last_at = now
+            if self.background and self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name='plex-refresh', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _has_pending(self):
+        return self._full or bool(self._paths)
+
+    def due_in(self):
+        """Segundos hasta lanzar lo pendiente (None si no hay nada)"""
+        with self._cond:
+            return self._due_in()
+
+    def _due_in(self):
+        if not self._has_pending():
+            return None
+        due = min(self._last_at + self.quiet_window, self._first_at + self.max_delay)
+        if self._retry_at is not None:
+            due = max(due, self._retry_at)
+        return due - self.clock()
+
+    def _take(self):
+        """Lo pendiente como lista de lotes: None (sección completa) y/o las carpetas"""
+        batches = [None] if self._full else []
+        if self._paths:
+            batches.append(merge_paths(self._paths))
+        self._full = False
+        self._paths = set()
+        self._first_at = self._last_at = None
+        return batches
+
+    def _restore(self, batches):
+        # Lo que falló vuelve a la cola junto con lo que llegó mientras tanto
+        for batch in batches:
+            if batch is None:
+                self._full = True
+            else:
+                self._paths.update(batch)
+        now = self.clock()
+        self._first_at = self._first_at if self._first_at is not None else now
+        self._last_at = self._last_at if self._last_at is not None else now
+
+    def _run(self, batches):
+        with self._in_flight:
+            for index, batch in enumerate(batches):
+                try:
+                    scans = self.refresh(batch)
+                except Exception as e:
+                    with self._cond:
+                        self._stats['failures'] += 1
+                        self._failures_in_row += 1
+                        delay = min(self.backoff * 2 ** (self._failures_in_row - 1), self.max_backoff)
+                        self._retry_at = self.clock() + delay
+                        self._restore(batches[index:])
+                    logger.error(f"Error actualizando Plex ({e}); reintento en {delay:.0f} s")
+                    return False
+                with self._cond:
+                    if self._failures_in_row:
+                        self._stats['retries'] += 1
+                    self._failures_in_row = 0
+                    self._retry_at = None
+                    self._stats['batches'] += 1
+                    self._stats['issued'] += scans or 0
+            return True
+
+    def flush(self):
+        """Ejecuta ya lo pendiente, sin esperar la ventana; True si Plex respondió"""
+        with self._cond:
+            if not self._has_pending():
+                return True
+            batches = self._take()
+        return self._run(batches)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                wait = self._due_in()
+                while wait is None or wait > 0:
+                    self._cond.wait(wait)
+                    wait = self._due_in()
+                batches = self._take()
+            self._run(batches)
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, pending_paths=len(self._paths), pending_full=self._full,
+                        retry_in=round(self._retry_at - self.clock(), 1) if self._retry_at is not None else None)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Caché en disco de pósters: descarga una vez, guarda por contenido (sha256),
+genera miniaturas de tamaño fijo y expulsa lo menos usado al pasar el límite
+"""
+import io
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+try:
+    from PIL import Image
+except ImportError:  # Sin Pillow se sirve siempre el original
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+POSTER_CACHE_DIR = os.getenv(
+    'POSTER_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'posters')
+)
+POSTER_CACHE_MAX_BYTES = int(os.getenv('POSTER_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Anchos fijos de las miniaturas (px)
+POSTER_SIZES = {
+    'small': 120,
+    'medium': 230,
+    'large': 500,
+}
+ACCESS_UPDATE_INTERVAL = 3600  # No reescribir last_access en cada petición
+
+CONTENT_TYPES = {
+    b'\xff\xd8\xff': ('image/jpeg', '.jpg'),
+    b'\x89PNG': ('image/png', '.png'),
+    b'RIFF': ('image/webp', '.webp'),
+    b'GIF8': ('image/gif', '.gif'),
+}
+
+
+def sniff_image(data):
+    """Detecta el tipo de imagen por su cabecera"""
+    for magic, info in CONTENT_TYPES.items():
+        if data.startswith(magic):
+            return info
+    return None
+
+
+class PosterNotFound(Exception):
+    """No se pudo obtener el póster original"""
+
+
+class PosterCache:
+    """Pósters originales y miniaturas guardados por contenido en disco"""
+
+    def __init__(self, cache_dir=POSTER_CACHE_DIR, max_bytes=POSTER_CACHE_MAX_BYTES, fetch=None, clock=time.time):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fetch = fetch
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS posters (
+                    imdb_code TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    source_url TEXT
+                );
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    content_type TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_files_access ON files(last_access);
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(os.path.join(self.cache_dir, 'index.db'), timeout=10)
+
+    def _object_path(self, digest, suffix):
+        return os.path.join(digest[:2], f"{digest}{suffix}")
+
+    def _write_file(self, conn, relpath, digest, data, content_type):
+        abspath = os.path.join(self.cache_dir, relpath)
+        os.makedirs(os.path.dirname(abspath), exist_ok=True)
+        tmp_path = f"{abspath}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, abspath)
+        conn.execute(
+            'INSERT OR REPLACE INTO files(path, digest, size, content_type, last_access) VALUES (?, ?, ?, ?, ?)',
+            (relpath, digest, len(data), content_type, self.clock())
+        )
+
+    def _store_original(self, imdb_code, source_url):
+        if self.fetch is None:
+            raise PosterNotFound(imdb_code)
+        data = self.fetch(source_url)
+        info = sniff_image(data or b'')
+        if not info:
+            raise PosterNotFound(imdb_code)
+        content_type, ext = info
+        digest = hashlib.sha256(data).hexdigest()
+        relpath = self._object_path(digest, ext)
+
+        with self._connect() as conn:
+            if not conn.execute('SELECT 1 FROM files WHERE path = ?', (relpath,)).fetchone():
+                self._write_file(conn, relpath, digest, data, content_type)
+            conn.execute('INSERT OR REPLACE INTO posters(imdb_code, digest, source_url) VALUES (?, ?, ?)',
+                         (imdb_code, digest, source_url))
+        return digest
+
+    def _make_thumbnail(self, conn, digest, size):
+        original = conn.execute(
+            "SELECT path, content_type FROM files WHERE digest = ? AND path NOT LIKE '%\\_%' ESCAPE '\\'",
+            (digest,)
+        ).fetchone()
+        if not original:
+            return None
+        if Image is None or size not in POSTER_SIZES:
+            return original
+
+        relpath = self._object_path(digest, f"_{size}.jpg")
+        with open(os.path.join(self.cache_dir, original[0]), 'rb') as f:
+            image = Image.open(f)
+            image.load()
+        width = POSTER_SIZES[size]
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.convert('RGB').save(buffer, 'JPEG', quality=85, optimize=True)
+        self._write_file(conn, relpath, digest, buffer.getvalue(), 'image/jpeg')
+        return relpath, 'image/jpeg'
+
+    def _key_lock(self, imdb_code):
+        with self._lock:
+            return self._key_locks.setdefault(imdb_code, threading.Lock())
+
+    def _lookup(self, imdb_code, size):
+        """(digest, ruta, content_type) si ya está en caché en ese tamaño; sin red ni bloqueos"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT digest FROM posters WHERE imdb_code = ?', (imdb_code,)).fetchone()
+            if not row:
+                return None
+            digest = row[0]
+            row = conn.execute('SELECT path, content_type, last_access FROM files WHERE path = ?',
+                               (self._object_path(digest, f"_{size}.jpg"),)).fetchone()
+            if row is None and (Image is None or size not in POSTER_SIZES):
+                # Sin miniaturas se sirve el original
+                row = conn.execute(
+                    "SELECT path, content_type, last_access FROM files "
+                    "WHERE digest = ? AND path NOT LIKE '%\\_%' ESCAPE '\\'", (digest,)
+                ).fetchone()
+            if row is None:
+                return None
+            relpath, content_type, last_access = row
+            if self.clock() - last_access > ACCESS_UPDATE_INTERVAL:
+                conn.execute('UPDATE files SET last_access = ? WHERE path = ?', (self.clock(), relpath))
+        return digest, relpath, content_type
+
+    def _fill(self, imdb_code, size, source_url):
+        """Descarga el original si falta y genera la miniatura"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT digest, source_url FROM posters WHERE imdb_code = ?',
+                               (imdb_code,)).fetchone()
+            digest = row[0] if row else None
+            source_url = source_url or (row[1] if row else None)
+            if digest and not conn.execute('SELECT 1 FROM files WHERE digest = ?', (digest,)).fetchone():
+                digest = None  # Expulsado; hay que volver a descargarlo
+        if digest is None:
+            if not source_url:
+                raise PosterNotFound(imdb_code)
+            digest = self._store_original(imdb_code, source_url)
+
+        with self._connect() as conn:
+            created = self._make_thumbnail(conn, digest, size)
+            if created is None and source_url:
+                # Solo quedaban miniaturas: recuperar el original
+                digest = self._store_original(imdb_code, source_url)
+                created = self._make_thumbnail(conn, digest, size)
+        if created is None:
+            raise PosterNotFound(imdb_code)
+        return (digest,) + tuple(created)
+
+    def get(self, imdb_code, size='medium', source_url=None):
+        """Devuelve (ruta absoluta, etag, content_type) del póster en el tamaño pedido
+
+        source_url solo se usa si el póster todavía no está en caché. Los
+        aciertos no esperan a nadie; la descarga y el redimensionado solo
+        bloquean otras peticiones del mismo póster.
+        """
+        cached = self._lookup(imdb_code, size)
+        if cached is None:
+            with self._key_lock(imdb_code):
+                # Otra petición pudo generarlo mientras esperábamos
+                cached = self._lookup(imdb_code, size) or self._fill(imdb_code, size, source_url)
+            # Solo un fallo añade archivos: los aciertos no recorren la caché
+            with self._lock:
+                self._evict()
+
+        digest, relpath, content_type = cached
+        etag = f"{digest[:16]}-{size}"
+        return os.path.join(self.cache_dir, relpath), etag, content_type
+
+    def _evict(self):
+        """Elimina los archivos menos usados hasta quedar bajo max_bytes"""
+        with self._connect() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM files').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for relpath, size in conn.execute('SELECT path, size FROM files ORDER BY last_access').fetchall():
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, relpath))
+                except FileNotFoundError:
+                    pass
+                conn.execute('DELETE FROM files WHERE path = ?', (relpath,))
+                total -= size
+                logger.info(f"Póster expulsado de la caché: {relpath}")
+
+    def stats(self):
+        with self._connect() as conn:
+            files, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files').fetchone()
+            posters = conn.execute('SELECT COUNT(*) FROM posters').fetchone()[0]
+        return {'posters': posters, 'files': files, 'bytes': total, 'max_bytes': self.max_bytes,
+                'resize': Image is not None}
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Demonio de post-procesado de descargas completadas
+
+Escucha en un socket Unix los avisos del hook de Transmission
+(transmission_hook.py), los encola en la cola persistente y los procesa con
+su propio pool de workers. Todo corre en un proceso ya arrancado: ni un
+intérprete por torrent ni un segundo intérprete para el organizador, y la
+sección de Plex y las conexiones HTTP quedan calientes entre trabajos.
+
+Protocolo: una línea JSON por conexión y una línea JSON de respuesta.
+    {"hash": "...", "name": "...", "dir": "..."}  -> {"ok": true, "job_id": 12}
+    {"command": "stats"}                           -> {"ok": true, "jobs": {...}, "workers": {...}}
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import threading
+import socketserver
+
+from job_queue import JobQueue, WorkerPool
+import transmission_webhook
+
+logger = logging.getLogger(__name__)
+
+POSTPROCESS_SOCKET = os.getenv(
+    'POSTPROCESS_SOCKET',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'postprocess.sock')
+)
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST_BYTES) or b'{}')
+            response = self.server.daemon.handle_request(request)
+        except Exception as e:
+            logger.error(f"Petición inválida en el socket: {e}")
+            response = {'ok': False, 'error': str(e)}
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class PostProcessDaemon:
+    """Socket Unix + cola persistente + pool de workers en un solo proceso"""
+
+    def __init__(self, socket_path=POSTPROCESS_SOCKET, queue=None, workers=2, handlers=None):
+        self.socket_path = socket_path
+        self.queue = queue or JobQueue()
+        self.pool = WorkerPool(self.queue, handlers or {'completion': transmission_webhook.handle_completion_job},
+                               size=workers)
+        self.server = None
+        self._thread = None
+
+    def handle_request(self, request):
+        if request.get('command') == 'stats':
+            return {'ok': True, 'jobs': self.queue.counts(), 'workers': self.pool.stats()}
+        if not request.get('name'):
+            return {'ok': False, 'error': 'name requerido'}
+        job_id = transmission_webhook.enqueue_completion(self.queue, request['name'], request.get('dir') or '',
+                                                         request.get('hash') or '')
+        logger.info(f"📥 {request['name']} encolado (trabajo {job_id})")
+        return {'ok': True, 'job_id': job_id}
+
+    def start(self, workers=True):
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            # Socket de una ejecución anterior que no se cerró bien
+            os.unlink(self.socket_path)
+        self.server = _UnixServer(self.socket_path, _RequestHandler)
+        self.server.daemon = self
+        # El hook corre con el usuario de Transmission
+        os.chmod(self.socket_path, 0o666)
+        self._thread = threading.Thread(target=self.server.serve_forever, name='postprocess-socket', daemon=True)
+        self._thread.start()
+        if workers:
+            self.pool.start()
+
+    def stop(self):
+        self.pool.stop()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def serve_forever(self):
+        self.start()
+        logger.info(f"Demonio de post-procesado escuchando en {self.socket_path} ({self.pool.size} workers)")
+        try:
+            self.pool.join()
+        finally:
+            self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Demonio de post-procesado de Transmission')
+    parser.add_argument('--socket', default=POSTPROCESS_SOCKET)
+    parser.add_argument('--workers', type=int, default=int(os.getenv('JOB_WORKERS', '2')))
+    args = parser.parse_args()
+
+    try:
+        PostProcessDaemon(args.socket, workers=args.workers).serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Demonio de post-procesado detenido")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+// === PROGRESO EN VIVO DE LAS DESCARGAS (SSE) ===
+// Escucha /api/downloads/events y actualiza las tarjetas con data-download-id
+// sin recargar la página. EventSource reconecta solo y envía Last-Event-ID.
+
+function formatRate(bytesPerSecond) {
+    if (!bytesPerSecond) return '';
+    if (bytesPerSecond >= 1048576) return (bytesPerSecond / 1048576).toFixed(1) + ' MB/s';
+    return Math.round(bytesPerSecond / 1024) + ' KB/s';
+}
+
+function formatEta(seconds) {
+    if (seconds == null || seconds < 0) return '';
+    if (seconds >= 3600) return Math.floor(seconds / 3600) + ' h ' + Math.floor((seconds % 3600) / 60) + ' min';
+    if (seconds >= 60) return Math.floor(seconds / 60) + ' min';
+    return seconds + ' s';
+}
+
+function applyDownloadEvent(data) {
+    const card = document.querySelector(`[data-download-id="${data.id}"]`);
+    if (!card) return;
+
+    const badge = card.querySelector('.status-badge');
+    if (badge && badge.textContent !== data.status) {
+        badge.className = 'status-badge ' + data.status;
+        badge.textContent = data.status;
+    }
+
+    const progress = card.querySelector('.download-progress');
+    if (progress) {
+        if (data.status === 'descargando') {
+            const parts = [Math.floor(data.percentDone * 100) + '%', formatRate(data.rate), formatEta(data.eta)];
+            progress.textContent = parts.filter(Boolean).join(' · ');
+        } else {
+            progress.textContent = '';
+        }
+    }
+
+    // El botón de iniciar solo tiene sentido mientras está pendiente
+    const startButton = card.querySelector('.download-btn');
+    if (startButton && data.status !== 'pendiente') {
+        startButton.remove();
+    }
+}
+
+function subscribeDownloadEvents(scope) {
+    if (!window.EventSource) return null;
+    const url = '/api/downloads/events' + (scope ? '?scope=' + encodeURIComponent(scope) : '');
+    const source = new EventSource(url);
+    source.addEventListener('download', event => applyDownloadEvent(JSON.parse(event.data)));
+    // Se perdieron demasiados eventos: recargar el estado completo una vez
+    source.addEventListener('resync', () => location.reload());
+    return source;
+}
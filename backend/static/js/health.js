@@ -0,0 +1,53 @@
+// === ESTADO DE TRANSMISSION Y PLEX ===
+// Lee /api/health, que sale de una instantánea del servidor: la página nunca
+// espera a Transmission ni a Plex. El navegador revalida con If-None-Match y,
+// si nada cambió, recibe un 304 sin cuerpo.
+
+const HEALTH_LABELS = {
+    transmission: service => `Transmission ${service.version || 'conectado'}`,
+    plex: service => `Plex ${service.version || 'conectado'}`,
+};
+const HEALTH_DOWN_LABELS = {
+    transmission: 'Transmission desconectado',
+    plex: 'Plex desconectado',
+};
+
+function applyHealth(name, service, indicator, text) {
+    if (service.status === 'unknown') {
+        indicator.className = 'status-indicator';
+        text.textContent = 'Verificando conexión...';
+    } else if (service.status === 'up' && !service.stale) {
+        indicator.className = 'status-indicator connected';
+        text.textContent = HEALTH_LABELS[name](service);
+    } else {
+        indicator.className = 'status-indicator disconnected';
+        text.textContent = HEALTH_DOWN_LABELS[name];
+    }
+    text.title = service.last_error ? `Último error: ${service.last_error}` : '';
+}
+
+// targets: {transmission: [indicador, texto], plex: [indicador, texto]}
+function watchHealth(targets, interval = 30000) {
+    function check() {
+        fetch('/api/health')
+        .then(response => response.json())
+        .then(data => {
+            Object.entries(targets).forEach(([name, [indicator, text]]) => {
+                if (data.services[name]) applyHealth(name, data.services[name], indicator, text);
+            });
+            // La primera visita puede llegar antes que la primera sonda
+            const pending = Object.keys(targets).some(name => data.services[name] && data.services[name].status === 'unknown');
+            if (pending) setTimeout(check, 2000);
+        })
+        .catch(() => {
+            Object.values(targets).forEach(([indicator, text]) => {
+                indicator.className = 'status-indicator error';
+                text.textContent = 'Error de conexión';
+            });
+        });
+    }
+    check();
+    setInterval(() => {
+        if (!document.hidden) check();
+    }, interval);
+}
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Sincronización incremental del estado de los torrents
+
+Cada sondeo pide a Transmission solo los torrents activos recientemente
+(ids: "recently-active") y los compara con una instantánea en memoria;
+cada cierto tiempo se hace una reconciliación completa. ProgressWriter decide
+qué filas merece la pena reescribir en cada ciclo.
+
+Si entre dos sondeos pasa más que RECENTLY_ACTIVE_WINDOW, lo que cambió al
+principio del hueco ya no sale en "recently-active". Solo importa si el
+sondeo anterior vio torrents bajando datos (pudieron terminar en el hueco):
+entonces toca reconciliar. Con todo parado, que es cuando el monitor espacia
+los sondeos, basta el incremental y la reconciliación programada recoge lo
+demás.
+"""
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Campos mínimos para decidir el estado de una descarga y mostrar su progreso
+SYNC_FIELDS = ["id", "hashString", "status", "percentDone", "error", "rateDownload", "eta", "sizeWhenDone"]
+FULL_SYNC_INTERVAL = 600
+# Transmission considera "recently-active" lo que tuvo actividad en los últimos 60 s
+RECENTLY_ACTIVE_WINDOW = 60
+
+ACTIVE_STATUSES = ('pendiente', 'descargando')
+
+# Solo se reescribe el progreso si avanzó al menos esto (1%)...
+PROGRESS_STEP = 0.01
+# ...o si last_seen_at tiene más de estos segundos
+LAST_SEEN_REFRESH = 300
+
+
+def download_status_for(torrent):
+    """Traduce el estado de Transmission al de la descarga (None si no aplica)
+
+    Estados de Transmission:
+    0: parado, 1: en cola para verificar, 2: verificando, 3: en cola para descargar,
+    4: descargando, 5: en cola para compartir, 6: compartiendo
+    """
+    status = torrent.get('status')
+    percent_done = torrent.get('percentDone') or 0
+    if torrent.get('error'):
+        return 'error'
+    if status == 4 and percent_done < 1.0:
+        return 'descargando'
+    if status in (5, 6) or percent_done >= 1.0:
+        return 'completado'
+    if status in (0, 1, 2, 3):
+        return 'pendiente'
+    return None
+
+
+class SyncResult:
+    """Resultado de un sondeo: hashes con cambios y si fue completo"""
+
+    def __init__(self, changed, removed, full):
+        self.changed = changed
+        self.removed = removed
+        self.full = full
+
+
+class StatusSync:
+    """Instantánea de los torrents de Transmission actualizada por diferencias"""
+
+    def __init__(self, client, full_sync_interval=FULL_SYNC_INTERVAL, clock=time.monotonic):
+        self.client = client
+        self.full_sync_interval = full_sync_interval
+        self.clock = clock
+        self.snapshot = {}  # hashString -> campos de SYNC_FIELDS
+        self.hash_by_id = {}
+        self.last_poll = None
+        self.last_full = None
+        self.last_active_at = None  # Último sondeo que vio torrents bajando datos
+        self._lock = threading.Lock()
+        self._stats = {'polls': 0, 'full_syncs': 0, 'torrents_received': 0, 'changes': 0, 'errors': 0}
+
+    def needs_full_sync(self):
+        now = self.clock()
+        return (self.last_full is None
+                or now - self.last_full >= self.full_sync_interval
+                or (now - self.last_poll >= RECENTLY_ACTIVE_WINDOW and self.last_active_at == self.last_poll))
+
+    def _diff(self, torrents):
+        changed = set()
+        for torrent in torrents:
+            hash_string = (torrent.get('hashString') or '').lower()
+            if not hash_string:
+                continue
+            self.hash_by_id[torrent.get('id')] = hash_string
+            if self.snapshot.get(hash_string) != torrent:
+                self.snapshot[hash_string] = torrent
+                changed.add(hash_string)
+        return changed
+
+    def poll(self, full=None):
+        """Consulta Transmission y devuelve un SyncResult con lo que cambió"""
+        with self._lock:
+            full = self.needs_full_sync() if full is None else full
+            try:
+                if full:
+                    result = self.client.torrent_get(SYNC_FIELDS)
+                else:
+                    result = self.client.torrent_get(SYNC_FIELDS, ids='recently-active')
+            except Exception:
+                # Sin saber qué se perdió, el siguiente sondeo reconstruye todo
+                self.last_full = None
+                self._stats['errors'] += 1
+                raise
+
+            torrents = result.get('torrents', [])
+            if full:
+                previous = self.snapshot
+                self.snapshot, self.hash_by_id = {}, {}
+                changed = {h for h in self._diff(torrents) if previous.get(h) != self.snapshot[h]}
+                removed = set(previous) - set(self.snapshot)
+                self.last_full = self.clock()
+                self._stats['full_syncs'] += 1
+            else:
+                changed = self._diff(torrents)
+                removed = set()
+                for torrent_id in result.get('removed', []):
+                    hash_string = self.hash_by_id.pop(torrent_id, None)
+                    if hash_string and self.snapshot.pop(hash_string, None) is not None:
+                        removed.add(hash_string)
+
+            self.last_poll = self.clock()
+            if self._downloading():
+                self.last_active_at = self.last_poll
+            self._stats['polls'] += 1
+            self._stats['torrents_received'] += len(torrents)
+            self._stats['changes'] += len(changed)
+            return SyncResult(changed, removed, full)
+
+    def get(self, hash_string):
+        return self.snapshot.get(hash_string)
+
+    def _downloading(self):
+        return sum(1 for torrent in self.snapshot.values()
+                   if download_status_for(torrent) == 'descargando' and (torrent.get('rateDownload') or 0) > 0)
+
+    def downloading(self):
+        """Cuántos torrents están bajando datos ahora mismo (no parados, en cola ni atascados)"""
+        with self._lock:
+            return self._downloading()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, tracked_torrents=len(self.snapshot))
+
+
+class ProgressWriter:
+    """Agrupa las escrituras de progreso y descarta los cambios insignificantes
+
+    La velocidad y el ETA cambian en cada sondeo; escribirlos siempre
+    convertiría cada ciclo en una escritura por torrent. Solo se escribe una
+    fila si cambia su estado o su tamaño, si el progreso avanza PROGRESS_STEP,
+    o si last_seen_at envejece más de LAST_SEEN_REFRESH. En ese caso se guardan
+    también la velocidad y el ETA del momento.
+    """
+
+    def __init__(self, progress_step=PROGRESS_STEP, last_seen_refresh=LAST_SEEN_REFRESH):
+        self.progress_step = progress_step
+        self.last_seen_refresh = last_seen_refresh
+        self._lock = threading.Lock()
+        self._stats = {'evaluated': 0, 'written': 0, 'skipped': 0}
+
+    def is_meaningful(self, download, percent, size, status, now):
+        if status != download.status or size != download.size_bytes:
+            return True
+        if download.percent_done is None or round(abs(percent - download.percent_done), 6) >= self.progress_step:
+            return True
+        if percent >= 1.0 > download.percent_done:
+            return True
+        return (download.last_seen_at is None
+                or (now - download.last_seen_at).total_seconds() >= self.last_seen_refresh)
+
+    def plan(self, download, torrent, status, now):
+        """Fila a escribir para esta descarga o None si no hace falta"""
+        percent = round(torrent.get('percentDone') or 0, 4)
+        size = torrent.get('sizeWhenDone')
+        meaningful = self.is_meaningful(download, percent, size, status, now)
+        with self._lock:
+            self._stats['evaluated'] += 1
+            self._stats['written' if meaningful else 'skipped'] += 1
+        if not meaningful:
+            return None
+        eta = torrent.get('eta')
+        return {
+            'id': download.id,
+            'status': status,
+            'percent_done': percent,
+            'rate_download': torrent.get('rateDownload') or 0,
+            'eta': eta if eta is not None and eta >= 0 else None,  # Transmission usa -1/-2 para "desconocido"
+            'size_bytes': size,
+            'last_seen_at': now,
+        }
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,160 @@
+"""
+Benchmark del emparejado del webhook sobre nombres de release realistas
+
+Genera N descargas con títulos sintéticos (artículos, acentos, subtítulos,
+secuelas, remakes del mismo título con otro año) y, para una muestra, el
+nombre del torrent con los formatos habituales de YTS, de grupos de escena
+y de Transmission. Mide el tiempo por búsqueda del índice y el de la
+comparación por subcadenas que usaba el webhook, y cuántas acierta cada uno:
+
+    python -m tests.bench_matcher
+    python -m tests.bench_matcher --sizes 1000 10000 100000 --lookups 500
+"""
+import sys
+import json
+import time
+import random
+import argparse
+
+from download_matcher import DownloadMatcher
+
+WORDS = [
+    'dark', 'night', 'river', 'king', 'queen', 'last', 'first', 'blood', 'heart', 'shadow', 'city', 'star',
+    'war', 'love', 'ghost', 'storm', 'silent', 'fire', 'ice', 'winter', 'summer', 'road', 'house', 'island',
+    'dream', 'lost', 'secret', 'golden', 'black', 'white', 'red', 'blue', 'iron', 'glass', 'stone', 'wolf',
+    'dragon', 'eagle', 'hunter', 'soldier', 'stranger', 'mother', 'father', 'brother', 'sister', 'child',
+    'garden', 'ocean', 'desert', 'mountain', 'empire', 'kingdom', 'machine', 'signal', 'echo', 'mirror',
+    'promise', 'escape', 'return', 'rising', 'fall', 'edge', 'line', 'code', 'game', 'dead', 'alive',
+    'wild', 'broken', 'hidden', 'burning', 'frozen', 'electric', 'midnight', 'morning', 'evening', 'sun',
+    'moon', 'planet', 'galaxy', 'paradise', 'hell', 'heaven', 'angel', 'devil', 'saint', 'sinner', 'thief',
+    'killer', 'doctor', 'captain', 'general', 'prince', 'princess', 'witch', 'wizard', 'knight', 'pirate',
+    'corazón', 'niño', 'señor', 'canción', 'pájaro', 'mañana', 'noche', 'fuego', 'río', 'ciudad', 'amélie',
+]
+SYLLABLES = ['ka', 'ro', 'mi', 'tel', 'an', 'dor', 'vi', 'sa', 'lu', 'ben', 'or', 'qui', 'za', 'mar', 'el', 'ton']
+FORMATS = [
+    '{title} ({year}) [1080p] [BluRay] [5.1] [YTS.MX]',
+    '{title} ({year}) [720p] [WEBRip] [YTS.AM]',
+    '{dotted}.{year}.1080p.BluRay.x264-[YTS.LT]',
+    '{dotted}.{year}.2160p.WEB-DL.x265.10bit.HDR-RARBG',
+    '{title} {year} 720p BRRip x264 AAC',
+]
+
+
+def make_names(count, rng):
+    """Nombres propios inventados: los títulos reales tienen un vocabulario amplio"""
+    names = set()
+    while len(names) < count:
+        names.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))))
+    return sorted(names)
+
+
+def make_titles(count, seed=0):
+    """[(título, año)] únicos y deterministas"""
+    rng = random.Random(seed)
+    names = make_names(2000, rng)
+    titles, seen = [], set()
+    while len(titles) < count:
+        words = rng.sample(WORDS, rng.choice((1, 2, 2, 3, 3, 4)))
+        if rng.random() < 0.5:
+            words[rng.randrange(len(words))] = rng.choice(names)
+        title = ' '.join(w.capitalize() for w in words)
+        roll = rng.random()
+        if roll < 0.2:
+            title = f"The {title}"
+        elif roll < 0.3:
+            title = f"{title}: {rng.choice(WORDS).capitalize()} of the {rng.choice(WORDS).capitalize()}"
+        elif roll < 0.35:
+            title = f"{title} {rng.choice((2, 3, 4))}"
+        year = rng.randint(1950, 2025)
+        if (title.lower(), year) in seen:
+            continue
+        seen.add((title.lower(), year))
+        titles.append((title, year))
+        if roll > 0.97 and len(titles) < count:
+            # Remake: mismo título, otro año
+            titles.append((title, min(year + rng.randint(10, 40), 2025)))
+            seen.add((title.lower(), titles[-1][1]))
+    return titles[:count]
+
+
+def release_name(title, year, rng):
+    clean = title.replace(':', '')
+    return rng.choice(FORMATS).format(title=clean, dotted=clean.replace(' ', '.'), year=year)
+
+
+def legacy_match(downloads, torrent_name):
+    """Comparación por subcadenas del webhook anterior (primera que coincide)"""
+    torrent_name = torrent_name.lower()
+    for download_id, title, _ in downloads:
+        movie_title = title.lower()
+        if (movie_title in torrent_name or
+                torrent_name in movie_title or
+                any(word in torrent_name for word in movie_title.split() if len(word) > 3)):
+            return download_id
+    return None
+
+
+def _timed(fn, queries):
+    hits, start = 0, time.perf_counter()
+    for expected, name in queries:
+        hits += fn(name) == expected
+    elapsed = time.perf_counter() - start
+    return elapsed / max(len(queries), 1) * 1e6, hits / max(len(queries), 1)
+
+
+def run_benchmark(sizes=(1000, 10000, 50000), lookups=200, legacy_lookups=50, seed=0):
+    results = []
+    for size in sizes:
+        rng = random.Random(seed + size)
+        downloads = [(i + 1, title, year) for i, (title, year) in enumerate(make_titles(size, seed))]
+        sample = rng.sample(downloads, min(lookups, size))
+        queries = [(download_id, release_name(title, year, rng)) for download_id, title, year in sample]
+
+        matcher = DownloadMatcher()
+        start = time.perf_counter()
+        matcher.build(downloads)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        index_us, index_accuracy = _timed(matcher.match, queries)
+        legacy_us, legacy_accuracy = _timed(lambda name: legacy_match(downloads, name), queries[:legacy_lookups])
+        stats = matcher.stats()
+        results.append({
+            'downloads': size,
+            'build_ms': round(build_ms, 1),
+            'index_us': round(index_us, 1),
+            'index_accuracy': round(index_accuracy, 3),
+            'candidates_per_lookup': round(stats['candidates_scored'] / max(len(queries), 1), 1),
+            'legacy_us': round(legacy_us, 1),
+            'legacy_accuracy': round(legacy_accuracy, 3),
+        })
+    return {'config': {'sizes': list(sizes), 'lookups': lookups, 'legacy_lookups': legacy_lookups, 'seed': seed},
+            'results': results}
+
+
+def format_table(report):
+    lines = [f"{'descargas':>10}{'índice µs':>11}{'acierto':>9}{'candidatas':>12}{'subcad. µs':>12}{'acierto':>9}"]
+    for r in report['results']:
+        lines.append(f"{r['downloads']:>10}{r['index_us']:>11.1f}{r['index_accuracy']:>9.1%}"
+                     f"{r['candidates_per_lookup']:>12.1f}{r['legacy_us']:>12.1f}{r['legacy_accuracy']:>9.1%}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='Descargas activas')
+    parser.add_argument('--lookups', type=int, default=200, help='Búsquedas por tamaño con el índice')
+    parser.add_argument('--legacy-lookups', type=int, default=50, help='Búsquedas con subcadenas (lentas)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='ARCHIVO', help='Guarda el informe en JSON')
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.lookups, args.legacy_lookups, args.seed)
+    print(format_table(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Benchmark de las rutas que hablan con Transmission y Plex
+
+Arranca los servidores falsos de tests/fakes.py (o reproduce una grabación)
+y mide, para cada escenario, llamadas RPC, peticiones HTTP, bytes y tiempo:
+
+    python -m tests.benchmark --torrents 1000 --latency 0.005
+    python -m tests.benchmark --record run.json     # graba el tráfico
+    python -m tests.benchmark --replay run.json     # lo reproduce sin fakes
+    python -m tests.benchmark --transmission-url http://nas:9091/transmission/rpc --record real.json
+
+Con --transmission-url/--plex-url se mide contra servidores reales a través
+de un proxy que graba. Los hashes son deterministas, así que una grabación
+se puede reproducir en otra máquina.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+
+from tests.fakes import (Cassette, FakePlex, FakeTransmission, fake_plex_server, fake_transmission_server,
+                         recording_proxy, replay_server)
+
+SCENARIOS = ['check_status_full', 'check_status_incremental', 'add', 'delete',
+             'plex_partial_scan', 'transmission_status', 'plex_status', 'health']
+# /api/health se mide con varias lecturas seguidas (pestañas abiertas): solo la primera sondea
+HEALTH_POLLS = 10
+
+
+def bench_hash(index):
+    """Mismo esquema que FakeTransmission.populate"""
+    return f"{index:040x}"
+
+
+def _isolated_environment():
+    # La app lee la configuración al importarse: base de datos propia del benchmark
+    workdir = tempfile.mkdtemp(prefix='yts-bench-')
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'yts.db')}")
+    os.environ.setdefault('CATALOG_DB_PATH', os.path.join(workdir, 'catalog.db'))
+    os.environ.setdefault('TRACKER_HEALTH_PATH', os.path.join(workdir, 'trackers.json'))
+    os.environ.setdefault('POSTER_CACHE_DIR', os.path.join(workdir, 'posters'))
+    os.environ.setdefault('MONITOR_LOCK_PATH', os.path.join(workdir, 'monitor.lock'))
+    os.environ.setdefault('MONITOR_STATE_PATH', os.path.join(workdir, 'monitor.json'))
+    os.environ.setdefault('JOB_QUEUE_PATH', os.path.join(workdir, 'jobs.db'))
+    os.environ.setdefault('PLEX_LIBRARY_PATH', os.path.join(workdir, 'plex_library.db'))
+    os.environ.setdefault('HEALTH_KEEP_WARM', '0')
+
+
+class Measurement:
+    """Diferencia de contadores de los servidores y del cliente RPC"""
+
+    def __init__(self, servers, transmission):
+        self.servers = servers
+        self.transmission = transmission
+
+    def _counters(self):
+        totals = {'requests': 0, 'bytes_in': 0, 'bytes_out': 0}
+        for server in self.servers:
+            for key, value in server.traffic.snapshot().items():
+                totals[key] += value
+        totals['rpc'] = self.transmission.stats()['rpc_calls']
+        return totals
+
+    def run(self, func):
+        before = self._counters()
+        start = time.perf_counter()
+        func()
+        wall_ms = (time.perf_counter() - start) * 1000
+        after = self._counters()
+        result = {key: after[key] - before[key] for key in after}
+        result['bytes'] = result.pop('bytes_in') + result.pop('bytes_out')
+        result['wall_ms'] = round(wall_ms, 2)
+        return result
+
+
+def _expect(resp, status=200):
+    if resp.status_code != status:
+        raise RuntimeError(f"{resp.request.path}: {resp.status_code} {resp.get_data(as_text=True)[:200]}")
+    return resp
+
+
+def run_scenarios(transmission_url, plex_url, torrents, active, servers):
+    """Ejecuta los escenarios contra las URLs dadas y devuelve las medidas"""
+    import app as app_module
+    from app import app, db, Download, Torrent, UserModel
+    from health import HealthMonitor
+    from http_client import UpstreamClient
+    from plex_client import PlexClient
+    from plex_refresh import RefreshDispatcher
+    from status_sync import StatusSync, ProgressWriter
+    from transmission_client import TransmissionClient
+
+    client = TransmissionClient(transmission_url, http=UpstreamClient('transmission-bench'))
+    saved = {name: getattr(app_module, name)
+             for name in ('transmission', 'status_sync', 'progress_writer', 'plex', 'plex_refresher',
+                          'health_monitor')}
+    app_module.transmission = client
+    app_module.status_sync = StatusSync(client)
+    app_module.progress_writer = ProgressWriter()
+    app_module.plex = PlexClient(plex_url, http=UpstreamClient('plex-bench'))
+    # Sin hilo: los escaneos agrupados se lanzan con flush() dentro de cada escenario
+    refresher = app_module.plex_refresher = RefreshDispatcher(app_module.plex.refresh, background=False)
+    # Sondas dentro de la petición para que su tráfico caiga en la medida
+    app_module.health_monitor = HealthMonitor({
+        'transmission': lambda: {'version': client.session_get(['version']).get('version')},
+        'plex': lambda: app_module.plex.identity(),
+    }, background=False)
+
+    hashes = [bench_hash(i) for i in range(1, torrents + active + 1)]
+    added_hash = bench_hash(torrents + active + 1)
+    app.config['TESTING'] = True
+    with app.app_context():
+        user = UserModel(username=f"bench-{uuid.uuid4().hex[:8]}", password='x')
+        db.session.add(user)
+        db.session.flush()
+        user_id = user.id
+        db.session.add_all(Download(movie_id=f"tt{i:07d}", movie_title=f"Movie {i}", magnet=f"magnet:?xt=urn:btih:{h}", info_hash=h,
+                                    status='descargando', user_id=user_id)
+                           for i, h in enumerate(hashes, 1))
+        db.session.commit()
+
+    measure = Measurement(servers, client)
+    results = {}
+    try:
+        with app.test_client() as http:
+            with http.session_transaction() as sess:
+                sess['_user_id'] = str(user_id)
+                sess['welcomed'] = True
+
+            with app.app_context():
+                results['check_status_full'] = measure.run(
+                    lambda: (app_module.check_downloads_status(), refresher.flush()))
+                results['check_status_incremental'] = measure.run(
+                    lambda: (app_module.check_downloads_status(), refresher.flush()))
+
+            results['add'] = measure.run(lambda: _expect(http.post('/add', json={
+                'title': 'Benchmark Movie', 'magnet': f"magnet:?xt=urn:btih:{added_hash}&dn=Benchmark"})))
+            with app.app_context():
+                added_id = Download.query.filter_by(user_id=user_id, info_hash=added_hash).one().id
+            results['delete'] = measure.run(lambda: _expect(http.post(f'/delete/{added_id}')))
+            with app.app_context():
+                results['plex_partial_scan'] = measure.run(lambda: app_module.refresh_plex_library(
+                    ['/downloads/movies/Benchmark Movie (2023)/Benchmark Movie (2023).mkv'], wait=True))
+            results['transmission_status'] = measure.run(lambda: _expect(http.get('/api/transmission-status')))
+            results['plex_status'] = measure.run(lambda: _expect(http.get('/api/plex-status')))
+            results['health'] = measure.run(
+                lambda: [_expect(http.get('/api/health')) for _ in range(HEALTH_POLLS)])
+    finally:
+        with app.app_context():
+            # Sin restos: una segunda pasada (p. ej. la reproducción) parte del mismo estado
+            Download.query.filter_by(user_id=user_id).delete()
+            Torrent.query.filter(Torrent.info_hash.in_(hashes + [added_hash])).delete()
+            db.session.delete(db.session.get(UserModel, user_id))
+            db.session.commit()
+        for name, value in saved.items():
+            setattr(app_module, name, value)
+    return results
+
+
+def run_benchmark(torrents=100, active=5, latency=0.0, record=None, replay=None,
+                  transmission_url=None, plex_url=None):
+    """Monta los servidores según el modo y devuelve {'config', 'results'}"""
+    config = {'torrents': torrents, 'active': active, 'latency': latency,
+              'mode': 'replay' if replay else 'record' if record else 'live'}
+
+    if replay:
+        cassette = Cassette.load(replay)
+        transmission_server = replay_server(cassette, latency=latency)
+        plex_server = replay_server(cassette, latency=latency)
+        cassette = None
+    else:
+        cassette = Cassette() if record else None
+        if transmission_url:
+            transmission_server = recording_proxy(transmission_url, cassette or Cassette(), latency=latency)
+        else:
+            fake = FakeTransmission(torrent_count=torrents)
+            for index in range(torrents + 1, torrents + active + 1):
+                fake.add_torrent(bench_hash(index), name=f"Movie {index}", status=4, percentDone=0.5,
+                                 rateDownload=1024 ** 2, eta=600)
+            transmission_server = fake_transmission_server(fake, latency=latency, cassette=cassette)
+        if plex_url:
+            plex_server = recording_proxy(plex_url, cassette or Cassette(), latency=latency)
+        else:
+            plex_server = fake_plex_server(FakePlex(), latency=latency, cassette=cassette)
+
+    with transmission_server, plex_server:
+        # El proxy conserva la ruta: el prefijo RPC va en la URL local
+        results = run_scenarios(f"{transmission_server.base_url}/transmission/rpc", plex_server.base_url,
+                                torrents, active, [transmission_server, plex_server])
+
+    if cassette is not None:
+        cassette.save(record)
+    return {'config': config, 'results': results}
+
+
+def format_table(report):
+    lines = [f"{'escenario':<26}{'rpc':>6}{'http':>6}{'bytes':>12}{'ms':>10}"]
+    for name in SCENARIOS:
+        r = report['results'][name]
+        lines.append(f"{name:<26}{r['rpc']:>6}{r['requests']:>6}{r['bytes']:>12}{r['wall_ms']:>10.1f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--torrents', type=int, default=100, help='Torrents terminados en el servidor falso')
+    parser.add_argument('--active', type=int, default=5, help='Torrents descargándose')
+    parser.add_argument('--latency', type=float, default=0.0, help='Segundos añadidos a cada respuesta')
+    parser.add_argument('--record', metavar='ARCHIVO', help='Graba el tráfico en ARCHIVO')
+    parser.add_argument('--replay', metavar='ARCHIVO', help='Reproduce ARCHIVO en lugar de usar servidores')
+    parser.add_argument('--transmission-url', help='Transmission real (a través de un proxy que graba)')
+    parser.add_argument('--plex-url', help='Plex real (a través de un proxy que graba)')
+    parser.add_argument('--json', metavar='ARCHIVO', help='Guarda el informe en JSON')
+    args = parser.parse_args(argv)
+    if args.record and args.replay:
+        parser.error('--record y --replay son excluyentes')
+    # Si se pasa la URL de Transmission, se usa tal cual (incluido /transmission/rpc)
+    transmission_url = args.transmission_url.rsplit('/transmission/rpc', 1)[0] if args.transmission_url else None
+
+    _isolated_environment()
+    # Sin cola: con todas las descargas de un mismo usuario pararía casi todos los torrents
+    os.environ.setdefault('QUEUE_GLOBAL_CAP', '0')
+    report = run_benchmark(args.torrents, args.active, args.latency, args.record, args.replay,
+                           transmission_url, args.plex_url)
+    print(format_table(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import os
+import uuid
+import tempfile
+
+import pytest
+
+# Aislar las bases de datos de los tests antes de importar la app
+_TEST_DIR = tempfile.mkdtemp(prefix='yts-tests-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_TEST_DIR, 'yts.db')}")
+os.environ.setdefault('CATALOG_DB_PATH', os.path.join(_TEST_DIR, 'catalog.db'))
+os.environ.setdefault('TRACKER_HEALTH_PATH', os.path.join(_TEST_DIR, 'trackers.json'))
+os.environ.setdefault('POSTER_CACHE_DIR', os.path.join(_TEST_DIR, 'posters'))
+os.environ.setdefault('MONITOR_LOCK_PATH', os.path.join(_TEST_DIR, 'monitor.lock'))
+os.environ.setdefault('MONITOR_STATE_PATH', os.path.join(_TEST_DIR, 'monitor.json'))
+os.environ.setdefault('JOB_QUEUE_PATH', os.path.join(_TEST_DIR, 'jobs.db'))
+os.environ.setdefault('PLEX_LIBRARY_PATH', os.path.join(_TEST_DIR, 'plex_library.db'))
+os.environ.setdefault('INTERNAL_TOKEN_PATH', os.path.join(_TEST_DIR, 'internal_token'))
+os.environ.setdefault('HEALTH_KEEP_WARM', '0')
+# La cola con reparto justo se prueba aparte (test_download_queue.py)
+os.environ.setdefault('QUEUE_GLOBAL_CAP', '0')
+
+
+@pytest.fixture
+def auth_client():
+    """Cliente de pruebas con un usuario nuevo ya autenticado"""
+    from app import app, db, UserModel
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        user = UserModel(username=f"test-{uuid.uuid4().hex[:8]}", password='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['welcomed'] = True
+        client.user_id = user_id
+        yield client
@@ -0,0 +1,449 @@
+"""
+Servidores locales que imitan a los servicios externos en los tests y en
+el benchmark (tests/benchmark.py)
+
+- FakeTransmission / FakePlex: estado en memoria con el subconjunto de API
+  que usa la app (handshake 409, torrent-*, session-*, library/sections...)
+- FakeServer: los sirve por HTTP con latencia configurable, contando
+  peticiones y bytes, y opcionalmente grabando cada intercambio
+- recording_proxy / replay_server: graban el tráfico contra un servidor real
+  (o un fake) y lo reproducen después sin él
+"""
+import json
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.request
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import quoteattr
+
+
+class FakeClock:
+    """Reloj manual para tests deterministas"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTransmission:
+    """Subconjunto del RPC de Transmission con el handshake 409"""
+
+    RECENTLY_ACTIVE_WINDOW = 60
+
+    def __init__(self, clock=time.time, torrent_count=0):
+        self.clock = clock
+        self.session_id = uuid.uuid4().hex
+        self.torrents = {}
+        self.removed = []  # (id, instante) para ids: "recently-active"
+        self.next_id = 1
+        self.calls = []
+        self.handshakes = 0
+        self.lock = threading.Lock()
+        self.populate(torrent_count)
+
+    def populate(self, count, status=6):
+        """Añade count torrents inactivos (compartiendo) con hashes deterministas"""
+        for _ in range(count):
+            self.add_torrent(f"{self.next_id:040x}", name=f"Movie {self.next_id} (2000) [1080p]", status=status,
+                             percentDone=1.0, activityDate=self.clock() - 3600)
+
+    def rotate_session(self):
+        """Simula un reinicio de Transmission: el id anterior deja de valer"""
+        self.session_id = uuid.uuid4().hex
+
+    def add_torrent(self, hash_string, name='', **fields):
+        with self.lock:
+            torrent = {'id': self.next_id, 'hashString': hash_string.lower(), 'name': name,
+                       'status': 4, 'percentDone': 0.0, 'error': 0, 'errorString': '',
+                       'rateDownload': 0, 'eta': -1, 'sizeWhenDone': 2 * 1024 ** 3,
+                       'activityDate': self.clock()}
+            torrent.update(fields)
+            self.torrents[torrent['id']] = torrent
+            self.next_id += 1
+            return torrent
+
+    def update_torrent(self, hash_string, **fields):
+        """Cambia campos de un torrent y lo marca como activo ahora"""
+        with self.lock:
+            for torrent in self.torrents.values():
+                if torrent['hashString'] == hash_string.lower():
+                    torrent.update(fields, activityDate=self.clock())
+                    return torrent
+
+    def _select(self, ids):
+        if ids is None:
+            return list(self.torrents.values())
+        if ids == 'recently-active':
+            since = self.clock() - self.RECENTLY_ACTIVE_WINDOW
+            return [t for t in self.torrents.values() if t['activityDate'] >= since]
+        ids = ids if isinstance(ids, list) else [ids]
+        wanted = {str(i).lower() for i in ids}
+        return [t for t in self.torrents.values()
+                if str(t['id']) in wanted or t['hashString'] in wanted]
+
+    def handle(self, method, arguments):
+        with self.lock:
+            self.calls.append((method, arguments))
+        if method == 'torrent-add':
+            magnet = arguments.get('filename', '')
+            hash_string = magnet.split('btih:')[1].split('&')[0] if 'btih:' in magnet else uuid.uuid4().hex
+            for torrent in self.torrents.values():
+                if torrent['hashString'] == hash_string.lower():
+                    return {'torrent-duplicate': {'id': torrent['id'], 'hashString': torrent['hashString']}}
+            torrent = self.add_torrent(hash_string, status=0 if arguments.get('paused') else 4)
+            return {'torrent-added': {'id': torrent['id'], 'hashString': torrent['hashString']}}
+        if method == 'torrent-get':
+            fields = arguments.get('fields') or []
+            torrents = [{f: t.get(f) for f in fields if f in t} for t in self._select(arguments.get('ids'))]
+            if arguments.get('ids') == 'recently-active':
+                since = self.clock() - self.RECENTLY_ACTIVE_WINDOW
+                return {'torrents': torrents, 'removed': [i for i, when in self.removed if when >= since]}
+            return {'torrents': torrents}
+        if method == 'torrent-remove':
+            with self.lock:
+                for torrent in self._select(arguments.get('ids')):
+                    del self.torrents[torrent['id']]
+                    self.removed.append((torrent['id'], self.clock()))
+            return {}
+        if method == 'torrent-set':
+            for torrent in self._select(arguments.get('ids')):
+                torrent.update({k: v for k, v in arguments.items() if k != 'ids'})
+            return {}
+        if method in ('torrent-start', 'torrent-stop'):
+            with self.lock:
+                for torrent in self._select(arguments.get('ids')):
+                    torrent['status'] = 4 if method == 'torrent-start' else 0
+                    torrent['activityDate'] = self.clock()
+            return {}
+        if method == 'queue-move-top':
+            return {}
+        if method == 'session-get':
+            return {'version': '4.0.5 (fake)', 'rpc-version': 17}
+        if method == 'session-stats':
+            return {'torrentCount': len(self.torrents), 'activeTorrentCount': len(self.torrents)}
+        return None
+
+
+class InProcessClient:
+    """Cliente con la interfaz de TransmissionClient que llama al fake sin HTTP"""
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    def torrent_get(self, fields, ids=None):
+        arguments = {'fields': list(fields)}
+        if ids is not None:
+            arguments['ids'] = ids
+        return self.fake.handle('torrent-get', arguments)
+
+    def torrent_add(self, filename, download_dir=None, paused=False):
+        return self.fake.handle('torrent-add', {'filename': filename, 'download-dir': download_dir,
+                                                'paused': paused})
+
+    def torrent_remove(self, ids, delete_local_data=False):
+        return self.fake.handle('torrent-remove', {'ids': ids, 'delete-local-data': delete_local_data})
+
+    def torrent_start(self, ids):
+        return self.fake.handle('torrent-start', {'ids': ids})
+
+    def torrent_stop(self, ids):
+        return self.fake.handle('torrent-stop', {'ids': ids})
+
+    def queue_move_top(self, ids):
+        return self.fake.handle('queue-move-top', {'ids': ids})
+
+
+class FakePlex:
+    """Secciones, biblioteca de películas y escaneos de un servidor Plex"""
+
+    def __init__(self, token='', movie_count=0, clock=time.time):
+        self.token = token
+        self.clock = clock
+        self.sections = [
+            {'key': '1', 'type': 'movie', 'title': 'Películas', 'locations': ['/movies']},
+            {'key': '2', 'type': 'show', 'title': 'Series', 'locations': ['/tv']},
+        ]
+        self.movies = []
+        self.refreshes = []  # (sección, path o None)
+        self.requests = []
+        self.lock = threading.Lock()
+        for i in range(movie_count):
+            self.add_movie(f"Movie {i + 1}", 2000 + i % 20, imdb_code=f"tt{i + 1:07d}")
+
+    def add_movie(self, title, year, imdb_code=None, path=None, view_count=0):
+        with self.lock:
+            movie = {
+                'ratingKey': str(1000 + len(self.movies)),
+                'title': title,
+                'year': year,
+                'guid': f"imdb://{imdb_code}" if imdb_code else f"plex://movie/{uuid.uuid4().hex}",
+                'file': path or f"/movies/{title} ({year})/{title} ({year}).mkv",
+                'viewCount': view_count,
+                'updatedAt': int(self.clock()),
+            }
+            self.movies.append(movie)
+            return movie
+
+    def sections_xml(self):
+        directories = ''.join(
+            f'<Directory key="{s["key"]}" type="{s["type"]}" title={quoteattr(s["title"])}>'
+            + ''.join(f'<Location id="{i}" path={quoteattr(path)}/>' for i, path in enumerate(s['locations']))
+            + '</Directory>'
+            for s in self.sections
+        )
+        return f'<?xml version="1.0" encoding="UTF-8"?><MediaContainer size="{len(self.sections)}">{directories}</MediaContainer>'
+
+    def movies_xml(self, updated_since=None):
+        videos = ''.join(
+            f'<Video ratingKey="{m["ratingKey"]}" title={quoteattr(m["title"])} year="{m["year"]}" '
+            f'guid={quoteattr(m["guid"])} viewCount="{m["viewCount"]}" updatedAt="{m["updatedAt"]}">'
+            f'<Guid id={quoteattr(m["guid"])}/><Media><Part file={quoteattr(m["file"])}/></Media></Video>'
+            for m in self.movies if updated_since is None or m['updatedAt'] >= updated_since
+        )
+        return f'<?xml version="1.0" encoding="UTF-8"?><MediaContainer>{videos}</MediaContainer>'
+
+    def handle(self, method, path, query, headers):
+        """Devuelve (status, content_type, cuerpo)"""
+        with self.lock:
+            self.requests.append((method, path, query))
+        token = headers.get('X-Plex-Token') or (query.get('X-Plex-Token') or [''])[0]
+        if self.token and token != self.token:
+            return 401, 'text/plain', b'Unauthorized'
+
+        parts = path.strip('/').split('/')
+        if parts == ['library', 'sections']:
+            return 200, 'application/xml', self.sections_xml().encode()
+        if len(parts) == 4 and parts[:2] == ['library', 'sections'] and parts[3] == 'refresh':
+            with self.lock:
+                self.refreshes.append((parts[2], (query.get('path') or [None])[0]))
+            return 200, 'text/plain', b''
+        if len(parts) == 4 and parts[:2] == ['library', 'sections'] and parts[3] == 'all':
+            # Filtro de Plex "updatedAt>>=N": modificadas después de N
+            updated = (query.get('updatedAt>>') or [None])[0]
+            return 200, 'application/xml', self.movies_xml(int(updated) + 1 if updated else None).encode()
+        if parts == ['identity']:
+            return 200, 'application/xml', b'<MediaContainer machineIdentifier="fake-plex" version="1.40.0"/>'
+        return 404, 'text/plain', b'Not Found'
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    """Base: latencia simulada, contadores de tráfico y grabación"""
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _reply(self, status, body=b'', headers=None, request_body=b''):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        # Contar antes de responder: el cliente puede leer los contadores en cuanto recibe la respuesta
+        server.traffic.record(len(request_body), len(body))
+        if server.cassette is not None:
+            server.cassette.record(self.command, self.path, request_body, status, headers or {}, body)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _TransmissionHandler(_FakeHandler):
+    def do_POST(self):
+        fake = self.server.fake
+        raw = self._read_body()
+        if self.headers.get('X-Transmission-Session-Id') != fake.session_id:
+            fake.handshakes += 1
+            self._reply(409, b'<h1>409: Conflict</h1>', {'X-Transmission-Session-Id': fake.session_id}, raw)
+            return
+        payload = json.loads(raw or b'{}')
+        arguments = fake.handle(payload.get('method'), payload.get('arguments') or {})
+        if arguments is None:
+            body = {'result': 'method name not recognized', 'arguments': {}}
+        else:
+            body = {'result': 'success', 'arguments': arguments}
+        self._reply(200, json.dumps(body).encode(), {'Content-Type': 'application/json'}, raw)
+
+    do_GET = do_POST
+
+
+class _PlexHandler(_FakeHandler):
+    def do_GET(self):
+        raw = self._read_body()
+        url = urlparse(self.path)
+        status, content_type, body = self.server.fake.handle(
+            self.command, url.path, parse_qs(url.query), self.headers)
+        self._reply(status, body, {'Content-Type': content_type}, raw)
+
+    do_POST = do_GET
+    do_PUT = do_GET
+
+
+class Traffic:
+    """Peticiones y bytes que pasaron por un servidor"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, bytes_in, bytes_out):
+        with self.lock:
+            self.requests += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def snapshot(self):
+        with self.lock:
+            return {'requests': self.requests, 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out}
+
+
+class Cassette:
+    """Intercambios HTTP grabados, reproducibles por método, ruta y cuerpo"""
+
+    def __init__(self, interactions=None):
+        self.interactions = list(interactions or [])
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(method, path, body):
+        try:
+            # JSON canónico: el orden de las claves no importa
+            body = json.dumps(json.loads(body), sort_keys=True)
+        except (ValueError, TypeError):
+            body = body.decode('utf-8', 'replace') if isinstance(body, bytes) else (body or '')
+        return f"{method} {path} {body}"
+
+    def record(self, method, path, request_body, status, headers, body):
+        with self.lock:
+            self.interactions.append({
+                'key': self.key(method, path, request_body),
+                'status': status,
+                'headers': dict(headers),
+                'body': body.decode('utf-8', 'replace'),
+            })
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'interactions': self.interactions}, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f)['interactions'])
+
+    def responses(self):
+        """Cola de respuestas por clave, en el orden en que se grabaron"""
+        queues = defaultdict(deque)
+        for interaction in self.interactions:
+            queues[interaction['key']].append(interaction)
+        return queues
+
+
+class _ReplayHandler(_FakeHandler):
+    def do_POST(self):
+        raw = self._read_body()
+        key = Cassette.key(self.command, self.path, raw)
+        with self.server.replay_lock:
+            queue = self.server.replay.get(key)
+            interaction = queue.popleft() if queue else None
+            # La última respuesta de cada clave se repite si se pide más veces
+            if interaction and not queue:
+                queue.append(interaction)
+        if interaction is None:
+            self._reply(599, f"Sin grabación para {key}".encode(), request_body=raw)
+            return
+        self._reply(interaction['status'], interaction['body'].encode(), interaction['headers'], raw)
+
+    do_GET = do_POST
+    do_PUT = do_POST
+
+
+class _ProxyHandler(_FakeHandler):
+    def do_POST(self):
+        raw = self._read_body()
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in ('host', 'content-length', 'connection')}
+        request = urllib.request.Request(self.server.upstream + self.path, data=raw or None,
+                                         headers=headers, method=self.command)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as resp:
+                status, resp_headers, body = resp.status, dict(resp.headers), resp.read()
+        except urllib.error.HTTPError as e:
+            status, resp_headers, body = e.code, dict(e.headers), e.read()
+        keep = {k: v for k, v in resp_headers.items()
+                if k.lower() in ('content-type', 'x-transmission-session-id')}
+        self._reply(status, body, keep, raw)
+
+    do_GET = do_POST
+    do_PUT = do_POST
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class FakeServer:
+    """Arranca un handler HTTP en un hilo sobre un puerto libre de localhost
+
+    latency: segundos añadidos a cada respuesta; cassette: graba el tráfico.
+    """
+
+    def __init__(self, handler, fake, latency=0, cassette=None):
+        self.fake = fake
+        self.httpd = _HTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.fake = fake
+        self.httpd.latency = latency
+        self.httpd.traffic = Traffic()
+        self.httpd.cassette = cassette
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    @property
+    def traffic(self):
+        return self.httpd.traffic
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def fake_transmission_server(fake=None, latency=0, cassette=None):
+    return FakeServer(_TransmissionHandler, fake or FakeTransmission(), latency=latency, cassette=cassette)
+
+
+def fake_plex_server(fake=None, latency=0, cassette=None):
+    return FakeServer(_PlexHandler, fake or FakePlex(), latency=latency, cassette=cassette)
+
+
+def recording_proxy(upstream_url, cassette, latency=0):
+    """Proxy hacia un servidor real que graba cada intercambio en cassette"""
+    server = FakeServer(_ProxyHandler, None, latency=latency, cassette=cassette)
+    server.httpd.upstream = upstream_url.rstrip('/')
+    return server
+
+
+def replay_server(cassette, latency=0):
+    """Servidor que responde con lo grabado en cassette, sin upstream"""
+    server = FakeServer(_ReplayHandler, None, latency=latency)
+    server.httpd.replay = cassette.responses()
+    server.httpd.replay_lock = threading.Lock()
+    return server
@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+import app as app_module
+from catalog import CatalogMirror
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'yts_list_movies.json')
+
+
+@pytest.fixture(autouse=True)
+def local_catalog(monkeypatch):
+    with open(FIXTURE_PATH) as f:
+        dump = json.load(f)
+    catalog = CatalogMirror(':memory:')
+    catalog.sync(fetch_page=lambda params: dump['pages'].get(str(params['page']), {}),
+                 page_size=dump['page_size'])
+    monkeypatch.setattr(app_module, 'catalog', catalog)
+    return catalog
+
+
+def test_projection_and_best_torrent(auth_client):
+    resp = auth_client.get('/api/search?query=inception&fields=title,imdb_code,torrent_hash')
+    assert resp.status_code == 200
+    assert resp.get_json()['results'] == [{
+        'title': 'Inception',
+        'imdb_code': 'tt1375666',
+        'torrent_hash': '00000622' + 'B' * 32,
+    }]
+
+
+def test_cursor_pages_through_results(auth_client):
+    first = auth_client.get('/api/search?query=dune&limit=1').get_json()
+    assert first['total'] == 2
+    assert first['results'][0]['title'] == 'Dune: Part Two'
+
+    second = auth_client.get(f"/api/search?cursor={first['next_cursor']}").get_json()
+    assert second['page'] == 2
+    assert second['results'][0]['title'] == 'Dune'
+    assert second['next_cursor'] is None
+
+
+def test_etag_returns_304(auth_client):
+    first = auth_client.get('/api/search?query=dune')
+    etag = first.headers['ETag']
+
+    again = auth_client.get('/api/search?query=dune', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+
+def test_rejects_bad_input(auth_client):
+    assert auth_client.get('/api/search?query=dune&fields=password').status_code == 400
+    assert auth_client.get('/api/search?cursor=forged').status_code == 400
+    assert auth_client.get('/api/search').status_code == 400
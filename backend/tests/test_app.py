@@ -1,65 +1,72 @@
+import uuid
+
 import pytest
-from app import app, get_movie, build_magnet
+import requests
 import responses
-from unittest.mock import mock_open, patch
+
+import app as app_module
+from app import app, build_magnet, Download
+from catalog import CatalogMirror
+from tests.fakes import FakeTransmission, InProcessClient
+from http_client import UpstreamClient
+from yts_client import YTS_API_URL, fetch_list_movies
+
+@pytest.fixture(autouse=True)
+def empty_catalog(monkeypatch):
+    # Catálogo vacío: las búsquedas van a la API de YTS simulada
+    monkeypatch.setattr(app_module, 'catalog', CatalogMirror(':memory:'))
+
 
 @pytest.fixture
-def client():
-    app.config['TESTING'] = True
-    # Registrar la función build_magnet en el contexto de Jinja2
-    app.jinja_env.globals['build_magnet'] = build_magnet
-    with app.test_client() as client:
-        yield client
+def fake_transmission(monkeypatch):
+    fake = FakeTransmission()
+    monkeypatch.setattr(app_module, 'transmission', InProcessClient(fake))
+    return fake
+
 
 @pytest.fixture
-def mock_movies_data():
-    return [
-        {
-            "title": "Test Movie",
-            "magnet": "magnet:?xt=test",
-            "subs": "es",
-            "year": "2023",
-            "rating": "8.5",
-            "status": "pendiente",
-            "imdb_code": "tt1234567"
-        }
-    ]
+def movie_data():
+    return {
+        "title": f"Test Movie {uuid.uuid4().hex[:6]}",
+        "magnet": f"magnet:?xt=urn:btih:{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}&dn=Test",
+        "subs": "es",
+        "year": "2023",
+        "rating": "8.5",
+        "imdb_code": "tt1234567"
+    }
 
-def test_index_route(client, mock_movies_data):
-    with patch('app.load_movies', return_value=mock_movies_data):
-        response = client.get('/')
-        assert response.status_code == 200
-        assert b'Test Movie' in response.data
+def test_index_route(auth_client, fake_transmission, movie_data):
+    auth_client.post('/add', json=movie_data)
+    response = auth_client.get('/')
+    assert response.status_code == 200
+    assert movie_data['title'].encode() in response.data
 
 @responses.activate
-def test_search_route_with_results(client):
+def test_search_route_with_results(auth_client):
     # Simular respuesta de la API de YTS
     mock_response = {
         "status": "ok",
         "data": {
+            "movie_count": 1,
             "movies": [{
+                "id": 1,
                 "title": "Test Movie",
                 "year": 2023,
                 "rating": 8.5,
                 "imdb_code": "tt1234567",
                 "title_long": "Test Movie (2023)",
-                "torrents": [{"hash": "1234567890abcdef"}]
+                "torrents": [{"hash": "1234567890abcdef", "quality": "1080p", "type": "web"}]
             }]
         }
     }
-    responses.add(
-        responses.GET,
-        'https://yts.mx/api/v2/list_movies.json?query_term=test&quality=1080p&limit=10',
-        json=mock_response,
-        status=200
-    )
-    
-    response = client.get('/search?query=test')
+    responses.add(responses.GET, YTS_API_URL, json=mock_response, status=200)
+
+    response = auth_client.get('/search?query=test')
     assert response.status_code == 200
     assert b'Test Movie' in response.data
 
 @responses.activate
-def test_search_route_no_results(client):
+def test_search_route_no_results(auth_client):
     # Simular respuesta sin resultados
     mock_response = {
         "status": "ok",
@@ -67,48 +74,38 @@ def test_search_route_no_results(client):
             "movies": []
         }
     }
-    responses.add(
-        responses.GET,
-        'https://yts.mx/api/v2/list_movies.json?query_term=nonexistent&quality=1080p&limit=10',
-        json=mock_response,
-        status=200
-    )
-    
-    response = client.get('/search?query=nonexistent')
+    responses.add(responses.GET, YTS_API_URL, json=mock_response, status=200)
+
+    response = auth_client.get('/search?query=nonexistent')
     assert response.status_code == 200
     assert b'No se encontraron resultados' in response.data
 
-def test_add_movie_route(client):
-    movie_data = {
-        "title": "New Test Movie",
-        "magnet": "magnet:?xt=test2",
-        "subs": "es",
-        "year": "2023",
-        "rating": "8.5",
-        "imdb_code": "tt7654321"
-    }
-    
-    with patch('app.load_movies', return_value=[]):
-        with patch('app.save_movies') as mock_save:
-            response = client.post('/add',
-                                json=movie_data,
-                                content_type='application/json')
-            
-            assert response.status_code == 200
-            mock_save.assert_called_once()
-
-def test_add_duplicate_movie(client, mock_movies_data):
-    movie_data = mock_movies_data[0]
-    
-    with patch('app.load_movies', return_value=mock_movies_data):
-        response = client.post('/add',
-                            json=movie_data,
-                            content_type='application/json')
-        
-        assert response.status_code == 409
-        response_data = response.get_json()
-        assert "error" in response_data
-        assert "ya está en la lista" in response_data["error"]
+@responses.activate
+def test_fetch_list_movies_raises_on_http_error(monkeypatch):
+    monkeypatch.setattr(UpstreamClient, '_sleep_before_retry', lambda self, attempt: None)
+    responses.add(responses.GET, YTS_API_URL, body='<html>502 Bad Gateway</html>', status=502)
+    with pytest.raises(requests.exceptions.HTTPError):
+        fetch_list_movies({'query_term': 'dune'})
+    responses.replace(responses.GET, YTS_API_URL, json={'status': 'ok', 'data': {'movies': []}})
+    assert fetch_list_movies({'query_term': 'dune'}) == {'movies': []}
+
+def test_add_movie_route(auth_client, fake_transmission, movie_data):
+    response = auth_client.post('/add', json=movie_data)
+
+    assert response.status_code == 200
+    assert [method for method, _ in fake_transmission.calls] == ['torrent-add']
+    with app.app_context():
+        assert Download.query.filter_by(user_id=auth_client.user_id, movie_title=movie_data['title']).count() == 1
+
+def test_add_duplicate_movie(auth_client, fake_transmission, movie_data):
+    auth_client.post('/add', json=movie_data)
+    response = auth_client.post('/add', json=movie_data)
+
+    assert response.status_code == 409
+    response_data = response.get_json()
+    assert "error" in response_data
+    assert "Ya has agregado esta película" in response_data["error"]
+    assert len(fake_transmission.calls) == 1
 
 def test_build_magnet():
     movie = {
@@ -123,3 +120,10 @@ def test_build_magnet():
     assert "Test%20Movie%20%282023%29" in magnet
     for tracker in ["open.demonii.com", "tracker.opentrackr.org"]:
         assert tracker in magnet
+
+def test_add_ignores_client_selection_reason(auth_client, fake_transmission, movie_data, caplog):
+    movie_data['selection_reason'] = 'inventado por el cliente'
+    with caplog.at_level('INFO'):
+        response = auth_client.post('/add', json=movie_data)
+    assert response.status_code == 200
+    assert 'inventado por el cliente' not in caplog.text
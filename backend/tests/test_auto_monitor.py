@@ -0,0 +1,81 @@
+from auto_monitor import AdaptiveInterval, LeaderLock, Monitor, read_monitor_state
+from tests.fakes import FakeClock
+
+
+def test_adaptive_interval_backs_off_when_idle():
+    interval = AdaptiveInterval(fast=15, idle=300)
+    assert [interval.next(False) for _ in range(6)] == [30, 60, 120, 240, 300, 300]
+    assert interval.next(True) == 15
+
+
+def test_only_one_leader(tmp_path):
+    first = LeaderLock(str(tmp_path / 'monitor.lock'))
+    second = LeaderLock(str(tmp_path / 'monitor.lock'))
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_monitor_cycle_writes_heartbeat(tmp_path):
+    clock = FakeClock()
+    completed = []
+    summaries = iter([
+        {'full': True, 'transitions': 1, 'completed': ['Alien'], 'active': 2, 'downloading': 1},
+        {'full': False, 'transitions': 0, 'completed': [], 'active': 1, 'downloading': 0},
+    ])
+    state_path = str(tmp_path / 'monitor.json')
+    monitor = Monitor(
+        sync_statuses=lambda: next(summaries),
+        handle_completed=completed.extend,
+        lock=LeaderLock(str(tmp_path / 'monitor.lock')),
+        state_path=state_path,
+        interval=AdaptiveInterval(fast=15, idle=300),
+        clock=clock,
+    )
+
+    assert monitor.step() == 15
+    assert completed == ['Alien']
+    assert monitor.step() == 30  # Sin actividad: se espacia
+
+    state = read_monitor_state(state_path, clock=clock)
+    assert state['alive'] and state['next_run_in'] == 30
+    assert state['tasks']['status_sync']['runs'] == 2
+    assert state['tasks']['completions']['runs'] == 1
+
+    clock.now += 10000
+    assert not read_monitor_state(state_path, clock=clock)['alive']
+    monitor.lock.release()
+
+
+def test_monitor_survives_task_errors(tmp_path):
+    def failing():
+        raise RuntimeError('Transmission caído')
+
+    monitor = Monitor(sync_statuses=failing, handle_completed=lambda titles: None,
+                      lock=LeaderLock(str(tmp_path / 'monitor.lock')),
+                      state_path=str(tmp_path / 'monitor.json'),
+                      interval=AdaptiveInterval(fast=15, idle=300))
+    assert monitor.step() == 30
+    assert monitor.tasks['status_sync']['failures'] == 1
+    assert monitor.tasks['status_sync']['last_error'] == 'Transmission caído'
+    monitor.lock.release()
+
+
+def test_standby_when_lock_taken(tmp_path):
+    holder = LeaderLock(str(tmp_path / 'monitor.lock'))
+    assert holder.acquire()
+    calls = []
+    monitor = Monitor(sync_statuses=lambda: calls.append(1), handle_completed=lambda titles: None,
+                      lock=LeaderLock(str(tmp_path / 'monitor.lock')),
+                      state_path=str(tmp_path / 'monitor.json'))
+    monitor.step()
+    assert calls == []
+    holder.release()
+
+
+def test_monitor_status_endpoint(auth_client):
+    resp = auth_client.get('/api/monitor-status')
+    assert resp.status_code == 200
+    assert 'alive' in resp.get_json()
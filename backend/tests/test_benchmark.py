@@ -0,0 +1,51 @@
+import json
+import urllib.request
+
+from tests.benchmark import SCENARIOS, run_benchmark
+from tests.fakes import Cassette, FakePlex, fake_plex_server, replay_server
+
+
+def test_benchmark_reports_every_scenario():
+    report = run_benchmark(torrents=20, active=2)
+    results = report['results']
+    assert list(results) == SCENARIOS
+    # Un solo torrent-get por sondeo, completo o incremental
+    assert results['check_status_full']['rpc'] == 1
+    assert results['check_status_incremental']['rpc'] == 1
+    assert results['check_status_incremental']['bytes'] < results['check_status_full']['bytes']
+    assert results['add']['rpc'] == 1
+    assert results['delete']['rpc'] == 1
+    assert results['plex_status'] == dict(results['plex_status'], rpc=0, requests=1)
+    # Diez lecturas de /api/health: una sola sonda a cada servicio
+    assert results['health'] == dict(results['health'], rpc=1, requests=2)
+
+
+def test_replay_matches_recording(tmp_path):
+    path = str(tmp_path / 'cassette.json')
+    recorded = run_benchmark(torrents=10, active=1, record=path)
+    replayed = run_benchmark(torrents=10, active=1, replay=path)
+    for name in SCENARIOS:
+        for key in ('rpc', 'requests', 'bytes'):
+            assert replayed['results'][name][key] == recorded['results'][name][key], (name, key)
+
+
+def test_fake_plex_sections_and_partial_refresh():
+    plex = FakePlex(token='secret')
+    with fake_plex_server(plex) as server:
+        with urllib.request.urlopen(f"{server.base_url}/library/sections?X-Plex-Token=secret") as resp:
+            body = resp.read()
+        assert b'<Location id="0" path="/movies"/>' in body
+        urllib.request.urlopen(f"{server.base_url}/library/sections/1/refresh?path=/movies/Heat&X-Plex-Token=secret")
+        assert server.traffic.snapshot()['requests'] == 2
+    assert plex.refreshes == [('1', '/movies/Heat')]
+
+
+def test_replay_server_repeats_last_response():
+    cassette = Cassette()
+    cassette.record('POST', '/rpc', b'{"b": 1, "a": 2}', 200, {'Content-Type': 'application/json'}, b'{"ok": 1}')
+    with replay_server(cassette) as server:
+        for _ in range(2):
+            # Mismo JSON con otro orden de claves: misma grabación
+            request = urllib.request.Request(f"{server.base_url}/rpc", data=b'{"a": 2, "b": 1}', method='POST')
+            with urllib.request.urlopen(request) as resp:
+                assert json.load(resp) == {'ok': 1}
@@ -0,0 +1,76 @@
+import json
+
+import responses
+
+from app import app, db, Download, TRANSMISSION_URL
+
+
+def transmission_callback(calls):
+    def callback(request):
+        if request.headers.get('X-Transmission-Session-Id') != 'sid':
+            return 409, {'X-Transmission-Session-Id': 'sid'}, ''
+        body = json.loads(request.body)
+        calls.append(body)
+        return 200, {}, json.dumps({'result': 'success', 'arguments': {}})
+    return callback
+
+
+def magnet(hash_):
+    return f'magnet:?xt=urn:btih:{hash_}&dn=x'
+
+
+@responses.activate
+def test_bulk_add_reuses_one_session(auth_client):
+    calls = []
+    responses.add_callback(responses.POST, TRANSMISSION_URL, callback=transmission_callback(calls))
+
+    resp = auth_client.post('/api/downloads/bulk', json={'action': 'add', 'items': [
+        {'title': 'Movie A', 'magnet': magnet('AAA')},
+        {'title': 'Movie B', 'magnet': magnet('BBB')},
+        {'title': 'Movie A', 'magnet': magnet('AAA')},
+        {'magnet': magnet('CCC')},
+    ]})
+    results = resp.get_json()['results']
+
+    assert [r['status'] for r in results] == ['added', 'added', 'duplicate', 'invalid']
+    assert all(r['started'] for r in results[:2])
+    # Como mucho un handshake 409 + un torrent-add por película
+    assert len(responses.calls) - len(calls) <= 1
+    assert [c['method'] for c in calls] == ['torrent-add', 'torrent-add']
+
+    with app.app_context():
+        rows = Download.query.filter_by(user_id=auth_client.user_id).all()
+        assert sorted(d.status for d in rows) == ['descargando', 'descargando']
+
+
+@responses.activate
+def test_bulk_delete_single_torrent_remove(auth_client):
+    calls = []
+    responses.add_callback(responses.POST, TRANSMISSION_URL, callback=transmission_callback(calls))
+
+    with app.app_context():
+        downloads = [
+            Download(movie_title=f'Movie {h}', movie_id='', magnet=magnet(h), status=status,
+                     user_id=auth_client.user_id)
+            for h, status in [('AAA', 'descargando'), ('BBB', 'completado'), ('CCC', 'pendiente')]
+        ]
+        db.session.add_all(downloads)
+        db.session.commit()
+        ids = [d.id for d in downloads]
+
+    resp = auth_client.post('/api/downloads/bulk', json={'action': 'delete', 'ids': ids + [999999]})
+    results = resp.get_json()['results']
+
+    assert [r['status'] for r in results] == ['deleted', 'deleted', 'deleted', 'not_found']
+    assert len(calls) == 1
+    assert calls[0]['method'] == 'torrent-remove'
+    assert calls[0]['arguments']['ids'] == ['aaa', 'bbb']  # hashes normalizados a minúsculas
+
+    with app.app_context():
+        assert Download.query.filter(Download.id.in_(ids)).count() == 0
+
+
+def test_bulk_rejects_bad_payload(auth_client):
+    assert auth_client.post('/api/downloads/bulk', json={'action': 'explode'}).status_code == 400
+    assert auth_client.post('/api/downloads/bulk', json={'action': 'delete', 'ids': ['1']}).status_code == 400
+    assert auth_client.post('/api/downloads/bulk', json={'action': 'add', 'items': []}).status_code == 400
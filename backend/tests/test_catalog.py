@@ -0,0 +1,131 @@
+import json
+import os
+
+import pytest
+
+from catalog import CatalogMirror, build_fts_query
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'yts_list_movies.json')
+
+
+class FixtureYTS:
+    """Sustituye a list_movies.json con un volcado grabado"""
+
+    def __init__(self):
+        with open(FIXTURE_PATH) as f:
+            dump = json.load(f)
+        self.page_size = dump['page_size']
+        self.pages = dump['pages']
+        self.calls = []
+
+    def __call__(self, params):
+        self.calls.append(params)
+        return self.pages.get(str(params['page']), {'movie_count': 0, 'movies': []})
+
+
+@pytest.fixture
+def catalog():
+    return CatalogMirror(':memory:')
+
+
+@pytest.fixture
+def fixture_yts():
+    return FixtureYTS()
+
+
+def test_build_fts_query_escapes_operators():
+    assert build_fts_query('Dune: Part "Two" OR') == '"dune"* "part"* "two"* "or"*'
+
+
+def test_sync_pages_until_exhausted(catalog, fixture_yts):
+    assert not catalog.is_ready()
+    total = catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size)
+
+    assert total == 5
+    assert catalog.is_ready()
+    assert catalog.watermark == 1712000500
+    assert [c['page'] for c in fixture_yts.calls] == [1, 2, 3]
+
+
+def test_incremental_sync_stops_at_watermark(catalog, fixture_yts):
+    catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size)
+    fixture_yts.calls.clear()
+
+    assert catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size, refresh_pages=0) == 0
+    assert [c['page'] for c in fixture_yts.calls] == [1]
+
+
+def test_sync_cut_by_max_pages_resumes(catalog, fixture_yts):
+    for expected_page in (1, 2):
+        catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size, max_pages=1)
+        assert fixture_yts.calls[-1]['page'] == expected_page
+        # A medias: ni marca de agua ni catálogo listo
+        assert catalog.watermark == 0 and not catalog.is_ready()
+
+    assert catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size, max_pages=1) == 1
+    assert catalog.is_ready() and catalog.watermark == 1712000500
+    assert catalog.search('')['movie_count'] == 5
+
+
+def test_sync_error_keeps_watermark(catalog, fixture_yts):
+    def flaky(params):
+        if params['page'] == 2:
+            raise RuntimeError('YTS caído')
+        return fixture_yts(params)
+
+    with pytest.raises(RuntimeError):
+        catalog.sync(fetch_page=flaky, page_size=fixture_yts.page_size)
+    assert catalog.watermark == 0 and not catalog.is_ready()
+    catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size)
+    assert [c['page'] for c in fixture_yts.calls] == [1, 2, 3]
+    assert catalog.is_ready()
+
+
+def test_refresh_updates_seeds_in_turns(catalog, fixture_yts):
+    catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size)
+    movie = fixture_yts.pages['2']['movies'][0]
+    movie['torrents'][0]['seeds'] = 9999
+    fixture_yts.calls.clear()
+
+    catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size, refresh_pages=2)
+    # Página 1 para lo nuevo; después el refresco de las páginas 1 y 2
+    assert [c['page'] for c in fixture_yts.calls] == [1, 1, 2]
+    assert catalog.get_by_imdb(movie['imdb_code'])['torrents'][0]['seeds'] == 9999
+
+    fixture_yts.calls.clear()
+    catalog.refresh(fetch_page=fixture_yts, pages=2, page_size=fixture_yts.page_size)
+    # La página 3 es la última: la siguiente vuelta empieza de nuevo
+    assert [c['page'] for c in fixture_yts.calls] == [3]
+    assert catalog.get_state('refresh_page') == '1'
+
+
+def test_search_matches_title_and_genre(catalog, fixture_yts):
+    catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size)
+
+    data = catalog.search('dune')
+    assert data['movie_count'] == 2
+    # Mismo orden que /search: año descendente
+    assert [m['title'] for m in data['movies']] == ['Dune: Part Two', 'Dune']
+
+    assert catalog.search('sci')['movie_count'] == 2
+    assert catalog.search('biography')['movies'][0]['imdb_code'] == 'tt15398776'
+
+
+def test_search_paging(catalog, fixture_yts):
+    catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size)
+
+    first = catalog.search('', page=1, limit=2, sort_by='year')
+    second = catalog.search('', page=2, limit=2, sort_by='year')
+    assert first['movie_count'] == 5
+    assert [m['year'] for m in first['movies']] == [2024, 2023]
+    assert [m['year'] for m in second['movies']] == [2021, 2014]
+
+
+def test_upsert_replaces_torrents(catalog, fixture_yts):
+    catalog.sync(fetch_page=fixture_yts, page_size=fixture_yts.page_size)
+    movie = catalog.get_by_imdb('tt1375666')
+    movie['torrents'] = movie['torrents'][:1]
+    catalog.upsert_movies([movie])
+
+    assert len(catalog.get_by_imdb('tt1375666')['torrents']) == 1
+    assert catalog.search('inception', quality='1080p')['movie_count'] == 0
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+import app as app_module
+from app import app, db, Download, check_downloads_status
+from events import EventBroker, INTERNAL_TOKEN_HEADER, internal_token
+from status_sync import StatusSync
+from tests.fakes import FakeClock, FakeTransmission, InProcessClient
+
+
+def test_broker_filters_by_user_and_resumes():
+    broker = EventBroker(history=10)
+    mine, _, _ = broker.subscribe(user_id=1)
+    everyone, _, _ = broker.subscribe(user_id=None)
+
+    first = broker.publish(1, 'download', {'id': 10, 'status': 'descargando'})
+    broker.publish(2, 'download', {'id': 20, 'status': 'descargando'})
+    third = broker.publish(1, 'download', {'id': 10, 'status': 'completado'})
+
+    assert [mine.get(0).id, mine.get(0).id, mine.get(0)] == [first, third, None]
+    assert everyone.queue.qsize() == 3
+
+    # Reconexión con Last-Event-ID: solo lo que faltaba y del mismo usuario
+    _, missed, resync = broker.subscribe(user_id=1, last_event_id=first)
+    assert [e.id for e in missed] == [third] and not resync
+
+
+def test_broker_resync_when_history_lost():
+    broker = EventBroker(history=2)
+    first = broker.publish(1, 'download', {})
+    for _ in range(5):
+        broker.publish(1, 'download', {})
+    _, missed, resync = broker.subscribe(user_id=1, last_event_id=first)
+    assert resync and len(missed) == 2
+
+
+def test_slow_subscriber_overflows():
+    broker = EventBroker()
+    subscription, _, _ = broker.subscribe(user_id=1)
+    for _ in range(subscription.queue.maxsize + 1):
+        broker.publish(1, 'download', {})
+    assert subscription.overflowed
+
+
+def read_events(resp, count):
+    """Lee del stream hasta tener count eventos 'download'"""
+    events, buffer = [], ''
+    for chunk in resp.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while '\n\n' in buffer:
+            block, buffer = buffer.split('\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+            if fields.get('event') == 'download':
+                events.append((int(fields['id']), json.loads(fields['data'])))
+        if len(events) >= count:
+            return events
+    return events
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = EventBroker()
+    monkeypatch.setattr(app_module, 'download_events', broker)
+    monkeypatch.setattr(app_module, 'SSE_HEARTBEAT', 0.05)
+    monkeypatch.setattr(app_module, 'SSE_MAX_STREAM', 1)
+    return broker
+
+
+def test_stream_replays_missed_events_for_user(auth_client, broker):
+    first = broker.publish(auth_client.user_id, 'download', {'id': 1, 'status': 'descargando'})
+    broker.publish(auth_client.user_id + 1000, 'download', {'id': 2, 'status': 'descargando'})
+    broker.publish(auth_client.user_id, 'download', {'id': 1, 'status': 'completado'})
+
+    resp = auth_client.get('/api/downloads/events', headers={'Last-Event-ID': str(first)}, buffered=False)
+    assert resp.mimetype == 'text/event-stream'
+    events = read_events(resp, 1)
+    resp.close()
+    assert [data for _, data in events] == [{'id': 1, 'status': 'completado'}]
+
+
+def test_sync_publishes_progress_deltas(auth_client, broker, monkeypatch):
+    clock = FakeClock()
+    fake = FakeTransmission(clock=clock)
+    monkeypatch.setattr(app_module, 'status_sync', StatusSync(InProcessClient(fake), clock=clock))
+    monkeypatch.setattr(app_module, 'refresh_plex_library', lambda *args, **kwargs: True)
+
+    hash_ = 'c' * 40
+    fake.add_torrent(hash_, status=4, percentDone=0.25, rateDownload=2048, eta=600)
+    with app.app_context():
+        download = Download(movie_title='Heat', movie_id='', magnet=f'magnet:?xt=urn:btih:{hash_}',
+                            info_hash=hash_, status='pendiente', user_id=auth_client.user_id)
+        db.session.add(download)
+        db.session.commit()
+        download_id = download.id
+
+    subscription, _, _ = broker.subscribe(user_id=auth_client.user_id)
+    with app.app_context():
+        assert check_downloads_status()
+    event = subscription.get(0)
+    assert event.data == {'id': download_id, 'status': 'descargando', 'percentDone': 0.25,
+                          'rate': 2048, 'eta': 600}
+
+    # Sin cambios en Transmission no se publica nada
+    clock.now += 5
+    with app.app_context():
+        assert check_downloads_status()
+    assert subscription.get(0) is None
+
+
+def test_internal_events_endpoint(auth_client, broker):
+    token = internal_token()
+    assert len(token) == 64 and internal_token() == token
+    resp = auth_client.post('/api/internal/download-events',
+                            json={'events': [{'user_id': auth_client.user_id, 'data': {'id': 1}}]},
+                            headers={INTERNAL_TOKEN_HEADER: token})
+    assert resp.status_code == 200 and resp.get_json()['published'] == 1
+
+    # Desde la propia máquina tampoco basta: hace falta el secreto
+    for headers in ({}, {INTERNAL_TOKEN_HEADER: 'x' * 64}):
+        resp = auth_client.post('/api/internal/download-events', json={'events': []}, headers=headers)
+        assert resp.status_code == 403
@@ -0,0 +1,115 @@
+import pytest
+
+import app as app_module
+from app import app, db, Download
+from download_matcher import DownloadMatcher, parse_release
+from events import INTERNAL_TOKEN_HEADER, internal_token
+from tests.bench_matcher import run_benchmark
+
+INTERNAL_HEADERS = {INTERNAL_TOKEN_HEADER: internal_token()}
+
+
+@pytest.fixture
+def matcher(monkeypatch):
+    matcher = DownloadMatcher()
+    monkeypatch.setattr(app_module, 'download_matcher', matcher)
+    return matcher
+
+
+def make_download(user_id, title, year='', hash_=None, status='descargando'):
+    return Download(movie_title=title, movie_id='', magnet=f'magnet:?xt=urn:btih:{hash_ or "0" * 40}&dn=x',
+                    info_hash=hash_, year=year, status=status, user_id=user_id)
+
+
+def test_parse_release_formats():
+    assert parse_release('Heat (1995) [1080p] [BluRay] [5.1] [YTS.MX]') == ({'heat'}, 1995)
+    assert parse_release('The.Lord.of.the.Rings.2001.720p.BluRay.x264-[YTS.AM]') == ({'lord', 'rings'}, 2001)
+    assert parse_release('Amélie 2001 1080p WEBRip') == ({'amelie'}, 2001)
+    # Un año al principio es parte del título
+    assert parse_release('1917 (2019) [2160p]') == ({'1917'}, 2019)
+    assert parse_release('It (2017)') == ({'it'}, 2017)
+    # Título hecho solo de palabras vacías
+    assert parse_release('The The') == ({'the'}, None)
+
+
+def test_match_rejects_partial_and_other_year():
+    matcher = DownloadMatcher()
+    matcher.build([(1, 'Her', 2013), (2, 'Alien', 1979), (3, 'Aliens', 1986), (4, 'Solaris', 1972)])
+    # La comparación por subcadenas casaba 'her' dentro de 'heretic' y 'alien' dentro de 'aliens'
+    assert matcher.match('Heretic (2024) [1080p] [YTS.MX]') is None
+    assert matcher.match('Aliens.1986.1080p.BluRay.x264') == 3
+    assert matcher.match('Solaris (2002) [720p]') is None
+    assert matcher.match('Solaris (1972) [720p]') == 4
+
+
+def test_index_is_incremental():
+    matcher = DownloadMatcher()
+    matcher.build([])
+    matcher.add(1, 'Blade Runner', '1982')
+    assert matcher.match('Blade.Runner.1982.1080p') == 1
+    matcher.discard(1)
+    assert matcher.match('Blade.Runner.1982.1080p') is None
+    assert matcher.stats()['indexed'] == 0 and matcher.stats()['tokens'] == 0
+
+
+def test_webhook_matches_by_hash_first(auth_client, matcher):
+    hash_ = 'c' * 40
+    with app.app_context():
+        first = make_download(auth_client.user_id, 'Quetzal Dreams', '2011', hash_)
+        shared = make_download(auth_client.user_id, 'Quetzal Dreams (copia)', '2011', hash_, status='pendiente')
+        db.session.add_all([first, shared])
+        db.session.commit()
+        ids = [first.id, shared.id]
+
+    # El nombre no se parece: el hash basta y marca todas las que comparten torrent
+    resp = auth_client.post('/api/webhook/complete', json={'torrent_name': 'qd.rip', 'torrent_hash': hash_.upper()},
+                            headers=INTERNAL_HEADERS)
+    assert resp.get_json()['movie_found'] is True
+    with app.app_context():
+        assert [db.session.get(Download, i).status for i in ids] == ['completado', 'completado']
+    assert not matcher.built
+
+
+def test_webhook_falls_back_to_title_index(auth_client, matcher):
+    with app.app_context():
+        old = make_download(auth_client.user_id, 'Zanzibar Nights', '1961')
+        new = make_download(auth_client.user_id, 'Zanzibar Nights', '2019')
+        db.session.add_all([old, new])
+        db.session.commit()
+        old_id, new_id = old.id, new.id
+
+    resp = auth_client.post('/api/webhook/complete',
+                            json={'torrent_name': 'Zanzibar.Nights.2019.1080p.WEBRip.x264-[YTS.MX]'},
+                            headers=INTERNAL_HEADERS)
+    assert resp.get_json()['movie_found'] is True
+    with app.app_context():
+        assert db.session.get(Download, new_id).status == 'completado'
+        assert db.session.get(Download, old_id).status == 'descargando'
+    # La completada sale del índice
+    assert new_id not in matcher._entries and old_id in matcher._entries
+
+
+def test_webhook_skips_rows_finished_elsewhere(auth_client, matcher):
+    with app.app_context():
+        download = make_download(auth_client.user_id, 'Xylophone Harbor', '2004')
+        db.session.add(download)
+        db.session.commit()
+        download_id = download.id
+    auth_client.post('/api/webhook/complete', json={'torrent_name': 'nada'}, headers=INTERNAL_HEADERS)
+    assert download_id in matcher._entries
+
+    # Un UPDATE masivo la completa sin pasar por el índice
+    with app.app_context():
+        db.session.execute(db.update(Download).where(Download.id == download_id).values(status='completado'))
+        db.session.commit()
+    resp = auth_client.post('/api/webhook/complete', json={'torrent_name': 'Xylophone Harbor (2004) [720p]'},
+                            headers=INTERNAL_HEADERS)
+    assert resp.get_json()['movie_found'] is False
+    assert download_id not in matcher._entries
+
+
+def test_benchmark_reports_accuracy():
+    report = run_benchmark(sizes=(500,), lookups=50, legacy_lookups=10)
+    result = report['results'][0]
+    assert result['index_accuracy'] >= 0.95
+    assert result['candidates_per_lookup'] < 10
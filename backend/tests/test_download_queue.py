@@ -0,0 +1,144 @@
+import pytest
+
+import app as app_module
+from app import app, db, Download, check_downloads_status, schedule_downloads
+from download_queue import FairShareScheduler, QueueItem
+from status_sync import StatusSync
+from tests.fakes import FakeClock, FakeTransmission, InProcessClient
+
+
+def items_for(user_id, count, start=0, running=False):
+    return [QueueItem(user_id * 100 + i, user_id, f"{user_id}-{i}", start + i, running) for i in range(count)]
+
+
+def test_round_robin_between_users():
+    scheduler = FairShareScheduler(global_cap=4, per_user_cap=3)
+    # El usuario 1 añade 40 películas antes que el 2 y el 3 añadan una
+    items = items_for(1, 40) + items_for(2, 1, start=50) + items_for(3, 1, start=60)
+    plan = scheduler.plan(items)
+
+    assert plan.active == [100, 200, 300, 101]
+    assert plan.start == ['1-0', '2-0', '3-0', '1-1']
+    assert plan.positions[102] == 1 and plan.positions[139] == 38
+
+
+def test_per_user_cap_and_preemption():
+    scheduler = FairShareScheduler(global_cap=3, per_user_cap=3)
+    running = items_for(1, 3, running=True)
+    assert scheduler.plan(running).start == [] and scheduler.plan(running).stop == []
+
+    # Llega otro usuario con la cola llena: cede un hueco
+    plan = scheduler.plan(running + items_for(2, 1, start=10))
+    assert plan.start == ['2-0']
+    assert plan.stop == ['1-2']
+    assert plan.positions[102] == 1
+
+
+def test_weights_give_more_turns():
+    scheduler = FairShareScheduler(global_cap=3, per_user_cap=3, weights={1: 2})
+    plan = scheduler.plan(items_for(1, 5) + items_for(2, 5, start=10))
+    assert plan.active == [100, 101, 200]
+
+
+def test_shared_torrent_not_stopped_while_someone_needs_it():
+    scheduler = FairShareScheduler(global_cap=1, per_user_cap=1)
+    shared = [QueueItem(1, 1, 'h', 0, True), QueueItem(2, 2, 'h', 1, True)]
+    plan = scheduler.plan(shared)
+    assert plan.stop == [] and plan.positions == {1: None, 2: None}
+
+
+def test_queue_position_follows_shared_torrent():
+    scheduler = FairShareScheduler(global_cap=2, per_user_cap=1)
+    # El usuario 2 ya tiene su hueco ocupado, pero 'h' lo arranca el usuario 1
+    items = [QueueItem(1, 1, 'h', 0, True), QueueItem(2, 2, 'x', 1, True), QueueItem(3, 2, 'h', 2, False),
+             QueueItem(4, 3, 'y', 3, False), QueueItem(5, 1, 'z', 4, False), QueueItem(6, 2, 'z', 5, False)]
+    plan = scheduler.plan(items)
+    assert plan.positions[3] is None
+    assert plan.start == [] and plan.stop == []
+    # Quien espera el mismo torrent comparte posición
+    assert (plan.positions[4], plan.positions[5], plan.positions[6]) == (1, 2, 2)
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    clock = FakeClock()
+    fake = FakeTransmission(clock=clock)
+    client = InProcessClient(fake)
+    monkeypatch.setattr(app_module, 'transmission', client)
+    monkeypatch.setattr(app_module, 'status_sync', StatusSync(client, clock=clock))
+    monkeypatch.setattr(app_module, 'download_scheduler', FairShareScheduler(global_cap=2, per_user_cap=1))
+    monkeypatch.setattr(app_module, 'refresh_plex_library', lambda *args, **kwargs: True)
+    return fake, clock
+
+
+def test_schedule_enforces_caps_in_transmission(auth_client, queue):
+    fake, clock = queue
+    with app.app_context():
+        other = app_module.UserModel(username='queue-other', password='x')
+        db.session.add(other)
+        db.session.commit()
+
+        downloads = []
+        for i, user_id in enumerate([auth_client.user_id] * 3 + [other.id]):
+            hash_ = f"{i + 1:040x}"
+            fake.add_torrent(hash_, status=0)
+            downloads.append(Download(movie_title=f'Movie {i}', movie_id='', magnet=f'magnet:?xt=urn:btih:{hash_}',
+                                      info_hash=hash_, status='pendiente', user_id=user_id))
+        db.session.add_all(downloads)
+        db.session.commit()
+        ids = [d.id for d in downloads]
+
+        plan = schedule_downloads()
+        assert plan.start == [f"{1:040x}", f"{4:040x}"]
+        running = sorted(t['hashString'] for t in fake.torrents.values() if t['status'] == 4)
+        assert running == [f"{1:040x}", f"{4:040x}"]
+
+        db.session.expire_all()
+        assert [db.session.get(Download, i).queue_position for i in ids] == [None, 1, 2, None]
+
+        # La primera termina: en el siguiente ciclo entra la siguiente del mismo usuario
+        clock.now += 5
+        fake.update_torrent(f"{1:040x}", status=6, percentDone=1.0)
+        assert check_downloads_status()
+        db.session.expire_all()
+        rows = [db.session.get(Download, i) for i in ids]
+        assert [r.status for r in rows] == ['completado', 'descargando', 'pendiente', 'descargando']
+        assert [r.queue_position for r in rows] == [None, None, 1, None]
+
+
+def test_add_is_paused_and_reports_position(auth_client, queue):
+    fake, _ = queue
+    for i in range(2):
+        resp = auth_client.post('/add', json={'title': f'Queued {i}', 'magnet': f'magnet:?xt=urn:btih:{i + 10:040x}'})
+        assert resp.status_code == 200
+    assert resp.get_json()['queue_position'] == 1
+    adds = [args for method, args in fake.calls if method == 'torrent-add']
+    assert all(args['paused'] for args in adds)
+
+
+def test_shared_running_torrent_is_not_queued(auth_client, queue):
+    fake, _ = queue
+    with app.app_context():
+        other = app_module.UserModel(username='queue-sharer', password='x')
+        db.session.add(other)
+        db.session.commit()
+
+        shared, own = f"{21:040x}", f"{22:040x}"
+        fake.add_torrent(shared, status=4, percentDone=0.3)
+        fake.add_torrent(own, status=4, percentDone=0.3)
+        downloads = [
+            Download(movie_title='Shared A', movie_id='', magnet=f'magnet:?xt=urn:btih:{shared}',
+                     info_hash=shared, status='descargando', user_id=auth_client.user_id),
+            Download(movie_title='Own B', movie_id='', magnet=f'magnet:?xt=urn:btih:{own}',
+                     info_hash=own, status='descargando', user_id=other.id),
+            # El usuario B ya agotó su hueco, pero este torrent lo mueve A
+            Download(movie_title='Shared B', movie_id='', magnet=f'magnet:?xt=urn:btih:{shared}',
+                     info_hash=shared, status='descargando', user_id=other.id),
+        ]
+        db.session.add_all(downloads)
+        db.session.commit()
+
+        plan = schedule_downloads()
+        assert plan.stop == []
+        db.session.expire_all()
+        assert [db.session.get(Download, d.id).queue_position for d in downloads] == [None, None, None]
@@ -0,0 +1,69 @@
+import pytest
+
+import app as app_module
+from app import app, db, Download, check_downloads_status, extract_info_hash, migrate_download_table
+from http_client import UpstreamClient
+from status_sync import StatusSync
+from tests.fakes import fake_transmission_server
+from transmission_client import TransmissionClient
+
+HASH_A = 'a' * 40
+HASH_B = 'b' * 40
+
+
+@pytest.fixture
+def fake_transmission(monkeypatch):
+    with fake_transmission_server() as server:
+        client = TransmissionClient(f"{server.base_url}/transmission/rpc", http=UpstreamClient('transmission-test'))
+        monkeypatch.setattr(app_module, 'transmission', client)
+        monkeypatch.setattr(app_module, 'status_sync', StatusSync(client))
+        monkeypatch.setattr(app_module, 'refresh_plex_library', lambda *args, **kwargs: True)
+        yield server.fake
+
+
+def make_download(user_id, title, hash_, status='descargando'):
+    return Download(movie_title=title, movie_id='', magnet=f'magnet:?xt=urn:btih:{hash_.upper()}&dn=x',
+                    info_hash=hash_, status=status, user_id=user_id)
+
+
+def test_extract_info_hash_normalizes():
+    assert extract_info_hash(f'magnet:?xt=urn:btih:{HASH_A.upper()}&dn=x') == HASH_A
+    # btih en base32
+    assert extract_info_hash('magnet:?xt=urn:btih:' + 'A' * 32) == '00' * 20
+    assert extract_info_hash('http://example.com/file.torrent') is None
+
+
+def test_status_sync_matches_by_hash_not_title(auth_client, fake_transmission):
+    # Títulos que se confundían con la comparación por subcadenas
+    fake_transmission.add_torrent(HASH_A, name='Alien (1979) [1080p]', status=6, percentDone=1.0)
+    fake_transmission.add_torrent(HASH_B, name='Aliens (1986) [1080p]', status=4, percentDone=0.4)
+
+    with app.app_context():
+        alien = make_download(auth_client.user_id, 'Alien', HASH_A)
+        aliens = make_download(auth_client.user_id, 'Aliens', HASH_B, status='pendiente')
+        db.session.add_all([alien, aliens])
+        db.session.commit()
+
+        assert check_downloads_status()
+        assert db.session.get(Download, alien.id).status == 'completado'
+        assert db.session.get(Download, aliens.id).status == 'descargando'
+
+
+def test_migration_adds_column_and_backfills(auth_client):
+    with app.app_context():
+        download = make_download(auth_client.user_id, 'Legacy', HASH_A)
+        db.session.add(download)
+        db.session.commit()
+        download_id = download.id
+
+        # Simular una base anterior a la columna info_hash
+        with db.engine.begin() as conn:
+            conn.execute(db.text('DROP INDEX IF EXISTS ix_download_info_hash'))
+            conn.execute(db.text('ALTER TABLE download DROP COLUMN info_hash'))
+
+        migrate_download_table()
+        db.session.expire_all()
+
+        assert db.session.get(Download, download_id).info_hash == HASH_A
+        indexes = {ix['name'] for ix in db.inspect(db.engine).get_indexes('download')}
+        assert 'ix_download_info_hash' in indexes
@@ -0,0 +1,61 @@
+import os
+
+from file_organizer import FileOrganizer, inspect_content
+
+
+def test_organizes_into_own_folder_and_returns_path(tmp_path):
+    source = tmp_path / 'complete' / 'Heat (1995) [1080p] [YTS.MX]'
+    source.mkdir(parents=True)
+    (source / 'Heat (1995) [1080p] [YTS.MX].mp4').write_bytes(b'x' * 100)
+    (source / 'sample.mp4').write_bytes(b'x')
+    (source / 'English.srt').write_text('1')
+
+    organizer = FileOrganizer(download_dir=str(tmp_path / 'complete'), organized_dir=str(tmp_path / 'movies'))
+    destination = organizer.organize_completed_download(source.name, str(tmp_path / 'complete'))
+
+    movie_dir = tmp_path / 'movies' / 'Heat (1995) [1080p]'
+    assert destination == str(movie_dir / 'Heat (1995) [1080p].mp4')
+    assert os.path.getsize(destination) == 100
+    assert (movie_dir / 'Heat (1995) [1080p].srt').exists()
+    assert not source.exists()
+
+
+def test_missing_source_returns_false(tmp_path):
+    organizer = FileOrganizer(organized_dir=str(tmp_path / 'movies'))
+    assert organizer.organize_completed_download('nope', str(tmp_path)) is False
+
+
+def test_manifest_single_pass(tmp_path):
+    source = tmp_path / 'Alien.1979.1080p.BluRay.x264-[YTS.MX]'
+    (source / 'Sample').mkdir(parents=True)
+    (source / 'Subs').mkdir()
+    (source / 'Alien.1979.1080p.BluRay.x264-[YTS.MX].mkv').write_bytes(b'x' * 50)
+    (source / 'Sample' / 'alien.mkv').write_bytes(b'x' * 80)  # Extra aunque sea más grande
+    (source / 'Alien.Trailer.mp4').write_bytes(b'x' * 10)
+    (source / 'Subs' / 'English.srt').write_text('1')
+    (source / 'YTS.txt').write_text('www')
+
+    organizer = FileOrganizer(organized_dir=str(tmp_path / 'movies'))
+    manifest = inspect_content(str(source))
+    assert manifest.main_video == str(source / 'Alien.1979.1080p.BluRay.x264-[YTS.MX].mkv')
+    assert (manifest.extension, manifest.main_size) == ('.mkv', 50)
+    assert manifest.extras == [str(source / 'Alien.Trailer.mp4'), str(source / 'Sample' / 'alien.mkv')]
+    assert manifest.subtitles == [str(source / 'Subs' / 'English.srt')]
+    assert manifest.other_files == [str(source / 'YTS.txt')]
+    assert (manifest.file_count, manifest.total_size) == (5, 50 + 80 + 10 + 1 + 3)
+    # Una stat de la raíz y una por archivo; un scandir por carpeta
+    assert manifest.syscalls == {'stat': 6, 'scandir': 3}
+
+    destination = organizer.organize_completed_download(source.name, str(tmp_path))
+    assert os.path.getsize(destination) == 50
+    assert organizer.last_manifest.syscalls == {'stat': 6, 'scandir': 3}
+    assert os.path.exists(os.path.splitext(destination)[0] + '.srt')
+    assert not source.exists()
+
+
+def test_single_file_manifest(tmp_path):
+    movie = tmp_path / 'Heat.1995.720p.mkv'
+    movie.write_bytes(b'x' * 7)
+    manifest = inspect_content(str(movie))
+    assert (manifest.is_dir, manifest.main_video, manifest.extension) == (False, str(movie), '.mkv')
+    assert manifest.syscalls == {'stat': 1, 'scandir': 0}
@@ -0,0 +1,107 @@
+import time
+import threading
+
+import pytest
+
+import app as app_module
+from health import HealthMonitor
+from http_client import UpstreamClient
+from plex_client import PlexClient
+from tests.fakes import FakeClock, FakePlex, fake_plex_server
+
+
+class Probe:
+    def __init__(self, version='4.0.5'):
+        self.version = version
+        self.error = None
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.error:
+            raise RuntimeError(self.error)
+        return {'version': self.version}
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_probes_once_per_ttl(clock):
+    probe = Probe()
+    monitor = HealthMonitor({'transmission': probe}, ttl=30, clock=clock, background=False)
+    for _ in range(10):
+        snapshot = monitor.snapshot()
+    assert probe.calls == 1
+    assert snapshot['ok'] and snapshot['services']['transmission']['version'] == '4.0.5'
+
+    clock.now += 30
+    monitor.snapshot()
+    assert probe.calls == 2
+
+
+def test_failure_keeps_last_version_and_goes_stale(clock):
+    probe = Probe()
+    monitor = HealthMonitor({'transmission': probe}, ttl=30, max_age=100, clock=clock, background=False)
+    monitor.snapshot()
+    probe.error = 'Connection refused'
+    clock.now += 30
+    service = monitor.snapshot()['services']['transmission']
+    assert (service['status'], service['version'], service['last_error']) == ('down', '4.0.5', 'Connection refused')
+
+    # Sondas que ya no terminan: pasado max_age el estado deja de darse por bueno
+    probe.error = None
+    monitor._in_flight.add('transmission')
+    clock.now += 100
+    snapshot = monitor.snapshot()
+    assert snapshot['services']['transmission']['stale'] and not snapshot['ok']
+
+
+def test_snapshot_never_waits_for_probe():
+    release = threading.Event()
+    monitor = HealthMonitor({'plex': lambda: release.wait(5) and {'version': '1.40'}}, ttl=30)
+    # La sonda está colgada: la respuesta sale igualmente con lo que hay
+    assert monitor.snapshot()['services']['plex']['status'] == 'unknown'
+    assert monitor.snapshot()['services']['plex']['status'] == 'unknown'
+    assert monitor.stats()['in_flight'] == ['plex']
+    release.set()
+
+
+def test_keeper_refreshes_without_requests():
+    probe = Probe()
+    monitor = HealthMonitor({'transmission': probe}, ttl=0.05).start()
+    deadline = time.monotonic() + 2
+    while probe.calls < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Nadie pidió la instantánea y ya está al día
+    assert probe.calls >= 2
+    assert monitor._state['transmission']['status'] == 'up'
+
+
+def test_plex_identity():
+    with fake_plex_server(FakePlex()) as server:
+        plex = PlexClient(server.base_url, http=UpstreamClient('plex-identity-test'))
+        assert plex.identity() == {'version': '1.40.0', 'machine_identifier': 'fake-plex'}
+
+
+def test_health_endpoint_is_conditional(auth_client, clock, monkeypatch):
+    transmission, plex = Probe('4.0.5'), Probe('1.40.0')
+    monitor = HealthMonitor({'transmission': transmission, 'plex': plex}, ttl=30, clock=clock, background=False)
+    monkeypatch.setattr(app_module, 'health_monitor', monitor)
+
+    resp = auth_client.get('/api/health')
+    assert resp.status_code == 200
+    assert resp.get_json()['services']['plex']['version'] == '1.40.0'
+    etag = resp.headers['ETag']
+    assert etag.startswith('W/') and 'no-cache' in resp.headers['Cache-Control']
+
+    clock.now += 30
+    assert auth_client.get('/api/health', headers={'If-None-Match': etag}).status_code == 304
+
+    plex.error = 'timed out'
+    clock.now += 30
+    resp = auth_client.get('/api/health', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.get_json()['services']['plex']['status'] == 'down'
+    assert transmission.calls == plex.calls == 3
@@ -0,0 +1,75 @@
+import pytest
+import requests
+import responses
+
+from http_client import CircuitBreaker, CircuitOpenError, UpstreamClient
+
+URL = 'http://upstream.test/ping'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_and_half_opens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Un fallo en semiabierto vuelve a abrir el circuito
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock.now = 20
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@responses.activate
+def test_retries_idempotent_requests_on_5xx():
+    responses.add(responses.GET, URL, status=503)
+    responses.add(responses.GET, URL, json={'ok': True})
+    client = UpstreamClient('test', retries=1, backoff=0)
+
+    assert client.get(URL).json() == {'ok': True}
+    stats = client.stats()
+    assert stats['requests'] == 2
+    assert stats['retries'] == 1
+    assert stats['errors'] == 1
+
+
+@responses.activate
+def test_post_is_not_retried_by_default():
+    responses.add(responses.POST, URL, body=requests.exceptions.ConnectionError('down'))
+    client = UpstreamClient('test', retries=3, backoff=0)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.post(URL)
+    assert client.stats()['requests'] == 1
+
+
+@responses.activate
+def test_open_circuit_fails_fast():
+    responses.add(responses.GET, URL, body=requests.exceptions.ConnectTimeout('timeout'))
+    client = UpstreamClient('test', retries=0, failure_threshold=2)
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            client.get(URL)
+    with pytest.raises(CircuitOpenError):
+        client.get(URL)
+
+    assert len(responses.calls) == 2
+    assert client.stats()['short_circuited'] == 1
+    assert client.stats()['state'] == 'open'
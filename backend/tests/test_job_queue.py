@@ -0,0 +1,151 @@
+import pytest
+
+import app as app_module
+import transmission_webhook
+from job_queue import JobQueue, PermanentJobError, WorkerPool
+from tests.fakes import FakeClock
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(1000)
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(str(tmp_path / 'jobs.db'), lease_seconds=60, backoff=10, clock=clock)
+
+
+def test_lease_complete(queue):
+    job_id = queue.enqueue('completion', {'torrent_name': 'Heat'})
+    job = queue.lease('w1')
+    assert (job.id, job.payload, job.attempts) == (job_id, {'torrent_name': 'Heat'}, 1)
+    assert queue.lease('w2') is None
+
+    assert queue.complete(job_id, 'w1')
+    assert queue.counts() == {'queued': 0, 'running': 0, 'done': 1, 'dead': 0}
+
+
+def test_connections_are_closed(queue):
+    import sqlite3
+
+    opened = []
+    open_connection = queue._open
+    queue._open = lambda: opened.append(open_connection()) or opened[-1]
+
+    job_id = queue.enqueue('completion', {})
+    job = queue.lease('w1')
+    queue.heartbeat(job.id, 'w1')
+    queue.fail(job.id, 'w1', 'boom', permanent=True)
+    queue.retry(job_id)
+    queue.get(job_id), queue.list(), queue.counts(), queue.purge()
+
+    assert len(opened) == 10
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+
+def test_dedupe_while_pending(queue):
+    first = queue.enqueue('completion', {}, dedupe_key='completion:abc')
+    assert queue.enqueue('completion', {}, dedupe_key='completion:abc') == first
+    queue.lease('w1')
+    queue.complete(first, 'w1')
+    assert queue.enqueue('completion', {}, dedupe_key='completion:abc') != first
+
+
+def test_expired_lease_is_reclaimed(queue, clock):
+    job_id = queue.enqueue('completion', {})
+    queue.lease('w1')
+    clock.now += 30
+    assert queue.heartbeat(job_id, 'w1')
+    clock.now += 45
+    assert queue.lease('w2') is None  # El latido alargó el lease
+
+    clock.now += 60
+    job = queue.lease('w2')
+    assert (job.id, job.attempts) == (job_id, 2)
+    # El worker original ya no puede cerrarlo
+    assert not queue.complete(job_id, 'w1')
+    assert queue.complete(job_id, 'w2')
+
+
+def test_retry_with_backoff_then_dead(queue, clock):
+    job_id = queue.enqueue('completion', {}, max_attempts=3)
+    for delay in (10, 20):
+        queue.lease('w1')
+        queue.fail(job_id, 'w1', RuntimeError('Plex caído'))
+        assert queue.lease('w1') is None
+        clock.now += delay
+    queue.lease('w1')
+    queue.fail(job_id, 'w1', RuntimeError('Plex caído'))
+
+    job = queue.get(job_id)
+    assert (job.status, job.attempts, job.last_error) == ('dead', 3, 'Plex caído')
+    assert queue.retry(job_id)
+    assert queue.lease('w1').attempts == 1
+
+
+def test_worker_checkpoints_and_permanent_errors(queue, clock):
+    calls = []
+
+    def handler(job):
+        calls.append(dict(job.payload))
+        if 'step' not in job.payload:
+            job.checkpoint(step=1)
+            raise RuntimeError('falla tras el primer paso')
+        if job.payload.get('broken'):
+            raise PermanentJobError('sin archivo')
+
+    pool = WorkerPool(queue, {'completion': handler})
+    job_id = queue.enqueue('completion', {})
+    broken_id = queue.enqueue('completion', {'step': 0, 'broken': True})
+    assert pool.run_once() and pool.run_once()
+    clock.now += 10
+    assert pool.run_once()
+    assert not pool.run_once()
+
+    assert calls == [{}, {'step': 0, 'broken': True}, {'step': 1}]
+    assert queue.get(job_id).status == 'done'
+    assert queue.get(broken_id).status == 'dead'
+    assert pool.stats() == {'processed': 3, 'succeeded': 1, 'failed': 2, 'workers': 2}
+
+
+def test_hook_only_enqueues(monkeypatch, queue):
+    monkeypatch.setattr(transmission_webhook, 'JobQueue', lambda: queue)
+    monkeypatch.setattr(transmission_webhook, 'process_completion', lambda *a, **k: pytest.fail('no debe procesar'))
+    monkeypatch.setattr('sys.argv', ['transmission_webhook.py'])
+    for name, value in {'TR_TORRENT_NAME': 'Heat (1995)', 'TR_TORRENT_DIR': '/downloads/complete',
+                        'TR_TORRENT_HASH': 'ABC'}.items():
+        monkeypatch.setenv(name, value)
+
+    transmission_webhook.main()
+    transmission_webhook.main()
+    jobs = queue.list()
+    assert [(j.kind, j.dedupe_key, j.payload['torrent_hash']) for j in jobs] == [('completion', 'completion:abc', 'ABC')]
+
+
+def test_process_completion_resumes_from_checkpoint(monkeypatch):
+    monkeypatch.setattr(transmission_webhook, 'organize_files', lambda *a: pytest.fail('ya organizado'))
+    notified = []
+    monkeypatch.setattr(transmission_webhook, 'update_movie_status_in_db',
+                        lambda name, path, torrent_hash=None: notified.append(path) or {'movie_found': True, 'plex_refresh_queued': True})
+    payload = {'torrent_name': 'Heat', 'organized_path': '/downloads/movies/Heat/Heat.mkv'}
+    transmission_webhook.process_completion(payload, checkpoint=payload.update)
+    assert notified == ['/downloads/movies/Heat/Heat.mkv']
+    assert payload['notified'] is True
+
+
+def test_jobs_api(auth_client, monkeypatch, queue):
+    monkeypatch.setattr(app_module, 'job_queue', queue)
+    job_id = queue.enqueue('completion', {'torrent_name': 'Heat'}, max_attempts=1)
+    queue.lease('w1')
+    queue.fail(job_id, 'w1', RuntimeError('boom'))
+
+    data = auth_client.get('/api/jobs?status=dead').get_json()
+    assert data['counts']['dead'] == 1
+    assert [j['id'] for j in data['jobs']] == [job_id]
+    assert auth_client.get(f'/api/jobs/{job_id}').get_json()['last_error'] == 'boom'
+    assert auth_client.post(f'/api/jobs/{job_id}/retry').status_code == 200
+    assert auth_client.post(f'/api/jobs/{job_id}/retry').status_code == 409
+    assert auth_client.get('/api/jobs?status=nope').status_code == 400
@@ -0,0 +1,62 @@
+import pytest
+
+from http_client import UpstreamClient
+from plex_client import PlexClient, PlexError, parse_path_map
+from tests.fakes import FakePlex, fake_plex_server
+
+
+@pytest.fixture
+def server():
+    with fake_plex_server(FakePlex(token='secret')) as server:
+        yield server
+
+
+@pytest.fixture
+def plex(server):
+    return PlexClient(server.base_url, token='secret', http=UpstreamClient('plex-test'),
+                      path_map='/downloads/movies=/movies')
+
+
+def section_lookups(server):
+    return [r for r in server.fake.requests if r[1] == '/library/sections']
+
+
+def test_section_cached_between_refreshes(server, plex):
+    plex.refresh(['/downloads/movies/Heat (1995) [1080p]/Heat (1995) [1080p].mkv'])
+    plex.refresh(['/downloads/movies/Alien (1979) [1080p]/Alien (1979) [1080p].mp4'])
+
+    assert len(section_lookups(server)) == 1
+    assert server.fake.refreshes == [('1', '/movies/Heat (1995) [1080p]'), ('1', '/movies/Alien (1979) [1080p]')]
+    assert plex.stats()['partial_scans'] == 2
+
+
+def test_same_folder_scanned_once(server, plex):
+    assert plex.refresh(['/downloads/movies/Heat/Heat.mkv', '/downloads/movies/Heat/Heat.srt']) == 1
+    assert server.fake.refreshes == [('1', '/movies/Heat')]
+
+
+def test_full_scan_without_paths_or_outside_section(server, plex):
+    plex.refresh()
+    plex.refresh(['/downloads/complete/Heat.mkv'])
+    plex.refresh(['/downloads/movies/Heat.mkv'])  # En la raíz: no hay carpeta más pequeña
+
+    assert server.fake.refreshes == [('1', None)] * 3
+    # La ruta desconocida fuerza a releer las secciones una vez
+    assert len(section_lookups(server)) == 2
+
+
+def test_error_invalidates_cached_section(server, plex):
+    plex.refresh()
+    server.fake.token = 'rotated'
+    with pytest.raises(PlexError):
+        plex.refresh()
+    assert plex.stats()['section_cached'] is False
+
+    server.fake.token = 'secret'
+    plex.refresh()
+    assert len(section_lookups(server)) == 2
+
+
+def test_parse_path_map_prefers_longest_prefix():
+    assert parse_path_map('/downloads=/data, /downloads/movies/=/movies') == [
+        ('/downloads/movies', '/movies'), ('/downloads', '/data')]
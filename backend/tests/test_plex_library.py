@@ -0,0 +1,99 @@
+import pytest
+
+import app as app_module
+from http_client import UpstreamClient
+from plex_client import PlexClient, parse_movie
+from plex_library import PlexLibrary
+from tests.fakes import FakeClock, FakePlex, fake_plex_server
+import xml.etree.ElementTree as ET
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(now=1_700_000_000)
+
+
+@pytest.fixture
+def server(clock):
+    fake = FakePlex(clock=clock)
+    fake.add_movie('Heat', 1995, imdb_code='tt0113277')
+    fake.add_movie('Alien', 1979, imdb_code='tt0078748', view_count=2)
+    with fake_plex_server(fake) as server:
+        yield server
+
+
+@pytest.fixture
+def library(tmp_path, server, clock):
+    plex = PlexClient(server.base_url, http=UpstreamClient('plex-library-test'))
+    return PlexLibrary(str(tmp_path / 'plex_library.db'), plex=plex, reload_interval=0, clock=clock)
+
+
+def library_queries(server):
+    return [query for _, path, query in server.fake.requests if path.endswith('/all')]
+
+
+def test_incremental_sync_fetches_only_changes(library, server, clock):
+    assert library.sync() == 2
+    assert library.get('tt0113277')['title'] == 'Heat'
+    assert library.get('tt0078748')['view_count'] == 2
+
+    clock.now += 600
+    server.fake.add_movie('Aliens', 1986, imdb_code='tt0090605')
+    assert library.sync() == 1
+    assert library.get('tt0090605')['year'] == 1986
+    assert len(library) == 3
+
+    # Sin cambios: la consulta trae cero películas
+    clock.now += 600
+    assert library.sync() == 0
+    queries = library_queries(server)
+    assert 'updatedAt>>' not in queries[0] and 'updatedAt>>' in queries[1]
+
+
+def test_full_sync_drops_deleted_movies(library, server, clock):
+    library.sync()
+    server.fake.movies = [m for m in server.fake.movies if m['title'] != 'Heat']
+    clock.now += 60
+    library.sync()
+    # Una pasada incremental no ve lo borrado; la completa sí
+    assert library.get('tt0113277') is not None
+    library.sync(full=True)
+    assert library.get('tt0113277') is None
+    assert library.status()['movies'] == 1
+
+
+def test_parse_movie_legacy_agent_guid():
+    video = ET.fromstring('<Video ratingKey="7" title="Heat" year="1995" updatedAt="5" '
+                          'guid="com.plexapp.agents.imdb://tt0113277?lang=en"><Media><Part file="/m/h.mkv"/></Media></Video>')
+    movie = parse_movie(video)
+    assert (movie['imdb_code'], movie['file'], movie['view_count']) == ('tt0113277', '/m/h.mkv', 0)
+
+
+def test_add_blocked_when_in_plex(auth_client, library, monkeypatch):
+    library.sync()
+    monkeypatch.setattr(app_module, 'plex_library', library)
+
+    resp = auth_client.post('/add', json={'title': 'Heat', 'magnet': 'magnet:?xt=urn:btih:ABC', 'imdb_code': 'tt0113277'})
+    assert resp.status_code == 409
+    assert resp.get_json()['in_plex'] is True
+
+    resp = auth_client.post('/api/downloads/bulk', json={'action': 'add', 'items': [
+        {'title': 'Alien', 'magnet': 'magnet:?xt=urn:btih:DEF', 'imdb_code': 'tt0078748'},
+    ]})
+    assert resp.get_json()['results'][0]['status'] == 'in_plex'
+
+
+def test_search_marks_movies_in_plex(auth_client, library, monkeypatch):
+    library.sync()
+    monkeypatch.setattr(app_module, 'plex_library', library)
+    monkeypatch.setitem(app_module.app.jinja_env.globals, 'in_plex', library.get)
+    monkeypatch.setattr(app_module, 'search_movies', lambda *a, **k: {'movie_count': 2, 'movies': [
+        {'id': 1, 'imdb_code': 'tt0113277', 'title': 'Heat', 'title_long': 'Heat (1995)', 'year': 1995,
+         'rating': 8.3, 'torrents': [{'hash': 'A' * 40, 'quality': '1080p', 'seeds': 10}]},
+        {'id': 2, 'imdb_code': 'tt0093773', 'title': 'Predator', 'title_long': 'Predator (1987)', 'year': 1987,
+         'rating': 7.8, 'torrents': [{'hash': 'B' * 40, 'quality': '1080p', 'seeds': 10}]},
+    ]})
+
+    html = auth_client.get('/search?query=heat').get_data(as_text=True)
+    assert html.count('✅ En Plex</button>') == 1
+    assert '📥 Descargar' in html
@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+import app as app_module
+from events import INTERNAL_TOKEN_HEADER, internal_token
+from plex_refresh import RefreshDispatcher, merge_paths
+from tests.fakes import FakeClock
+
+
+class Recorder:
+    def __init__(self, fail=0):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, paths):
+        self.calls.append(paths)
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError('Plex caído')
+        return len(paths) if paths else 1
+
+
+def test_merge_paths_keeps_minimal_set():
+    assert merge_paths(['/movies/Heat/Heat.mkv', '/movies/Heat', '/movies/Alien/', '/movies/Alien']) == [
+        '/movies/Alien', '/movies/Heat']
+
+
+def test_quiet_window_restarts_until_max_delay():
+    clock = FakeClock(0)
+    dispatcher = RefreshDispatcher(Recorder(), quiet_window=10, max_delay=25, clock=clock, background=False)
+    assert dispatcher.due_in() is None
+
+    dispatcher.request(['/movies/A/A.mkv'])
+    clock.now = 8
+    dispatcher.request(['/movies/B/B.mkv'])
+    assert dispatcher.due_in() == 10
+    clock.now = 16
+    dispatcher.request(['/movies/C/C.mkv'])
+    # La ráfaga no puede retrasarlo más allá de 25 s desde la primera petición
+    assert dispatcher.due_in() == 9
+
+
+def test_burst_becomes_one_batch():
+    refresh = Recorder()
+    dispatcher = RefreshDispatcher(refresh, background=False)
+    for name in ['Heat', 'Alien', 'Heat']:
+        dispatcher.request([f'/movies/{name}/{name}.mkv'])
+    assert dispatcher.flush() is True
+
+    assert refresh.calls == [['/movies/Alien/Alien.mkv', '/movies/Heat/Heat.mkv']]
+    stats = dispatcher.stats()
+    assert (stats['requested'], stats['issued'], stats['batches']) == (3, 2, 1)
+
+
+def test_full_request_keeps_paths_separate():
+    refresh = Recorder(fail=1)
+    dispatcher = RefreshDispatcher(refresh, backoff=0, background=False)
+    dispatcher.request(['/movies/Heat/Heat.mkv'])
+    dispatcher.request()
+    # Falla el completo: vuelve a la cola sin llevarse por delante las carpetas
+    assert dispatcher.flush() is False
+    assert dispatcher.flush() is True
+    assert refresh.calls == [None, None, ['/movies/Heat/Heat.mkv']]
+
+
+def test_failure_keeps_batch_and_backs_off():
+    clock = FakeClock(0)
+    refresh = Recorder(fail=2)
+    dispatcher = RefreshDispatcher(refresh, quiet_window=5, backoff=10, clock=clock, background=False)
+    dispatcher.request(['/movies/Heat/Heat.mkv'])
+
+    assert dispatcher.flush() is False
+    assert dispatcher.due_in() == 10
+    dispatcher.request(['/movies/Alien/Alien.mkv'])
+    assert dispatcher.flush() is False
+    assert dispatcher.due_in() == 20  # Backoff exponencial
+    assert dispatcher.flush() is True
+
+    assert refresh.calls[-1] == ['/movies/Alien/Alien.mkv', '/movies/Heat/Heat.mkv']
+    stats = dispatcher.stats()
+    assert (stats['failures'], stats['retries'], stats['retry_in']) == (2, 1, None)
+
+
+def test_background_worker_runs_one_scan_per_burst():
+    done = threading.Event()
+    refresh = Recorder()
+
+    def scan(paths):
+        result = refresh(paths)
+        done.set()
+        return result
+
+    dispatcher = RefreshDispatcher(scan, quiet_window=0.05)
+    for name in ['A', 'B', 'C']:
+        dispatcher.request([f'/movies/{name}/{name}.mkv'])
+    assert done.wait(2)
+    assert len(refresh.calls) == 1 and len(refresh.calls[0]) == 3
+
+
+@pytest.fixture
+def refresher(monkeypatch):
+    refresh = Recorder()
+    monkeypatch.setattr(app_module, 'plex_refresher', RefreshDispatcher(refresh, background=False))
+    return refresh
+
+
+def test_webhook_queues_partial_scan(refresher):
+    with app_module.app.test_client() as client:
+        resp = client.post('/api/webhook/complete', json={
+            'torrent_name': 'Unknown.Movie.2020', 'organized_path': '/downloads/movies/Unknown (2020)/Unknown (2020).mkv'},
+            headers={INTERNAL_TOKEN_HEADER: internal_token()})
+    assert resp.get_json()['plex_refresh_queued'] is True
+    # Sin el secreto compartido no se acepta nada
+    resp = app_module.app.test_client().post('/api/webhook/complete', json={
+        'torrent_name': 'x', 'organized_path': '/etc'})
+    assert resp.status_code == 403
+    assert app_module.plex_refresher.stats()['pending_paths'] == 1
+    assert refresher.calls == []
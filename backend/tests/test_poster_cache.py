@@ -0,0 +1,141 @@
+import io
+
+import pytest
+
+from poster_cache import PosterCache, PosterNotFound
+
+PIL = pytest.importorskip('PIL.Image')
+
+
+def make_jpeg(width=600, height=900, color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    PIL.new('RGB', (width, height), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class CountingFetch:
+    def __init__(self, data):
+        self.data = data
+        self.urls = []
+
+    def __call__(self, url):
+        self.urls.append(url)
+        return self.data
+
+
+def test_fetches_once_and_resizes(tmp_path):
+    fetch = CountingFetch(make_jpeg())
+    cache = PosterCache(str(tmp_path), fetch=fetch)
+
+    path, etag, content_type = cache.get('tt1', 'small', source_url='http://img/1.jpg')
+    assert content_type == 'image/jpeg'
+    assert PIL.open(path).width == 120
+
+    # Otro tamaño del mismo póster no vuelve a descargar
+    cache.get('tt1', 'large')
+    assert fetch.urls == ['http://img/1.jpg']
+    assert cache.get('tt1', 'small')[1] == etag
+
+
+def test_unknown_poster_without_source(tmp_path):
+    with pytest.raises(PosterNotFound):
+        PosterCache(str(tmp_path), fetch=CountingFetch(b'')).get('tt404')
+
+
+def test_rejects_non_images(tmp_path):
+    cache = PosterCache(str(tmp_path), fetch=CountingFetch(b'<html>not found</html>'))
+    with pytest.raises(PosterNotFound):
+        cache.get('tt1', source_url='http://img/1.jpg')
+
+
+def test_evicts_least_recently_used(tmp_path):
+    clock_value = [0]
+    images = {f'http://img/{i}.jpg': make_jpeg(color=(i, i, i)) for i in range(4)}
+    cache = PosterCache(str(tmp_path), fetch=lambda url: images[url], clock=lambda: clock_value[0])
+    for i in range(3):
+        clock_value[0] = i * 10000
+        cache.get(f'tt{i}', 'small', source_url=f'http://img/{i}.jpg')
+
+    before = cache.stats()['bytes']
+    cache.max_bytes = before // 2
+    clock_value[0] += 10000
+    # Un acierto no expulsa nada; el siguiente fallo sí
+    cache.get('tt2', 'small')
+    assert cache.stats()['bytes'] == before
+    clock_value[0] += 10000
+    cache.get('tt3', 'small', source_url='http://img/3.jpg')
+
+    assert cache.stats()['bytes'] <= cache.max_bytes
+    # El más reciente sigue en caché sin volver a descargarse
+    assert cache.get('tt3', 'small')[0]
+
+
+def test_poster_route_serves_with_etag(auth_client, tmp_path, monkeypatch):
+    import app as app_module
+
+    fetch = CountingFetch(make_jpeg())
+    monkeypatch.setattr(app_module, 'poster_cache', PosterCache(str(tmp_path), fetch=fetch))
+    monkeypatch.setattr(app_module, 'find_poster_source', lambda imdb_code: 'http://img/tt1.jpg')
+
+    resp = auth_client.get('/img/poster/tt1?size=small')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'image/jpeg'
+    assert 'immutable' in resp.headers['Cache-Control']
+
+    cached = auth_client.get('/img/poster/tt1?size=small', headers={'If-None-Match': resp.headers['ETag']})
+    assert cached.status_code == 304
+    assert auth_client.get('/img/poster/tt1?size=huge').status_code == 400
+
+
+def test_slow_download_does_not_block_cached_posters(tmp_path):
+    import threading
+
+    started, release = threading.Event(), threading.Event()
+    data = make_jpeg()
+
+    def fetch(url):
+        if url.endswith('slow.jpg'):
+            started.set()
+            release.wait(5)
+        return data
+
+    cache = PosterCache(str(tmp_path), fetch=fetch)
+    cache.get('tt1', 'small', source_url='http://img/1.jpg')
+    slow = threading.Thread(target=cache.get, args=('tt2', 'small', 'http://img/slow.jpg'))
+    slow.start()
+    started.wait(5)
+    # tt2 sigue descargándose: tt1 sale de la caché sin esperar
+    assert cache.get('tt1', 'small')[2] == 'image/jpeg'
+    release.set()
+    slow.join(5)
+    assert cache.get('tt2', 'small')[2] == 'image/jpeg'
+
+
+def test_poster_route_rejects_anonymous_and_bad_codes(auth_client, monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, 'find_poster_source', lambda imdb_code: pytest.fail('no debería buscarse'))
+    assert auth_client.get('/img/poster/..%2Fetc').status_code == 404
+    assert auth_client.get('/img/poster/tt1abc').status_code == 404
+
+
+def test_poster_route_serves_anonymous_visitors(tmp_path, monkeypatch):
+    import app as app_module
+
+    # Las listas públicas y compartidas se ven sin sesión
+    monkeypatch.setattr(app_module, 'poster_cache', PosterCache(str(tmp_path), fetch=CountingFetch(make_jpeg())))
+    monkeypatch.setattr(app_module, 'find_poster_source', lambda imdb_code: 'https://yts.mx/tt1.jpg')
+    client = app_module.app.test_client()
+    assert client.get('/img/poster/tt1').status_code == 200
+    assert client.get('/img/poster/tt1abc').status_code == 404
+
+
+def test_fetch_poster_only_from_yts_hosts():
+    import app as app_module
+
+    assert app_module.is_poster_url('https://yts.mx/assets/images/movies/heat/large-cover.jpg')
+    assert app_module.is_poster_url('https://img.yts.mx/assets/1.jpg')
+    for url in ('http://127.0.0.1:9091/transmission/rpc', 'http://yts.mx.evil.com/1.jpg', 'file:///etc/passwd', ''):
+        assert not app_module.is_poster_url(url)
+        with pytest.raises(PosterNotFound):
+            app_module.fetch_poster(url)
@@ -0,0 +1,70 @@
+import os
+import sys
+import subprocess
+import time
+
+import pytest
+
+import transmission_hook
+from job_queue import JobQueue
+from postprocess_daemon import PostProcessDaemon
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'))
+
+
+@pytest.fixture
+def daemon(tmp_path, queue):
+    daemon = PostProcessDaemon(str(tmp_path / 'pp.sock'), queue=queue)
+    daemon.start(workers=False)
+    yield daemon
+    daemon.stop()
+
+
+def test_hook_client_enqueues_through_socket(daemon, queue):
+    request = {'hash': 'ABC', 'name': 'Heat (1995) [1080p]', 'dir': '/downloads/complete'}
+    first = transmission_hook.notify(request, daemon.socket_path)
+    again = transmission_hook.notify(request, daemon.socket_path)
+
+    assert first['ok'] and again['job_id'] == first['job_id']
+    job = queue.get(first['job_id'])
+    assert job.payload == {'torrent_name': 'Heat (1995) [1080p]', 'torrent_dir': '/downloads/complete',
+                           'torrent_hash': 'ABC'}
+    stats = transmission_hook.notify({'command': 'stats'}, daemon.socket_path)
+    assert stats['jobs']['queued'] == 1
+
+
+def test_rejects_requests_without_name(daemon):
+    assert transmission_hook.notify({'hash': 'ABC'}, daemon.socket_path) == {'ok': False, 'error': 'name requerido'}
+
+
+def test_workers_process_in_daemon(tmp_path, queue):
+    done = []
+    daemon = PostProcessDaemon(str(tmp_path / 'pp.sock'), queue=queue,
+                               handlers={'completion': lambda job: done.append(job.payload['torrent_name'])})
+    daemon.pool.poll_interval = 0.01
+    daemon.start()
+    try:
+        transmission_hook.notify({'name': 'Heat'}, daemon.socket_path)
+        for _ in range(200):
+            if queue.counts()['done']:
+                break
+            time.sleep(0.01)
+    finally:
+        daemon.stop()
+    assert done == ['Heat']
+
+
+def test_hook_script_falls_back_to_queue(tmp_path):
+    # Sin demonio escuchando, el hook encola directamente en la cola persistente
+    env = dict(os.environ, TR_TORRENT_NAME='Alien (1979)', TR_TORRENT_HASH='DEF', TR_TORRENT_DIR='/downloads',
+               POSTPROCESS_SOCKET=str(tmp_path / 'missing.sock'), JOB_QUEUE_PATH=str(tmp_path / 'jobs.db'))
+    result = subprocess.run([sys.executable, 'transmission_hook.py'], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    jobs = JobQueue(str(tmp_path / 'jobs.db')).list()
+    assert [j.payload['torrent_hash'] for j in jobs] == ['DEF']
@@ -0,0 +1,188 @@
+from sqlalchemy import event
+
+import app as app_module
+from app import app, db, Download, check_downloads_status
+from status_sync import StatusSync, download_status_for
+from tests.fakes import FakeClock, FakeTransmission, InProcessClient
+
+
+def make_sync(torrent_count=0):
+    clock = FakeClock()
+    fake = FakeTransmission(clock=clock)
+    for i in range(torrent_count):
+        fake.add_torrent(f"{i:040x}", status=6, percentDone=1.0)
+    clock.now += 120  # Nada activo recientemente
+    sync = StatusSync(InProcessClient(fake), full_sync_interval=600, clock=clock)
+    return sync, fake, clock
+
+
+def test_download_status_for():
+    assert download_status_for({'status': 4, 'percentDone': 0.3, 'error': 0}) == 'descargando'
+    assert download_status_for({'status': 6, 'percentDone': 1.0, 'error': 0}) == 'completado'
+    assert download_status_for({'status': 0, 'percentDone': 0.1, 'error': 0}) == 'pendiente'
+    assert download_status_for({'status': 4, 'percentDone': 0.1, 'error': 3}) == 'error'
+
+
+def test_incremental_poll_only_fetches_recently_active():
+    sync, fake, clock = make_sync(torrent_count=1000)
+
+    first = sync.poll()
+    assert first.full and len(first.changed) == 1000
+
+    clock.now += 10
+    fake.update_torrent(f"{7:040x}", status=4, percentDone=0.5)
+    second = sync.poll()
+    assert not second.full
+    assert second.changed == {f"{7:040x}"}
+    assert sync.stats()['torrents_received'] == 1001
+
+    # Sigue activo pero sin cambios: no genera diferencias
+    clock.now += 10
+    fake.update_torrent(f"{7:040x}")
+    assert sync.poll().changed == set()
+
+
+def test_downloading_ignores_stalled_and_queued():
+    sync, fake, clock = make_sync(torrent_count=2)
+    fake.add_torrent('a' * 40, status=4, percentDone=0.2, rateDownload=0)  # Sin pares
+    fake.add_torrent('b' * 40, status=3, percentDone=0.0)  # En cola
+    sync.poll()
+    assert sync.downloading() == 0
+
+    clock.now += 10
+    fake.update_torrent('a' * 40, rateDownload=2048)
+    sync.poll()
+    assert sync.downloading() == 1
+
+
+def test_removed_torrents_leave_snapshot():
+    sync, fake, clock = make_sync(torrent_count=3)
+    sync.poll()
+    clock.now += 5
+    fake.handle('torrent-remove', {'ids': [f"{1:040x}"]})
+    result = sync.poll()
+    assert result.removed == {f"{1:040x}"}
+    assert sync.get(f"{1:040x}") is None
+
+
+def test_full_reconcile_after_interval_or_gap():
+    sync, fake, clock = make_sync(torrent_count=2)
+    sync.poll()
+    clock.now += 30
+    assert not sync.poll().full
+    # Todo parado: un hueco largo no obliga a reconciliar
+    clock.now += 200
+    assert not sync.poll().full
+    assert sync.last_active_at is None
+
+    # Con algo bajando, lo que terminara en el hueco ya no es "recently-active"
+    clock.now += 10
+    fake.update_torrent(f"{0:040x}", status=4, percentDone=0.5, rateDownload=1024)
+    assert not sync.poll().full
+    clock.now += 61
+    assert sync.poll().full
+    clock.now += 600
+    assert sync.poll().full
+
+
+def test_check_downloads_status_single_commit(auth_client, monkeypatch):
+    sync, fake, clock = make_sync()
+    monkeypatch.setattr(app_module, 'status_sync', sync)
+    refreshes = []
+    monkeypatch.setattr(app_module, 'refresh_plex_library', lambda *args, **kwargs: refreshes.append(args))
+
+    hashes = [f"{i:040x}" for i in range(5)]
+    for h in hashes:
+        fake.add_torrent(h, status=4, percentDone=0.2)
+    with app.app_context():
+        downloads = [Download(movie_title=f'Movie {i}', movie_id='', magnet=f'magnet:?xt=urn:btih:{h}',
+                              info_hash=h, status='pendiente', user_id=auth_client.user_id)
+                     for i, h in enumerate(hashes)]
+        db.session.add_all(downloads)
+        db.session.commit()
+        ids = [d.id for d in downloads]
+
+        commits = []
+        listener = lambda session: commits.append(session)
+        event.listen(db.session, 'after_commit', listener)
+        try:
+            assert check_downloads_status()
+            assert len(commits) == 1
+
+            # Solo dos torrents cambian: solo esas filas se tocan
+            clock.now += 10
+            fake.update_torrent(hashes[0], status=6, percentDone=1.0)
+            fake.update_torrent(hashes[1], error=2)
+            assert check_downloads_status()
+            assert len(commits) == 2
+
+            # Sin cambios no hay commit
+            clock.now += 10
+            assert check_downloads_status()
+            assert len(commits) == 2
+        finally:
+            event.remove(db.session, 'after_commit', listener)
+
+        db.session.expire_all()
+        statuses = [db.session.get(Download, i).status for i in ids]
+    assert statuses == ['completado', 'error', 'descargando', 'descargando', 'descargando']
+    # El escaneo de Plex lo pide el webhook (parcial), no la sincronización
+    assert refreshes == []
+
+
+class Row:
+    def __init__(self, **fields):
+        self.id = 1
+        self.status = 'descargando'
+        self.percent_done = None
+        self.size_bytes = None
+        self.last_seen_at = None
+        self.__dict__.update(fields)
+
+
+def test_progress_writer_skips_insignificant_changes():
+    from datetime import datetime, timedelta
+    from status_sync import ProgressWriter
+
+    writer = ProgressWriter()
+    now = datetime(2024, 1, 1)
+    torrent = {'percentDone': 0.4, 'rateDownload': 1000, 'eta': -1, 'sizeWhenDone': 100}
+
+    first = writer.plan(Row(), torrent, 'descargando', now)
+    assert first['percent_done'] == 0.4 and first['eta'] is None and first['last_seen_at'] == now
+
+    seen = Row(percent_done=0.4, size_bytes=100, last_seen_at=now)
+    assert writer.plan(seen, dict(torrent, percentDone=0.405, rateDownload=5000), 'descargando', now) is None
+    assert writer.plan(seen, dict(torrent, percentDone=0.41), 'descargando', now) is not None
+    assert writer.plan(seen, torrent, 'error', now) is not None
+    assert writer.plan(seen, torrent, 'descargando', now + timedelta(seconds=301)) is not None
+    assert writer.stats() == {'evaluated': 5, 'written': 4, 'skipped': 1}
+
+
+def test_progress_persisted_and_rendered(auth_client, monkeypatch):
+    sync, fake, clock = make_sync()
+    monkeypatch.setattr(app_module, 'status_sync', sync)
+
+    hash_ = 'd' * 40
+    fake.add_torrent(hash_, status=4, percentDone=0.5, rateDownload=4096, eta=120, sizeWhenDone=2 * 1024 ** 3)
+    with app.app_context():
+        download = Download(movie_title='Ronin', movie_id='', magnet=f'magnet:?xt=urn:btih:{hash_}',
+                            info_hash=hash_, status='pendiente', user_id=auth_client.user_id)
+        db.session.add(download)
+        db.session.commit()
+        download_id = download.id
+
+        assert check_downloads_status()
+        # Avance menor al 1%: no se escribe
+        clock.now += 5
+        fake.update_torrent(hash_, percentDone=0.503, rateDownload=8192)
+        assert check_downloads_status()
+
+        db.session.expire_all()
+        stored = db.session.get(Download, download_id)
+        assert (stored.status, stored.percent_done, stored.rate_download, stored.eta, stored.size_bytes) == \
+            ('descargando', 0.5, 4096, 120, 2 * 1024 ** 3)
+        assert stored.last_seen_at is not None
+
+    page = auth_client.get('/').get_data(as_text=True)
+    assert '50%' in page
@@ -0,0 +1,51 @@
+from torrent_selector import GB, TorrentSelector
+
+
+def torrent(hash_, quality, seeds, peers=0, size_gb=2, type_='bluray'):
+    return {'hash': hash_, 'quality': quality, 'type': type_, 'seeds': seeds,
+            'peers': peers, 'size_bytes': int(size_gb * GB)}
+
+
+def test_prefers_quality_then_swarm_health():
+    movie = {'torrents': [
+        torrent('A', '720p', 900),
+        torrent('B', '1080p', 40, peers=30),
+        torrent('C', '1080p', 120, peers=10, type_='web'),
+    ]}
+    selection = TorrentSelector().select(movie)
+
+    assert selection.torrent['hash'] == 'C'
+    assert '120 seeds' in selection.reason
+
+
+def test_filters_by_min_seeds_and_size():
+    movie = {'torrents': [
+        torrent('DEAD', '1080p', 1),
+        torrent('HUGE', '2160p', 300, size_gb=20),
+        torrent('OK', '720p', 50),
+    ]}
+    selection = TorrentSelector(min_seeds=5, max_size_bytes=8 * GB).select(movie)
+
+    assert selection.torrent['hash'] == 'OK'
+    assert 'sin 1080p' in selection.reason
+
+
+def test_falls_back_when_nothing_is_eligible():
+    movie = {'torrents': [torrent('A', '720p', 1), torrent('B', '1080p', 2)]}
+    selection = TorrentSelector(min_seeds=10).select(movie)
+
+    assert selection.torrent['hash'] == 'B'
+    assert 'ningún torrent cumple' in selection.reason
+
+
+def test_policy_is_configurable():
+    movie = {'torrents': [torrent('A', '720p', 50), torrent('B', '1080p', 50)]}
+    assert TorrentSelector(preferred_quality='720p').select(movie).torrent['hash'] == 'A'
+
+
+def test_annotate_batch():
+    movies = [{'torrents': [torrent('A', '1080p', 10)]}, {'torrents': []}]
+    TorrentSelector().annotate(movies)
+
+    assert movies[0]['selected_torrent']['hash'] == 'A'
+    assert movies[1]['selected_torrent'] is None
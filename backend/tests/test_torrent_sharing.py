@@ -0,0 +1,133 @@
+import uuid
+
+import pytest
+
+import app as app_module
+from app import app, db, Download, Torrent, UserModel, migrate_download_table
+from tests.fakes import FakeTransmission, InProcessClient
+
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeTransmission()
+    monkeypatch.setattr(app_module, 'transmission', InProcessClient(fake))
+    return fake
+
+
+@pytest.fixture
+def other_user_id():
+    with app.app_context():
+        user = UserModel(username=f'sharing-{uuid.uuid4().hex[:8]}', password='x')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def hash_():
+    # La base es compartida entre tests: cada test usa su propio torrent
+    return uuid.uuid4().hex + uuid.uuid4().hex[:8]
+
+
+def magnet_for(hash_):
+    return f'magnet:?xt=urn:btih:{hash_}&dn=Heat'
+
+
+def login_as(client, user_id):
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+
+
+def rpc_methods(fake):
+    return [method for method, _ in fake.calls]
+
+
+def test_second_user_attaches_without_rpc(auth_client, fake, other_user_id, hash_):
+    magnet = magnet_for(hash_)
+    assert auth_client.post('/add', json={'title': 'Heat', 'magnet': magnet}).status_code == 200
+    assert rpc_methods(fake) == ['torrent-add']
+
+    with app.app_context():
+        first = Download.query.filter_by(user_id=auth_client.user_id, info_hash=hash_).one()
+        first.percent_done = 0.42
+        db.session.commit()
+
+    login_as(auth_client, other_user_id)
+    resp = auth_client.post('/add', json={'title': 'Heat', 'magnet': magnet})
+    assert resp.get_json()['shared'] is True
+    assert rpc_methods(fake) == ['torrent-add']
+
+    with app.app_context():
+        rows = Download.query.filter_by(info_hash=hash_).all()
+        assert len({row.torrent_id for row in rows}) == 1
+        assert Torrent.query.filter_by(info_hash=hash_).count() == 1
+        shared = next(row for row in rows if row.user_id == other_user_id)
+        assert (shared.status, shared.percent_done) == ('descargando', 0.42)
+
+
+def test_files_removed_only_with_last_reference(auth_client, fake, other_user_id, hash_):
+    magnet = magnet_for(hash_)
+    auth_client.post('/add', json={'title': 'Heat', 'magnet': magnet})
+    login_as(auth_client, other_user_id)
+    auth_client.post('/add', json={'title': 'Heat', 'magnet': magnet})
+
+    with app.app_context():
+        ids = {row.user_id: row.id for row in Download.query.filter_by(info_hash=hash_)}
+
+    # El primero en borrar no se lleva los archivos del otro
+    login_as(auth_client, auth_client.user_id)
+    assert auth_client.post(f'/delete/{ids[auth_client.user_id]}').status_code == 200
+    assert 'torrent-remove' not in rpc_methods(fake)
+
+    login_as(auth_client, other_user_id)
+    assert auth_client.post(f'/delete/{ids[other_user_id]}').status_code == 200
+    removes = [args for method, args in fake.calls if method == 'torrent-remove']
+    assert removes == [{'ids': [hash_], 'delete-local-data': True}]
+
+    with app.app_context():
+        assert Torrent.query.filter_by(info_hash=hash_).count() == 0
+
+
+def test_bulk_add_and_delete_share_torrents(auth_client, fake, other_user_id, hash_):
+    magnet = magnet_for(hash_)
+    auth_client.post('/api/downloads/bulk', json={'action': 'add', 'items': [{'title': 'Heat', 'magnet': magnet}]})
+    login_as(auth_client, other_user_id)
+    resp = auth_client.post('/api/downloads/bulk', json={'action': 'add', 'items': [{'title': 'Heat', 'magnet': magnet}]})
+    assert resp.get_json()['results'][0]['shared'] is True
+    assert rpc_methods(fake).count('torrent-add') == 1
+
+    with app.app_context():
+        mine = Download.query.filter_by(user_id=other_user_id, info_hash=hash_).one().id
+    resp = auth_client.post('/api/downloads/bulk', json={'action': 'delete', 'ids': [mine]})
+    assert resp.get_json()['results'][0]['status'] == 'deleted'
+    assert 'torrent-remove' not in rpc_methods(fake)
+
+
+def test_migration_creates_one_torrent_per_hash(auth_client, other_user_id, hash_):
+    with app.app_context():
+        db.session.add_all([
+            Download(movie_title='Legacy', movie_id='', magnet=f'magnet:?xt=urn:btih:{hash_}',
+                     info_hash=hash_, status='completado', user_id=user_id)
+            for user_id in (auth_client.user_id, other_user_id)
+        ])
+        db.session.commit()
+
+        migrate_download_table()
+        db.session.expire_all()
+
+        torrent = Torrent.query.filter_by(info_hash=hash_).one()
+        assert {row.torrent_id for row in Download.query.filter_by(info_hash=hash_)} == {torrent.id}
+
+
+def test_migration_skips_failed_downloads(auth_client, hash_):
+    with app.app_context():
+        db.session.add(Download(movie_title='Legacy', movie_id='', magnet=f'magnet:?xt=urn:btih:{hash_}',
+                                info_hash=hash_, status='error', user_id=auth_client.user_id))
+        db.session.commit()
+
+        migrate_download_table()
+        db.session.expire_all()
+
+        assert Torrent.query.filter_by(info_hash=hash_).first() is None
+        assert Download.query.filter_by(info_hash=hash_).one().torrent_id is None
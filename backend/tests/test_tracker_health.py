@@ -0,0 +1,89 @@
+import asyncio
+import struct
+
+import pytest
+
+from tracker_health import PROTOCOL_ID, TrackerRegistry, probe_all, probe_tracker
+
+
+class StandInTracker(asyncio.DatagramProtocol):
+    """Tracker UDP mínimo que responde connect y announce (BEP-15)"""
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.announces = 0
+
+    def datagram_received(self, data, addr):
+        if len(data) == 16:
+            protocol_id, action, tid = struct.unpack('>QII', data)
+            assert protocol_id == PROTOCOL_ID and action == 0
+            self.transport.sendto(struct.pack('>IIQ', 0, tid, 0xC0FFEE), addr)
+        elif len(data) >= 98:
+            connection_id, action, tid = struct.unpack('>QII', data[:16])
+            assert connection_id == 0xC0FFEE and action == 1
+            self.announces += 1
+            self.transport.sendto(struct.pack('>IIIII', 1, tid, 1800, 3, 7), addr)
+
+
+async def start_tracker():
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(StandInTracker, local_addr=('127.0.0.1', 0))
+    return transport, protocol, transport.get_extra_info('sockname')[1]
+
+
+def test_probe_local_tracker():
+    async def run():
+        transport, protocol, port = await start_tracker()
+        try:
+            return await probe_tracker(f'udp://127.0.0.1:{port}/announce', timeout=1), protocol
+        finally:
+            transport.close()
+
+    result, protocol = asyncio.run(run())
+    assert result['ok']
+    assert result['seeders'] == 7 and result['leechers'] == 3
+    assert protocol.announces == 1
+
+
+def test_probe_all_concurrently_with_dead_tracker():
+    async def run():
+        transport, _, port = await start_tracker()
+        dead = await asyncio.get_running_loop().create_datagram_endpoint(
+            asyncio.DatagramProtocol, local_addr=('127.0.0.1', 0))
+        dead_port = dead[0].get_extra_info('sockname')[1]
+        try:
+            return await probe_all([f'udp://127.0.0.1:{port}', f'udp://127.0.0.1:{dead_port}'], timeout=0.3)
+        finally:
+            transport.close()
+            dead[0].close()
+
+    results = asyncio.run(run())
+    oks = sorted(r['ok'] for r in results.values())
+    assert oks == [False, True]
+
+
+def test_registry_orders_by_score_and_drops_dead(tmp_path):
+    path = str(tmp_path / 'trackers.json')
+    candidates = ['udp://a:1', 'udp://b:1', 'udp://c:1']
+    registry = TrackerRegistry(candidates, path=path)
+
+    # Sin datos se respetan los candidatos en orden
+    assert registry.top(2) == ['udp://a:1', 'udp://b:1']
+
+    for _ in range(3):
+        registry.record('udp://a:1', {'ok': False, 'error': 'timeout'})
+        registry.record('udp://b:1', {'ok': True, 'latency': 0.4})
+        registry.record('udp://c:1', {'ok': True, 'latency': 0.05})
+    registry.save()
+
+    # Otro proceso lee las puntuaciones guardadas
+    reader = TrackerRegistry(candidates, path=path)
+    assert reader.top(5) == ['udp://c:1', 'udp://b:1']
+
+
+def test_registry_falls_back_when_all_dead(tmp_path):
+    registry = TrackerRegistry(['udp://a:1', 'udp://b:1'], path=str(tmp_path / 't.json'))
+    for _ in range(5):
+        registry.record('udp://a:1', {'ok': False})
+        registry.record('udp://b:1', {'ok': False})
+    assert registry.top(1) == ['udp://a:1']
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from http_client import UpstreamClient
+from tests.fakes import fake_transmission_server
+from transmission_client import TransmissionClient, TransmissionError
+
+
+@pytest.fixture
+def server():
+    with fake_transmission_server() as server:
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    return TransmissionClient(f"{server.base_url}/transmission/rpc", http=UpstreamClient('transmission-test'))
+
+
+def test_session_id_is_cached(server, client):
+    client.torrent_add('magnet:?xt=urn:btih:AAA&dn=a')
+    client.torrent_add('magnet:?xt=urn:btih:BBB&dn=b')
+    torrents = client.torrent_get(['id', 'hashString'])['torrents']
+
+    assert [t['hashString'] for t in torrents] == ['aaa', 'bbb']
+    assert server.fake.handshakes == 1
+    assert client.stats()['session_renegotiations'] == 1
+
+
+def test_renegotiates_once_on_409(server, client):
+    client.session_get()
+    server.fake.rotate_session()
+
+    assert client.session_get(['version'])['version'].startswith('4.0.5')
+    assert server.fake.handshakes == 2
+    assert client.stats()['rpc_calls'] == 2
+
+
+def test_typed_methods(server, client):
+    added = client.torrent_add('magnet:?xt=urn:btih:CCC&dn=c', download_dir='/downloads', paused=True)
+    torrent_id = added['torrent-added']['id']
+
+    client.torrent_set([torrent_id], bandwidth_priority=1)
+    assert server.fake.calls[-1] == ('torrent-set', {'ids': [torrent_id], 'bandwidth-priority': 1})
+
+    assert client.session_stats()['torrentCount'] == 1
+    client.torrent_remove(['ccc'], delete_local_data=True)
+    assert client.torrent_get(['id'])['torrents'] == []
+
+
+def test_rpc_error_is_raised_and_counted(client):
+    with pytest.raises(TransmissionError):
+        client.rpc('torrent-explode')
+    stats = client.stats()
+    assert stats['rpc_errors'] == 1
+    assert stats['by_method']['torrent-explode']['calls'] == 1
+
+
+def test_thread_safe_under_concurrency(server, client):
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(5):
+                client.torrent_add(f'magnet:?xt=urn:btih:{n:02d}{i:02d}&dn=x')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert len(server.fake.torrents) == 40
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from yts_cache import ResponseCache, make_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingFetch:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, params):
+        self.calls += 1
+        return {'movies': [{'title': params.get('query_term')}], 'version': self.calls}
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_make_key_normalizes_params():
+    assert make_key({'query_term': '  Dune  Part ', 'page': '1'}) == make_key({'query_term': 'dune part', 'limit': 20})
+    assert make_key({'query_term': 'dune', 'page': 2}) != make_key({'query_term': 'dune', 'page': 1})
+    # Parámetros que no afectan a la respuesta no generan claves nuevas
+    assert make_key({'query_term': 'dune', 'foo': 'bar'}) == make_key({'query_term': 'dune'})
+
+
+def test_hit_within_ttl(clock):
+    cache = ResponseCache(ttl=60, clock=clock)
+    fetch = CountingFetch()
+
+    cache.get_or_fetch({'query_term': 'dune'}, fetch)
+    clock.now += 30
+    cache.get_or_fetch({'query_term': 'DUNE'}, fetch)
+
+    assert fetch.calls == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_callers_get_their_own_copy(clock):
+    cache = ResponseCache(ttl=60, clock=clock)
+    fetch = CountingFetch()
+
+    first = cache.get_or_fetch({'query_term': 'dune'}, fetch)
+    first['movies'][0]['selected_torrent'] = {'hash': 'A' * 40}
+    second = cache.get_or_fetch({'query_term': 'dune'}, fetch)
+    assert 'selected_torrent' not in second['movies'][0]
+
+
+def test_lru_eviction(clock):
+    cache = ResponseCache(max_entries=2, clock=clock)
+    fetch = CountingFetch()
+
+    for term in ('a', 'b', 'a', 'c'):
+        cache.get_or_fetch({'query_term': term}, fetch)
+    cache.get_or_fetch({'query_term': 'a'}, fetch)
+
+    assert cache.stats()['evictions'] == 1
+    assert fetch.calls == 3  # 'b' fue el menos usado y se expulsó
+
+
+def test_stale_served_while_revalidating(clock):
+    cache = ResponseCache(ttl=60, stale_ttl=600, clock=clock)
+    fetch = CountingFetch()
+
+    first = cache.get_or_fetch({'query_term': 'dune'}, fetch)
+    clock.now += 120
+    stale = cache.get_or_fetch({'query_term': 'dune'}, fetch)
+    assert stale == first
+
+    deadline = time.time() + 2
+    while cache.stats()['refreshes'] < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.get_or_fetch({'query_term': 'dune'}, fetch)['version'] == 2
+    assert cache.stats()['stale_hits'] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path, clock):
+    path = str(tmp_path / 'cache.db')
+    fetch = CountingFetch()
+    ResponseCache(disk_path=path, clock=clock).get_or_fetch({'query_term': 'dune'}, fetch)
+
+    restarted = ResponseCache(disk_path=path, clock=clock)
+    restarted.get_or_fetch({'query_term': 'dune'}, fetch)
+
+    assert fetch.calls == 1
+    assert restarted.stats()['disk_hits'] == 1
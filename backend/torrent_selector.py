@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Selección del mejor torrent de una película de YTS según una política
+configurable (calidad preferida, seeds mínimos, ratio seeds/peers, tamaño)
+"""
+import math
+
+GB = 1024 ** 3
+
+DEFAULT_POLICY = {
+    'preferred_quality': '1080p',
+    # Orden de preferencia cuando no hay la calidad preferida
+    'quality_order': ['1080p', '720p', '2160p', '480p', '3D'],
+    'min_seeds': 5,
+    'max_size_bytes': 8 * GB,
+    'preferred_types': ['bluray', 'web'],
+}
+
+
+def format_size(size_bytes):
+    return f"{size_bytes / GB:.1f} GB" if size_bytes else "tamaño desconocido"
+
+
+class Selection:
+    """Torrent elegido, su puntuación y el motivo de la elección"""
+
+    def __init__(self, torrent, score, reason):
+        self.torrent = torrent
+        self.score = score
+        self.reason = reason
+
+    def to_dict(self):
+        return {
+            'hash': self.torrent.get('hash'),
+            'quality': self.torrent.get('quality'),
+            'type': self.torrent.get('type'),
+            'seeds': self.torrent.get('seeds'),
+            'peers': self.torrent.get('peers'),
+            'size_bytes': self.torrent.get('size_bytes'),
+            'score': round(self.score, 2),
+            'reason': self.reason,
+        }
+
+
+class TorrentSelector:
+    """Puntúa los torrents candidatos y elige el que mejor cumple la política"""
+
+    def __init__(self, **policy):
+        self.policy = dict(DEFAULT_POLICY)
+        self.policy.update({k: v for k, v in policy.items() if v is not None})
+
+    def quality_score(self, quality):
+        if quality == self.policy['preferred_quality']:
+            return 100.0
+        order = self.policy['quality_order']
+        if quality in order:
+            return max(80.0 - 15.0 * order.index(quality), 10.0)
+        return 0.0
+
+    def is_eligible(self, torrent):
+        seeds = torrent.get('seeds') or 0
+        size = torrent.get('size_bytes') or 0
+        max_size = self.policy['max_size_bytes']
+        return seeds >= self.policy['min_seeds'] and (not max_size or size <= max_size)
+
+    def score(self, torrent):
+        """Puntuación de un torrent: calidad + salud del enjambre + tipo"""
+        seeds = torrent.get('seeds') or 0
+        peers = torrent.get('peers') or 0
+        score = self.quality_score(torrent.get('quality'))
+        # Más seeds descarga más rápido, con rendimientos decrecientes
+        score += 20.0 * math.log10(1 + seeds)
+        # Un enjambre con muchos seeds por peer se completa antes
+        score += min(seeds / (peers + 1), 10.0)
+        if torrent.get('type') in self.policy['preferred_types']:
+            score += 5.0 - self.policy['preferred_types'].index(torrent.get('type'))
+        return score
+
+    def describe(self, torrent, eligible):
+        seeds = torrent.get('seeds') or 0
+        peers = torrent.get('peers') or 0
+        reason = (f"{torrent.get('quality', '?')} {torrent.get('type', '')}".strip()
+                  + f" · {seeds} seeds · ratio {seeds / (peers + 1):.1f}"
+                  + f" · {format_size(torrent.get('size_bytes'))}")
+        if torrent.get('quality') != self.policy['preferred_quality']:
+            reason += f" (sin {self.policy['preferred_quality']} disponible)"
+        if not eligible:
+            reason += " (ningún torrent cumple la política; se usa el mejor disponible)"
+        return reason
+
+    def select(self, movie):
+        """Elige el torrent de una película; None si no tiene torrents"""
+        torrents = [t for t in movie.get('torrents') or [] if t.get('hash')]
+        if not torrents:
+            return None
+
+        candidates = [t for t in torrents if self.is_eligible(t)]
+        eligible = bool(candidates)
+        if not candidates:
+            candidates = torrents
+
+        # Preferir la mejor calidad disponible y, dentro de ella, el mejor enjambre
+        best = max(candidates, key=lambda t: (self.quality_score(t.get('quality')), self.score(t)))
+        return Selection(best, self.score(best), self.describe(best, eligible))
+
+    def annotate(self, movies):
+        """Elige el torrent de toda una página de resultados de una vez"""
+        for movie in movies:
+            selection = self.select(movie)
+            movie['selected_torrent'] = selection.to_dict() if selection else None
+        return movies
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Salud de trackers UDP (BEP-15): sondeo concurrente con asyncio y
+puntuación por tracker para que los magnets solo incluyan trackers vivos
+
+Uso:
+    python tracker_health.py probe    # sondear y guardar puntuaciones
+"""
+import os
+import json
+import time
+import random
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+import threading
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+TRACKER_HEALTH_PATH = os.getenv(
+    'TRACKER_HEALTH_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'trackers.json')
+)
+PROBE_TIMEOUT = 5
+PROBE_CONCURRENCY = 16
+EWMA_ALPHA = 0.3
+HEALTHY_THRESHOLD = 0.3
+
+PROTOCOL_ID = 0x41727101980
+ACTION_CONNECT = 0
+ACTION_ANNOUNCE = 1
+ACTION_ERROR = 3
+# Hash de prueba: el tracker responde aunque no conozca el torrent
+PROBE_INFO_HASH = bytes(20)
+
+# Trackers candidatos; el sondeo decide cuáles se usan y en qué orden
+TRACKER_CANDIDATES = [
+    "udp://open.demonii.com:1337/announce",
+    "udp://tracker.opentrackr.org:1337/announce",
+    "udp://tracker.openbittorrent.com:80",
+    "udp://tracker.torrent.eu.org:451/announce",
+    "udp://open.stealth.si:80/announce",
+    "udp://exodus.desync.com:6969/announce",
+]
+
+
+class TrackerProbeError(Exception):
+    """El tracker no respondió o respondió de forma inválida"""
+
+
+class _TrackerProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.transport = None
+        self.waiters = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 8:
+            return
+        _, transaction_id = struct.unpack('>II', data[:8])
+        waiter = self.waiters.pop(transaction_id, None)
+        if waiter and not waiter.done():
+            waiter.set_result(data)
+
+    def error_received(self, exc):
+        for waiter in self.waiters.values():
+            if not waiter.done():
+                waiter.set_exception(exc)
+        self.waiters.clear()
+
+    async def request(self, packet, transaction_id, timeout):
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[transaction_id] = waiter
+        self.transport.sendto(packet)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        finally:
+            self.waiters.pop(transaction_id, None)
+
+
+def _check_response(data, action, transaction_id, min_length):
+    if len(data) >= 8:
+        got_action, got_tid = struct.unpack('>II', data[:8])
+        if got_action == ACTION_ERROR:
+            raise TrackerProbeError(data[8:].decode('utf-8', 'replace') or 'error del tracker')
+        if got_action == action and got_tid == transaction_id and len(data) >= min_length:
+            return
+    raise TrackerProbeError('respuesta inválida')
+
+
+async def probe_tracker(url, timeout=PROBE_TIMEOUT):
+    """Hace connect + announce BEP-15 contra un tracker UDP
+
+    Devuelve un dict con ok, latency (segundos, ida y vuelta completa),
+    seeders/leechers del announce o el error.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme != 'udp' or not parsed.hostname or not parsed.port:
+        return {'ok': False, 'error': 'solo se sondean trackers udp://host:puerto'}
+
+    loop = asyncio.get_running_loop()
+    start = time.monotonic()
+    transport = None
+    try:
+        transport, protocol = await asyncio.wait_for(
+            loop.create_datagram_endpoint(_TrackerProtocol, remote_addr=(parsed.hostname, parsed.port)),
+            timeout
+        )
+
+        transaction_id = random.getrandbits(32)
+        data = await protocol.request(
+            struct.pack('>QII', PROTOCOL_ID, ACTION_CONNECT, transaction_id), transaction_id, timeout
+        )
+        _check_response(data, ACTION_CONNECT, transaction_id, 16)
+        connection_id = struct.unpack('>Q', data[8:16])[0]
+
+        transaction_id = random.getrandbits(32)
+        peer_id = b'-YT0001-' + os.urandom(12)
+        announce = struct.pack(
+            '>QII20s20sQQQIIIiH', connection_id, ACTION_ANNOUNCE, transaction_id,
+            PROBE_INFO_HASH, peer_id, 0, 0, 0, 0, 0, random.getrandbits(32), 0, 6881
+        )
+        data = await protocol.request(announce, transaction_id, timeout)
+        _check_response(data, ACTION_ANNOUNCE, transaction_id, 20)
+        _, leechers, seeders = struct.unpack('>III', data[8:20])
+
+        return {'ok': True, 'latency': time.monotonic() - start, 'seeders': seeders, 'leechers': leechers}
+    except asyncio.TimeoutError:
+        return {'ok': False, 'error': 'timeout'}
+    except (OSError, socket.gaierror, TrackerProbeError) as e:
+        return {'ok': False, 'error': str(e) or e.__class__.__name__}
+    finally:
+        if transport is not None:
+            transport.close()
+
+
+async def probe_all(urls, timeout=PROBE_TIMEOUT, concurrency=PROBE_CONCURRENCY):
+    """Sondea todos los trackers en paralelo (con límite de concurrencia)"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(url):
+        async with semaphore:
+            return url, await probe_tracker(url, timeout)
+
+    return dict(await asyncio.gather(*(bounded(url) for url in urls)))
+
+
+class TrackerRegistry:
+    """Puntuaciones de trackers persistidas en JSON y compartidas entre procesos"""
+
+    def __init__(self, candidates, path=TRACKER_HEALTH_PATH, clock=time.time):
+        self.candidates = list(candidates)
+        self.path = path
+        self.clock = clock
+        self.stats = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _default_stats(self):
+        return {'success': 0.5, 'latency_ms': None, 'probes': 0, 'failures': 0,
+                'last_ok': None, 'last_checked': None, 'last_error': None}
+
+    def _reload_if_changed(self):
+        """Recarga el JSON si otro proceso (el monitor) lo actualizó"""
+        if not self.path:
+            return
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path) as f:
+                self.stats = json.load(f).get('trackers', {})
+            self._mtime = mtime
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer la salud de trackers: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'updated_at': self.clock(), 'trackers': self.stats}, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def record(self, url, result):
+        """Actualiza las medias móviles de éxito y latencia de un tracker"""
+        entry = self.stats.setdefault(url, self._default_stats())
+        entry['probes'] += 1
+        entry['last_checked'] = self.clock()
+        entry['success'] = (1 - EWMA_ALPHA) * entry['success'] + EWMA_ALPHA * (1.0 if result['ok'] else 0.0)
+        if result['ok']:
+            latency_ms = result['latency'] * 1000
+            previous = entry['latency_ms']
+            entry['latency_ms'] = latency_ms if previous is None else (1 - EWMA_ALPHA) * previous + EWMA_ALPHA * latency_ms
+            entry['last_ok'] = entry['last_checked']
+            entry['last_error'] = None
+        else:
+            entry['failures'] += 1
+            entry['last_error'] = result.get('error')
+
+    def score(self, url):
+        entry = self.stats.get(url) or self._default_stats()
+        penalty = min((entry['latency_ms'] or 0) / 20.0, 25.0)
+        return 100.0 * entry['success'] - penalty
+
+    def is_healthy(self, url):
+        entry = self.stats.get(url)
+        return entry is None or entry['success'] >= HEALTHY_THRESHOLD
+
+    def top(self, n):
+        """Los n trackers sanos con mejor puntuación; si no hay datos, los candidatos"""
+        with self._lock:
+            self._reload_if_changed()
+            healthy = [url for url in self.candidates if self.is_healthy(url)]
+            if not healthy:
+                return self.candidates[:n]
+            order = {url: i for i, url in enumerate(self.candidates)}
+            healthy.sort(key=lambda url: (-self.score(url), order[url]))
+            return healthy[:n]
+
+    def probe(self, timeout=PROBE_TIMEOUT):
+        """Sondea todos los candidatos y guarda las puntuaciones"""
+        udp_trackers = [url for url in self.candidates if url.startswith('udp://')]
+        results = asyncio.run(probe_all(udp_trackers, timeout=timeout))
+        with self._lock:
+            self._reload_if_changed()
+            for url, result in results.items():
+                self.record(url, result)
+            self.save()
+        healthy = sum(1 for r in results.values() if r['ok'])
+        logger.info(f"Trackers sondeados: {healthy}/{len(results)} responden")
+        return results
+
+    def snapshot(self):
+        with self._lock:
+            self._reload_if_changed()
+            return {url: dict(self.stats.get(url) or self._default_stats(), score=round(self.score(url), 1),
+                              healthy=self.is_healthy(url))
+                    for url in self.candidates}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sondea la salud de los trackers UDP')
+    parser.add_argument('command', choices=['probe'])
+    parser.add_argument('--timeout', type=float, default=PROBE_TIMEOUT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    registry = TrackerRegistry(TRACKER_CANDIDATES)
+    for url, result in registry.probe(timeout=args.timeout).items():
+        status = f"{result['latency'] * 1000:.0f} ms" if result['ok'] else result['error']
+        logger.info(f"{url}: {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Cliente RPC de Transmission persistente y seguro entre hilos
+
+Guarda el X-Transmission-Session-Id y solo lo renegocia cuando Transmission
+responde 409, reintentando la llamada una vez con el nuevo id.
+"""
+import time
+import logging
+import threading
+
+import http_client
+
+logger = logging.getLogger(__name__)
+
+SESSION_HEADER = 'X-Transmission-Session-Id'
+
+
+class TransmissionError(Exception):
+    """Transmission respondió con error o no se pudo completar la llamada"""
+
+
+class TransmissionClient:
+    """Cliente RPC con id de sesión cacheado y métricas por método"""
+
+    def __init__(self, url, http=None):
+        self.url = url
+        self.http = http or http_client.get_client('transmission')
+        self.session_id = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'rpc_calls': 0,
+            'rpc_errors': 0,
+            'session_renegotiations': 0,
+            'by_method': {},
+        }
+
+    def _record(self, method, latency, error=False):
+        with self._lock:
+            self._stats['rpc_calls'] += 1
+            if error:
+                self._stats['rpc_errors'] += 1
+            entry = self._stats['by_method'].setdefault(method, {'calls': 0, 'total_ms': 0.0})
+            entry['calls'] += 1
+            entry['total_ms'] += latency * 1000
+
+    def _post(self, payload):
+        headers = {SESSION_HEADER: self.session_id} if self.session_id else {}
+        return self.http.post(self.url, json=payload, headers=headers)
+
+    def rpc(self, method, arguments=None):
+        """Ejecuta un método RPC y devuelve sus 'arguments'"""
+        payload = {'method': method, 'arguments': arguments or {}}
+        start = time.monotonic()
+        try:
+            resp = self._post(payload)
+            if resp.status_code == 409:
+                # Id de sesión ausente o caducado: adoptar el nuevo y reintentar una vez
+                with self._lock:
+                    self.session_id = resp.headers.get(SESSION_HEADER)
+                    self._stats['session_renegotiations'] += 1
+                resp = self._post(payload)
+
+            if resp.status_code != 200:
+                raise TransmissionError(f"{method}: HTTP {resp.status_code}")
+            result = resp.json()
+            if result.get('result') != 'success':
+                raise TransmissionError(f"{method}: {result.get('result')}")
+        except Exception:
+            self._record(method, time.monotonic() - start, error=True)
+            raise
+
+        self._record(method, time.monotonic() - start)
+        return result.get('arguments', {})
+
+    # --- Métodos tipados ---
+    def torrent_add(self, filename, download_dir=None, paused=False):
+        arguments = {'filename': filename, 'paused': paused}
+        if download_dir:
+            arguments['download-dir'] = download_dir
+        return self.rpc('torrent-add', arguments)
+
+    def torrent_get(self, fields, ids=None):
+        arguments = {'fields': list(fields)}
+        if ids is not None:
+            arguments['ids'] = ids
+        return self.rpc('torrent-get', arguments)
+
+    def torrent_remove(self, ids, delete_local_data=False):
+        return self.rpc('torrent-remove', {'ids': ids, 'delete-local-data': delete_local_data})
+
+    def torrent_set(self, ids, **fields):
+        arguments = {'ids': ids}
+        arguments.update({name.replace('_', '-'): value for name, value in fields.items()})
+        return self.rpc('torrent-set', arguments)
+
+    def torrent_start(self, ids):
+        return self.rpc('torrent-start', {'ids': ids})
+
+    def torrent_stop(self, ids):
+        return self.rpc('torrent-stop', {'ids': ids})
+
+    def queue_move_top(self, ids):
+        return self.rpc('queue-move-top', {'ids': ids})
+
+    def session_get(self, fields=None):
+        return self.rpc('session-get', {'fields': list(fields)} if fields else {})
+
+    def session_stats(self):
+        return self.rpc('session-stats')
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'rpc_calls': self._stats['rpc_calls'],
+                'rpc_errors': self._stats['rpc_errors'],
+                'session_renegotiations': self._stats['session_renegotiations'],
+                'by_method': {},
+            }
+            for method, entry in self._stats['by_method'].items():
+                stats['by_method'][method] = {
+                    'calls': entry['calls'],
+                    'avg_ms': round(entry['total_ms'] / entry['calls'], 1),
+                }
+        return stats
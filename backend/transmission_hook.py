@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Hook de Transmission (script-torrent-done): avisa al demonio y termina
+
+Solo usa la biblioteca estándar y no importa nada del proyecto: envía
+TR_TORRENT_HASH/NAME/DIR por el socket Unix de postprocess_daemon.py.
+Si el demonio no está, encola directamente en la cola persistente para que
+lo procese en cuanto vuelva.
+"""
+import os
+import sys
+import json
+import socket
+
+SOCKET_PATH = os.getenv(
+    'POSTPROCESS_SOCKET',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'postprocess.sock')
+)
+TIMEOUT = 5
+
+
+def notify(request, socket_path=SOCKET_PATH):
+    """Envía la petición al demonio y devuelve su respuesta"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(TIMEOUT)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        response = b''
+        while not response.endswith(b'\n'):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            response += chunk
+    return json.loads(response or b'{}')
+
+
+def main():
+    request = {
+        'hash': os.getenv('TR_TORRENT_HASH', ''),
+        'name': os.getenv('TR_TORRENT_NAME', ''),
+        'dir': os.getenv('TR_TORRENT_DIR', ''),
+    }
+    if not request['name']:
+        print("No se recibió nombre del torrent", file=sys.stderr)
+        return 1
+
+    try:
+        response = notify(request)
+        if response.get('ok'):
+            return 0
+        print(f"El demonio rechazó la petición: {response.get('error')}", file=sys.stderr)
+    except (OSError, ValueError) as e:
+        print(f"Demonio de post-procesado no disponible ({e}); encolando directamente", file=sys.stderr)
+
+    # Importar aquí: el camino normal no carga nada más que la biblioteca estándar
+    from job_queue import JobQueue
+    from transmission_webhook import enqueue_completion
+    job_id = enqueue_completion(JobQueue(), request['name'], request['dir'], request['hash'])
+    print(f"Encolado como trabajo {job_id}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
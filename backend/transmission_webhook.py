@@ -1,14 +1,24 @@
 #!/usr/bin/env python3
 """
 Webhook script que se ejecuta cuando se completa una descarga en Transmission
+
+El post-procesado (organizar archivos, marcar la descarga, avisar a Plex)
+lo hacen los workers de la cola persistente (job_queue.py) dentro de
+postprocess_daemon.py; Transmission solo ejecuta transmission_hook.py, que
+avisa al demonio. Este script se puede seguir usando como hook (solo encola)
+o para lanzar workers adicionales: python transmission_webhook.py worker
 """
 import sys
 import os
-import sqlite3
 import logging
+import argparse
 import requests
-import subprocess
-from pathlib import Path
+
+import http_client
+from events import INTERNAL_TOKEN_HEADER, internal_token
+from file_organizer import FileOrganizer
+from job_queue import JobQueue, WorkerPool, PermanentJobError
+from plex_client import PlexClient
 
 # Configurar logging
 logging.basicConfig(
@@ -23,78 +33,67 @@ logger = logging.getLogger(__name__)
 
 # URLs de servicios
 FLASK_URL = "http://localhost:5000"
-PLEX_URL = "http://plex:32400"
+PLEX_URL = os.getenv('PLEX_URL', "http://plex:32400")
 PLEX_TOKEN = os.getenv('PLEX_TOKEN', '')
 
-def update_movie_status_in_db(torrent_name):
-    """Actualiza el estado de la película en la base de datos"""
+# En el demonio (postprocess_daemon.py) se reutilizan entre trabajos:
+# la sección de Plex queda cacheada y el organizador ya creado
+plex = PlexClient(PLEX_URL, PLEX_TOKEN)
+_organizer = None
+
+def get_organizer():
+    global _organizer
+    if _organizer is None:
+        _organizer = FileOrganizer()
+    return _organizer
+
+def update_movie_status_in_db(torrent_name, organized_path=None, torrent_hash=None):
+    """Actualiza el estado de la película en la base de datos
+
+    Envía también la ruta organizada: la web agrupa los escaneos de Plex de
+    todas las descargas que terminan juntas. Con el hash la web empareja sin
+    depender del nombre del release. Devuelve la respuesta o None.
+    """
     try:
-        # Buscar la película por nombre y marcarla como completada
-        response = requests.post(f"{FLASK_URL}/api/webhook/complete", 
-                               json={"torrent_name": torrent_name},
-                               timeout=10)
+        # Buscar la película por hash (o por nombre) y marcarla como completada
+        payload = {"torrent_name": torrent_name}
+        if torrent_hash:
+            payload["torrent_hash"] = torrent_hash
+        if organized_path:
+            payload["organized_path"] = organized_path
+        response = http_client.get_client('flask').post(f"{FLASK_URL}/api/webhook/complete", json=payload,
+                                                        headers={INTERNAL_TOKEN_HEADER: internal_token()})
         
         if response.status_code == 200:
             data = response.json()
             logger.info(f"Estado actualizado: {data.get('message', 'OK')}")
-            return data.get('movie_found', False)
+            return data
         else:
             logger.error(f"Error al actualizar estado: {response.status_code}")
-            return False
+            return None
             
     except Exception as e:
         logger.error(f"Error conectando con Flask: {e}")
-        return False
+        return None
 
 def organize_files(torrent_name, torrent_dir):
-    """Organiza y limpia los archivos descargados"""
+    """Organiza y limpia los archivos descargados; devuelve la ruta final o False"""
     try:
         logger.info(f"🗂️  Organizando archivos para: {torrent_name}")
-        
-        # Configurar variables de entorno para el organizador
-        env = os.environ.copy()
-        env['TR_TORRENT_NAME'] = torrent_name
-        env['TR_TORRENT_DIR'] = torrent_dir
-        
-        # Ejecutar el organizador de archivos
-        result = subprocess.run([
-            'python3', '/app/file_organizer.py'
-        ], env=env, capture_output=True, text=True, timeout=300)
-        
-        if result.returncode == 0:
-            logger.info("✅ Archivos organizados correctamente")
-            return True
-        else:
-            logger.error(f"❌ Error organizando archivos: {result.stderr}")
-            return False
-            
-    except subprocess.TimeoutExpired:
-        logger.error("⏰ Timeout organizando archivos")
-        return False
+        destination = get_organizer().organize_completed_download(torrent_name, torrent_dir)
+        if destination:
+            logger.info(f"✅ Archivos organizados correctamente: {destination}")
+        return destination
     except Exception as e:
         logger.error(f"❌ Error ejecutando organizador: {e}")
         return False
 
-def refresh_plex_library():
-    """Actualiza la biblioteca de Plex después de organizar archivos"""
+def refresh_plex_library(path=None):
+    """Actualiza en Plex solo la carpeta de la película organizada (o toda la sección)"""
     try:
-        # URL de tu servidor Plex
-        plex_url = "http://plex:32400"
-        
-        # Token de acceso de Plex (puedes obtenerlo desde Plex Web)
-        # Por ahora, intentaremos sin token para un escaneo básico
-        scan_url = f"{plex_url}/library/sections/all/refresh"
-        
-        # Hacer petición a Plex
-        response = requests.post(scan_url, timeout=10)
-        
-        if response.status_code == 200:
-            logger.info("✅ Plex notificado para actualizar biblioteca")
-            return True
-        else:
-            logger.warning(f"⚠️  Respuesta inesperada de Plex: {response.status_code}")
-            return False
-            
+        plex.refresh([path] if path else None)
+        logger.info("✅ Plex notificado para actualizar biblioteca")
+        return True
     except requests.exceptions.RequestException as e:
         logger.error(f"❌ Error conectando con Plex: {e}")
         return False
@@ -102,54 +101,87 @@ def refresh_plex_library():
         logger.error(f"❌ Error notificando Plex: {e}")
         return False
 
+def process_completion(payload, checkpoint=lambda **fields: None):
+    """Post-procesado de un torrent completado
+
+    Cada paso guarda su resultado con checkpoint: si un paso posterior falla,
+    el reintento no vuelve a mover archivos ni a avisar a la web.
+    """
+    torrent_name = payload['torrent_name']
+    logger.info(f"📁 Torrent completado: {torrent_name}")
+
+    # 1. Organizar y limpiar archivos
+    if 'organized_path' not in payload:
+        destination = organize_files(torrent_name, payload.get('torrent_dir') or '')
+        if not destination:
+            # Sin archivo fuente reintentar no sirve de nada
+            raise PermanentJobError(f"No se pudieron organizar los archivos de {torrent_name}")
+        checkpoint(organized_path=destination)
+    organized_path = payload['organized_path']
+
+    # 2. Actualizar estado en la base de datos
+    if 'notified' not in payload:
+        result = update_movie_status_in_db(torrent_name, organized_path, payload.get('torrent_hash'))
+        if result is None:
+            raise RuntimeError("No se pudo avisar a la web")
+        if not result.get('movie_found'):
+            logger.warning("⚠️ Película no encontrada en base de datos")
+        checkpoint(notified=True, plex_refresh_queued=bool(result.get('plex_refresh_queued')))
+
+    # 3. Actualizar Plex (si la web no lo encoló)
+    if not payload.get('plex_refresh_queued') and not refresh_plex_library(organized_path):
+        raise RuntimeError("No se pudo actualizar Plex")
+    logger.info(f"🎉 Post-procesado completado: {torrent_name}")
+
+
+def handle_completion_job(job):
+    process_completion(job.payload, job.checkpoint)
+
+
+def enqueue_completion(queue, torrent_name, torrent_dir, torrent_hash):
+    payload = {'torrent_name': torrent_name, 'torrent_dir': torrent_dir, 'torrent_hash': torrent_hash}
+    # Transmission puede lanzar el hook dos veces para el mismo torrent
+    dedupe_key = f"completion:{(torrent_hash or torrent_name).lower()}"
+    return queue.enqueue('completion', payload, dedupe_key=dedupe_key)
+
+
+def run_workers(size):
+    pool = WorkerPool(JobQueue(), {'completion': handle_completion_job}, size=size)
+    pool.start()
+    logger.info(f"Workers de post-procesado iniciados ({size})")
+    try:
+        pool.join()
+    except KeyboardInterrupt:
+        pool.stop()
+
+
 def main():
-    """Función principal del webhook"""
-    logger.info("🎬 Webhook de Transmission ejecutado")
-    
+    """Función principal del webhook: solo encola"""
+    parser = argparse.ArgumentParser(description='Webhook de Transmission y workers de post-procesado')
+    parser.add_argument('command', nargs='?', choices=['enqueue', 'worker'], default='enqueue')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('JOB_WORKERS', '2')))
+    args = parser.parse_args()
+    if args.command == 'worker':
+        run_workers(args.workers)
+        return
+
     # Obtener información del torrent desde variables de entorno
     # Transmission pasa estas variables automáticamente
     torrent_name = os.getenv('TR_TORRENT_NAME', '')
     torrent_dir = os.getenv('TR_TORRENT_DIR', '')
     torrent_hash = os.getenv('TR_TORRENT_HASH', '')
-    
+
     if not torrent_name:
         logger.error("❌ No se recibió nombre del torrent")
         sys.exit(1)
-    
-    logger.info(f"📁 Torrent completado: {torrent_name}")
-    logger.info(f"📂 Directorio: {torrent_dir}")
-    logger.info(f"🔢 Hash: {torrent_hash}")
-    
-    # 1. Organizar y limpiar archivos
-    logger.info("🗂️  Organizando archivos...")
-    files_organized = organize_files(torrent_name, torrent_dir)
-    
-    # 2. Actualizar estado en la base de datos
-    logger.info("📊 Actualizando estado en base de datos...")
-    movie_found = update_movie_status_in_db(torrent_name)
-    
-    if movie_found:
-        logger.info("✅ Película encontrada y estado actualizado")
-    else:
-        logger.warning("⚠️ Película no encontrada en base de datos")
-    
-    # 3. Actualizar Plex
-    logger.info("🎭 Actualizando biblioteca de Plex...")
-    plex_updated = refresh_plex_library()
-    
-    # 4. Resumen final
-    if files_organized and movie_found and plex_updated:
-        logger.info("🎉 ¡Webhook completado exitosamente!")
-        logger.info("   ✅ Archivos organizados")
-        logger.info("   ✅ Base de datos actualizada")
-        logger.info("   ✅ Plex notificado")
-    else:
-        logger.warning("⚠️ Webhook completado con advertencias:")
-        logger.warning(f"   🗂️  Archivos organizados: {'✅' if files_organized else '❌'}")
-        logger.warning(f"   📊 BD actualizada: {'✅' if movie_found else '❌'}")
-        logger.warning(f"   🎭 Plex actualizado: {'✅' if plex_updated else '❌'}")
-    
-    logger.info("=" * 50)
+
+    try:
+        job_id = enqueue_completion(JobQueue(), torrent_name, torrent_dir, torrent_hash)
+        logger.info(f"📥 {torrent_name} encolado (trabajo {job_id})")
+    except Exception as e:
+        # Sin cola no se pierde el trabajo: se procesa aquí mismo
+        logger.error(f"❌ No se pudo encolar ({e}); procesando directamente")
+        process_completion({'torrent_name': torrent_name, 'torrent_dir': torrent_dir, 'torrent_hash': torrent_hash})
 
 if __name__ == "__main__":
     main()
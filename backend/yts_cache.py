@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Caché de respuestas de la API de YTS: LRU en memoria con TTL,
+stale-while-revalidate y nivel opcional en disco (SQLite)
+"""
+import copy
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Parámetros que identifican una consulta y sus valores por defecto en YTS
+KEY_PARAMS = {
+    'query_term': '',
+    'page': 1,
+    'limit': 20,
+    'quality': 'all',
+    'sort_by': 'date_added',
+    'order_by': 'desc',
+}
+
+
+def make_key(params):
+    """Normaliza los parámetros de list_movies.json en una clave estable"""
+    normalized = {}
+    for name, default in KEY_PARAMS.items():
+        value = params.get(name)
+        if value is None or value == '':
+            value = default
+        if isinstance(default, int):
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                value = default
+        else:
+            value = ' '.join(str(value).lower().split())
+        normalized[name] = value
+    return json.dumps(normalized, sort_keys=True)
+
+
+class ResponseCache:
+    """Caché LRU acotada con TTL por entrada y revalidación en segundo plano"""
+
+    def __init__(self, max_entries=512, ttl=300, stale_ttl=3600, disk_path=None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.disk_path = disk_path
+        self.clock = clock
+
+        self._entries = OrderedDict()  # clave -> (valor, guardado_en)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._counters = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'refreshes': 0,
+            'refresh_errors': 0,
+            'disk_hits': 0,
+        }
+
+        if disk_path:
+            with self._disk() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)'
+                )
+
+    # --- Nivel en disco ---
+    def _disk(self):
+        return sqlite3.connect(self.disk_path, timeout=10)
+
+    def _disk_get(self, key):
+        try:
+            with self._disk() as conn:
+                row = conn.execute('SELECT value, stored_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row:
+                return json.loads(row[0]), row[1]
+        except Exception as e:
+            logger.warning(f"Error leyendo caché en disco: {e}")
+        return None
+
+    def _disk_put(self, key, value, stored_at):
+        try:
+            with self._disk() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO responses(key, value, stored_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(value), stored_at)
+                )
+                # Purgar lo que ya no se serviría ni siquiera como obsoleto
+                conn.execute('DELETE FROM responses WHERE stored_at < ?',
+                             (stored_at - self.ttl - self.stale_ttl,))
+        except Exception as e:
+            logger.warning(f"Error escribiendo caché en disco: {e}")
+
+    # --- Memoria ---
+    def _store(self, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def put(self, params, value):
+        key = make_key(params)
+        stored_at = self.clock()
+        self._store(key, value, stored_at)
+        if self.disk_path:
+            self._disk_put(key, value, stored_at)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.disk_path:
+            entry = self._disk_get(key)
+            if entry is not None:
+                with self._lock:
+                    self._counters['disk_hits'] += 1
+                self._store(key, *entry)
+                return entry
+        return None
+
+    def _refresh(self, params, key, fetch):
+        try:
+            self.put(params, fetch(params))
+            with self._lock:
+                self._counters['refreshes'] += 1
+        except Exception as e:
+            with self._lock:
+                self._counters['refresh_errors'] += 1
+            logger.warning(f"Error revalidando caché de YTS: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_fetch(self, params, fetch):
+        """Devuelve la respuesta cacheada o la obtiene con fetch(params)
+
+        Las entradas vencidas pero dentro de stale_ttl se sirven de inmediato
+        mientras un hilo en segundo plano las revalida (una sola vez por clave).
+        Siempre se devuelve una copia: quien la modifique (p. ej. al anotar el
+        torrent elegido) no altera lo que ven las demás peticiones.
+        """
+        key = make_key(params)
+        entry = self._lookup(key)
+        now = self.clock()
+
+        if entry is not None:
+            value, stored_at = entry
+            age = now - stored_at
+            if age < self.ttl:
+                with self._lock:
+                    self._counters['hits'] += 1
+                return copy.deepcopy(value)
+            if age < self.ttl + self.stale_ttl:
+                with self._lock:
+                    self._counters['stale_hits'] += 1
+                    start_refresh = key not in self._refreshing
+                    if start_refresh:
+                        self._refreshing.add(key)
+                if start_refresh:
+                    threading.Thread(target=self._refresh, args=(params, key, fetch), daemon=True).start()
+                return copy.deepcopy(value)
+
+        with self._lock:
+            self._counters['misses'] += 1
+        value = fetch(params)
+        self.put(params, value)
+        return copy.deepcopy(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Contadores para dimensionar la caché"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        stats['stale_ttl'] = self.stale_ttl
+        stats['disk'] = bool(self.disk_path)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Cliente mínimo para la API pública de YTS
+"""
+import os
+
+import http_client
+from yts_cache import ResponseCache
+
+YTS_API_URL = "https://yts.mx/api/v2/list_movies.json"
+
+# Caché compartida de respuestas (YTS_CACHE_PATH activa el nivel en disco)
+cache = ResponseCache(
+    max_entries=int(os.getenv('YTS_CACHE_SIZE', '512')),
+    ttl=int(os.getenv('YTS_CACHE_TTL', '300')),
+    stale_ttl=int(os.getenv('YTS_CACHE_STALE_TTL', '3600')),
+    disk_path=os.getenv('YTS_CACHE_PATH') or None,
+)
+
+
+class YTSError(Exception):
+    """Error devuelto por la API de YTS o respuesta inválida"""
+
+
+def fetch_list_movies(params):
+    """Consulta list_movies.json sin caché y devuelve el bloque 'data'"""
+    resp = http_client.get_client('yts').get(YTS_API_URL, params=params)
+    # Una página de error (5xx en HTML) es un fallo de YTS, no un JSON inválido
+    resp.raise_for_status()
+    payload = resp.json()
+    if payload.get("status") != "ok":
+        raise YTSError(payload.get("status_message", "Respuesta inválida de YTS"))
+    return payload.get("data", {})
+
+
+def list_movies(params):
+    """Consulta list_movies.json pasando por la caché de respuestas"""
+    return cache.get_or_fetch(params, fetch_list_movies)